@@ -1,1665 +1,1294 @@
-import streamlit as st
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-
-st.set_page_config(page_title="Scenariosimulator för BRP&BSP", layout="wide")
-
-
-# Tillåt radbryt i rubriker för både DataFrame och DataEditor
-st.markdown("""
-<style>
-/* DataEditor: bryt rubriktext på \n */
-[data-testid="stDataEditorColumnHeader"] div {
-  white-space: pre-line !important;
-}
-
-/* DataFrame: bryt rubriktext på \n */
-[data-testid="stDataFrame"] th div {
-  white-space: pre-line !important;
-}
-
-/* (frivilligt) centrera headern lite snyggare */
-[data-testid="stDataEditorColumnHeader"], [data-testid="stDataFrame"] th {
-  text-align: center !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
-
-# ---------- Hjälpfunktioner ----------
-def normal_pdf(x, mu, sigma):
-    if sigma <= 0:
-        return np.zeros_like(x)
-    z = (x - mu) / sigma
-    return (1 / (np.sqrt(2*np.pi) * sigma)) * np.exp(-0.5 * z * z)
-
-def fmt_or_na(x, decimals=3):
-    if x is None:
-        return "–"
-    return f"{x:.{decimals}f}"
-
-# ---------- Sidopanel: Parametrar (i angiven ordning) ----------
-st.sidebar.title("Parametrar")
-
-# 1) DA Handelsvolym (standard 100 MWh)
-V_DA  = st.sidebar.number_input(
-    "DA Handelsvolym (MWh)", min_value=0.0, value=100.0, step=1.0, format="%.0f"
-)
-
-# Handelstyp styr tecknet i tabellen (köp = negativ rad, sälj = positiv rad)
-handel_typ = st.sidebar.radio(
-    "Handelstyp",
-    ["Köp (visa negativ i tabell)", "Sälj (visa positiv i tabell)"],
-    index=0,
-)
-
-# --- Uppmätt förbrukning (default 92% av DA-handeln, avrundat till heltal) ---
-default_e_cons = int(round(0.92 * V_DA))  # 92% och närmaste heltal
-E_cons = st.sidebar.number_input(
-    "Uppmätt förbrukning E_cons (MWh)",
-    min_value=0.0,
-    value=float(default_e_cons),
-    step=1.0,
-    format="%.0f",
-    help="Default sätts till 92% av DA-handeln, avrundat till heltal."
-)
-
-# 2) Budstorlek
-E_bud = st.sidebar.number_input("Budstorlek E_bud (MWh)", min_value=0.0, value=10.0, step=0.5, format="%.3f")
-# 3) Uppmätt aktivering (för jämförelser/Scenario 3–5)
-E_akt = st.sidebar.number_input("Uppmätt aktivering E_akt (MWh)", min_value=0.0, value=8.0, step=0.5, format="%.3f")
-
-# 4) Pris DA (standard 2 €/MWh)
-P_DA  = st.sidebar.number_input(
-    "Pris DA P_DA (EUR/MWh)", min_value=-200.0, value=2.0, step=0.5, format="%.2f"
-)
-# 5) Pris Obalanskostnad (standard 5 €/MWh)
-P_IMB = st.sidebar.number_input(
-    "Pris Obalanskostnad P_IMB (EUR/MWh)", min_value=-200.0, value=5.0, step=0.5, format="%.2f"
-)
-
-# Tecken för handel i tabellen
-handel_sign = -1 if "Köp" in handel_typ else 1
-
-# 6) BSP ersättningspris = obalanspris (checkbox, default)
-use_imb_for_comp = st.sidebar.checkbox("BSP ersättningspris = obalanspris", value=True)
-P_comp_custom    = st.sidebar.number_input(
-    "BSP annat ersättningspris P_COMP (EUR/MWh)",
-    min_value=-200.0, value=7.0, step=1.0, format="%.2f",
-    disabled=use_imb_for_comp
-)
-P_COMP = P_IMB if use_imb_for_comp else P_comp_custom
-
-# 7) BSP avdrag över/underleverans = obalanspris (checkbox, default)
-use_imb_for_pen  = st.sidebar.checkbox("BSP avdrag över/underleverans = obalanspris", value=True)
-P_pen_custom     = st.sidebar.number_input(
-    "BSP avdragspris P_PEN (EUR/MWh)",
-    min_value=-200.0, value=9.0, step=1.0, format="%.2f",
-    disabled=use_imb_for_pen
-)
-P_PEN = P_IMB if use_imb_for_pen else P_pen_custom
-
-# --- RE-komp (parametrar, används ej i scen 1 just nu; scen 4–5 styrs av scenariot) ---
-re_comp_is_da = st.sidebar.checkbox("Kompensationspris till RE = DA (P_DA)", value=True)
-re_comp_custom = st.sidebar.number_input(
-    "Annat kompensationspris till RE (EUR/MWh)",
-    min_value=-200.0, value=4.0, step=1.0, format="%.2f",
-    disabled=re_comp_is_da
-)
-P_RECOMP = P_DA if re_comp_is_da else re_comp_custom
-
-# Endast för diagrammets pdf-visning (kosmetik)
-mu    = st.sidebar.number_input("Visnings-μ (MWh)", min_value=0.0, value=max(E_bud, E_akt), step=0.5, format="%.3f")
-sigma = st.sidebar.number_input("Visnings-σ (MWh)", min_value=0.1, value=4.0, step=0.1, format="%.2f")
-
-# ---------- Rubrik ----------
-st.title("Scenariosimulator för BRP&BSP")
-st.caption(
-    "Scenarier: (1) Bud + underleverans, (2) Bud + överleverans (spegling), (3) Uppmätt aktivering (BRP=BSP), "
-    "(4) Uppmätt aktivering, ingen kompensation (BRP≠BSP), "
-    "(5) Uppmätt aktivering, med kompensation (BRP≠BSP). "
-    "Volymer visas per rad. ‘Balanshandel’ följer: köp = negativt, sälj = positivt."
-)
-
-# ---------- Grundtermer ----------
-dP = P_IMB - P_DA
-
-# init
-st.session_state.setdefault("re_forward_balance_costs", True)
-
-
-
-# --- Initiera huvudstate en gång högst upp i appen (innan widgets används) ---
-if "brp_forward_balance_costs" not in st.session_state:
-    st.session_state["brp_forward_balance_costs"] = True
-
-# Hjälpare för att spegla dubblett-widgeten till huvudnyckeln
-def _sync_brb_copy_to_main(copy_key: str):
-    st.session_state["brp_forward_balance_costs"] = st.session_state[copy_key]
-
-
-
-
-# ---------- Scenariogenomgång (kompakt med expanders) ----------
-st.markdown("### Om scenarierna")
-
-with st.expander("Gemensamma antaganden (A/B)", expanded=False):
-    st.markdown("""
-- **A = uppreglering** (förbrukningen sänks mot DA-plan), **B = nedreglering** (förbrukningen höjs mot DA-plan).
-- **Balanshandelstecken:** köp visas som **negativ** volym, sälj som **positiv**.
-- **Obalanskostnad:** beräknas med obalanspriset `P_IMB` på balanshandeln.
-- **Checkboxar som kan påverka flöden och rader i tabeller:**
-  
-  - *BRP vidarefakturerar balanskostnader till elhandlare* – om ikryssad går BRP:s balanskostnad vidare till RE.
-  - *BSP köper in energi vid nedreglering* – om ikryssad bokas en DA-handel till `P_DA` för samtliga **B-scenarier** (nedreglering); extra rader visas i BSP-tabellen.
-  - *Tillämpa avdrag för BSP vid över/underleverans* – aktiverar avdrag baserat på differensen mellan aktiverad och budad volym (`E_akt` – `E_bud`) i BSP-tabellen.  
-    Under- eller överleverans ger ett avdrag enligt `P_PEN` om aktiverad.
-  - *Motsatt kompensation i 5b (RE → BSP)* – om ikryssad betalar RE kompensation till BSP i scenario 5b (default: ingen kompensation i 5b).
-  - *Elhandlaren vidarefakturerar balanskostnader till slutkunden* – om ikryssad skickas BRP:s balansfaktura vidare på kundfakturan.
-  
-  
-  
-  
-  
-  
-  
-    """)
-
-
-with st.expander("Scenario 1 – BRP = BSP, bud och **underleverans** (1a = upp, 1b = ned)", expanded=False):
-    st.markdown("""
-- BRP/BSP lämnar bud `E_bud` på reglering.
-- Utfallet ger **underleverans** mot budet: faktisk aktivering < budad aktivering.
-- Obalansjusteringen i BRP-tabellen baseras på **`E_bud`**.
-- I BSP-tabellen kan avdrag för under/överleverans aktiveras via checkboxen *Tillämpa avdrag...*.
-- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **1b** (ned).
-    """)
-
-with st.expander("Scenario 2 – BRP = BSP, bud och **överleverans** (2a = upp, 2b = ned)", expanded=False):
-    st.markdown("""
-- Spegling av Scenario 1 men med **överleverans**: faktisk aktivering > budad aktivering.
-- Obalansjusteringen baseras på **`E_bud`**.
-- Avdrag i BSP-tabellen hanteras som i Scenario 1.
-- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **2b** (ned).
-    """)
-
-with st.expander("Scenario 3 – BRP = BSP, **uppmätt aktivering** (3a = upp, 3b = ned)", expanded=False):
-    st.markdown("""
-- BRP och BSP är samma aktör.
-- Obalansjusteringen baseras på **uppmätt aktivering `E_akt`** (inte `E_bud`).
-- Ingen separat kompensation mellan aktörer.
-- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **3b** (ned).
-    """)
-
-with st.expander("Scenario 4 – BRP ≠ BSP, uppmätt aktivering **utan kompensation** (4a = upp, 4b = ned)", expanded=False):
-    st.markdown("""
-- BRP och BSP är **olika** aktörer.
-- Obalansjusteringen baseras på **`E_akt`**.
-- **Ingen kompensation** mellan BSP och RE.
-- Om *BSP köper in energi vid ndereglering* är ikryssad visas DA-rader i **4b** (ned).
-    """)
-
-with st.expander("Scenario 5 – BRP ≠ BSP, uppmätt aktivering **med kompensation** (5a = upp, 5b = ned)", expanded=False):
-    st.markdown("""
-- Baseras på **`E_akt`**.
-- **5a (ned):** BSP → RE (RE får kompensation) med pris **`P_RECOMP`**. *Denna kompensation är alltid aktiv i 5a.*
-- **5b (ned):** Default **ingen kompensation**. Om *Motsatt kompensation i 5b (RE → BSP)* är ikryssad betalar RE kompensation till BSP.
-- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **5b** (ned).
-    """)
-
-with st.expander("Slutkundens elpris & tabeller", expanded=False):
-    st.markdown("""
-- **Slutkundens elpris** i RE-tabellen:
-  \n  `Pris = –(Inköp från BRP + ev. balans som skickas vidare + ev. kompensation) / fakturerad volym`
-- Tabellen **”Slutkundens elpris per scenario”** visar även avvikelse mot vald målkolumn (default 5a) samt **Ökad totalkostnad slutkund** (= prisavvikelse × fakturerad volym).
-    """)
-
-with st.expander("Kompensation till slutkund (Tabell 6)", expanded=False):
-    st.markdown("""
-- **Kompensation = max(0, Ökad totalkostnad slutkund)** per scenario för att neutralisera merkostnaden mot målscenariot.
-- **Aktörers resultat efter kompensation** räknas från **BRP+BSP+Elhandlare resultat** (om ”NA” används **BSP resultat** som bas) minus kompensationen.
-- Om *Motsatt kompensation i 5b* är aktiverad påverkar detta resultaten i 5b innan neutraliseringskompensation beräknas.
-    """)
-
-
-# ---------- Scenario-val: Visa scenarier i tabellerna ----------
-with st.expander("Visa scenarier i tabellerna", expanded=False):
-    st.markdown(
-        """
-Markera vilka scenarier som ska visas i tabellerna nedan.
-Om du avmarkerar ett scenarie döljs det i samtliga tabeller (BRP, BSP, RE, resultat, slutkund, kompensation).
-        """
-    )
-
-    BRP_SCENARIO_COLUMNS = {
-        "1a": "1a BRP=BSP, Upp – Bud/underlev.",
-        "1b": "1b BRP=BSP, Ned – Bud/underlev.",
-        "2a": "2a BRP=BSP, Upp – Bud/överlev.",
-        "2b": "2b BRP=BSP, Ned – Bud/överlev.",
-        "3a": "3a BRP=BSP, Upp – Uppmätt akt.",
-        "3b": "3b BRP=BSP, Ned – Uppmätt akt.",
-        "4a": "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-        "4b": "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-        "5a": "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-        "5b": "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-    }
-
-    # En checkbox per scenario – alla ikryssade som default
-    cols = st.columns(5)  # bara layout/kosmetik
-    for i, (short_key, label) in enumerate(BRP_SCENARIO_COLUMNS.items()):
-        with cols[i % 5]:
-            st.checkbox(
-                label,
-                value=True,
-                key=f"show_brp_{short_key}",
-                help=f"Visa/dölj scenario {short_key} i alla tabeller.",
-            )
-
-
-# ---------- Checkbox före BRP-tabellen ----------
-# Checkbox ovanför BRP-tabellen
-brp_forward_balance_costs = st.checkbox(
-    "BRP vidarefakturerar balanskostnader till elhandlare",
-    key="brp_forward_balance_costs",   # <-- huvudnyckeln
-    help="Om urkryssad står BRP själv för balanskostnaden och fakturerar inte elhandlaren."
-)
-
-
-
-
-
-
-
-def _wrap_header(h: str) -> str:
-    # Bryt på " - " och efter kommatecken för att bli smalare
-    return h.replace(" - ", "\n").replace(", ", ",\n")
-
-
-
-# ---------- TABELL 1: BRP (1a,1b,2a,2b,3a,3b,4a,4b,5a,5b) ----------
-st.markdown("## BRP")
-
-def _fmt_cell(v, enhet):
-    """Formatering av visningsvärden i tabellen."""
-    try:
-        if enhet == "MWh":
-            return f"{float(v):,.0f}"
-        if enhet == "€/MWh":
-            return f"{float(v):,.2f}"
-        if enhet == "EUR":
-            return f"{float(v):,.0f}"
-    except Exception:
-        return v
-    return v
-
-
-# ---- BRP: beräkningar och scenarier 1a–5b ----
-def _brp_metrics(uppmatt_mwh: float, obalans_vol_mwh: float, based_on: str, is_up: bool):
-    """
-    uppmatt_mwh: uppmätt förbrukning i scenariot
-    obalans_vol_mwh: volym som ska obalansjusteras (E_bud eller E_akt)
-    based_on: "Bud" eller "Uppmätt aktivering" (för utskrift)
-    is_up: True = nedreglering (vänd tecken), False = uppreglering
-    """
-    # DA-handel
-    handel_mwh = handel_sign * V_DA          # köp = -, sälj = +
-    kostnad_handel_eur = handel_mwh * P_DA
-
-    # Vänd tecken på obalansjustering vid nedreglering
-    obalansjust_mwh = -obalans_vol_mwh if is_up else obalans_vol_mwh
-
-    # Balansavräkning
-    summa_avr_balans_mwh = handel_mwh + obalansjust_mwh
-    obalans_mwh = uppmatt_mwh + summa_avr_balans_mwh
-    balanshandel_mwh = -obalans_mwh
-    balanskostnad_eur = balanshandel_mwh * P_IMB
-
-    # Vidarefakturering?
-    obalans_fakt_eur = 0.0 if not brp_forward_balance_costs else -balanskostnad_eur
-
-    # Fakturering till RE
-    inkopt_el_fakt_eur = abs(handel_mwh) * P_DA
-    brp_fakt_re_eur = inkopt_el_fakt_eur + obalans_fakt_eur
-
-    # BRP:s eget netto
-    brp_netto_eur = (
-        kostnad_handel_eur
-        + balanskostnad_eur
-        + inkopt_el_fakt_eur
-        + obalans_fakt_eur
-    )
-
-    return {
-        "Obalansjusteras baserat på": f"{based_on} ({'ned' if is_up else 'upp'})",
-        "Handel": handel_mwh,
-        "DA Pris": P_DA,
-        "Kostnad handel": kostnad_handel_eur,
-        "Obalansjustering": obalansjust_mwh,
-        "Summa avräknas i balans": summa_avr_balans_mwh,
-        "Uppmätt": uppmatt_mwh,
-        "Balanshandel (köp − / sälj +)": balanshandel_mwh,
-        "Obalanspris": P_IMB,
-        "Balanskostnad BRP": balanskostnad_eur,
-        "Inköpt el som faktureras": inkopt_el_fakt_eur,
-        "Obalanskostnad som faktureras": obalans_fakt_eur,
-        "BRP fakturerar elhandlare": brp_fakt_re_eur,
-        "BRP nettokostnad": brp_netto_eur,
-    }
-
-
-# ---- Parametrar för A (ned) och B (upp) enligt dina värden ----
-E_bud_down = E_bud          # ned-scenarier
-E_bud_up   = 10.0           # upp-scenarier
-E_akt_down = E_akt
-E_akt_up   = 8.0
-
-E_cons_down = E_cons
-E_cons_up   = 108.0
-
-# Uppmätt förbrukning per scenario (som du ville ha dem)
-E_cons_1a = E_cons_down
-E_cons_1b = E_cons_up
-E_cons_2a = E_cons_down - 4
-E_cons_2b = E_cons_up + 4
-E_cons_3a = E_cons_down
-E_cons_3b = E_cons_up
-E_cons_4a = E_cons_down
-E_cons_4b = E_cons_up
-E_cons_5a = E_cons_down
-E_cons_5b = E_cons_up
-
-# Beräkna 10 BRP-scenarier
-m1a = _brp_metrics(E_cons_1a, E_bud_down, "Bud",                is_up=False)  # 1a Upp
-m1b = _brp_metrics(E_cons_1b, E_bud_up,   "Bud",                is_up=True)   # 1b Ned
-
-m2a = _brp_metrics(E_cons_2a, E_bud_down, "Bud",                is_up=False)  # 2a Upp
-m2b = _brp_metrics(E_cons_2b, E_bud_up,   "Bud",                is_up=True)   # 2b Ned
-
-m3a = _brp_metrics(E_cons_3a, E_akt_down, "Uppmätt aktivering", is_up=False)  # 3a Upp
-m3b = _brp_metrics(E_cons_3b, E_akt_up,   "Uppmätt aktivering", is_up=True)   # 3b Ned
-
-m4a = _brp_metrics(E_cons_4a, E_akt_down, "Uppmätt aktivering", is_up=False)  # 4a Upp
-m4b = _brp_metrics(E_cons_4b, E_akt_up,   "Uppmätt aktivering", is_up=True)   # 4b Ned
-
-m5a = _brp_metrics(E_cons_5a, E_akt_down, "Uppmätt aktivering", is_up=False)  # 5a Upp
-m5b = _brp_metrics(E_cons_5b, E_akt_up,   "Uppmätt aktivering", is_up=True)   # 5b Ned
-
-# (Alias om resten av appen fortfarande använder m1..m5)
-m1, m2, m3, m4, m5 = m1a, m2a, m3a, m4a, m5a
-
-
-# ----- Bygg BRP-DataFrame -----
-rows_brp = [
-    (
-        "Obalansjusteras baserat på",
-        m1a["Obalansjusteras baserat på"], m1b["Obalansjusteras baserat på"],
-        m2a["Obalansjusteras baserat på"], m2b["Obalansjusteras baserat på"],
-        m3a["Obalansjusteras baserat på"], m3b["Obalansjusteras baserat på"],
-        m4a["Obalansjusteras baserat på"], m4b["Obalansjusteras baserat på"],
-        m5a["Obalansjusteras baserat på"], m5b["Obalansjusteras baserat på"], "",
-    ),
-    (
-        "Handel",
-        m1a["Handel"], m1b["Handel"], m2a["Handel"], m2b["Handel"],
-        m3a["Handel"], m3b["Handel"], m4a["Handel"], m4b["Handel"],
-        m5a["Handel"], m5b["Handel"], "MWh",
-    ),
-    (
-        "DA Pris",
-        m1a["DA Pris"], m1b["DA Pris"], m2a["DA Pris"], m2b["DA Pris"],
-        m3a["DA Pris"], m3b["DA Pris"], m4a["DA Pris"], m4b["DA Pris"],
-        m5a["DA Pris"], m5b["DA Pris"], "€/MWh",
-    ),
-    (
-        "Kostnad handel",
-        m1a["Kostnad handel"], m1b["Kostnad handel"], m2a["Kostnad handel"], m2b["Kostnad handel"],
-        m3a["Kostnad handel"], m3b["Kostnad handel"], m4a["Kostnad handel"], m4b["Kostnad handel"],
-        m5a["Kostnad handel"], m5b["Kostnad handel"], "EUR",
-    ),
-    (
-        "Obalansjustering",
-        m1a["Obalansjustering"], m1b["Obalansjustering"], m2a["Obalansjustering"], m2b["Obalansjustering"],
-        m3a["Obalansjustering"], m3b["Obalansjustering"], m4a["Obalansjustering"], m4b["Obalansjustering"],
-        m5a["Obalansjustering"], m5b["Obalansjustering"], "MWh",
-    ),
-    (
-        "Summa avräknas i balans",
-        m1a["Summa avräknas i balans"], m1b["Summa avräknas i balans"],
-        m2a["Summa avräknas i balans"], m2b["Summa avräknas i balans"],
-        m3a["Summa avräknas i balans"], m3b["Summa avräknas i balans"],
-        m4a["Summa avräknas i balans"], m4b["Summa avräknas i balans"],
-        m5a["Summa avräknas i balans"], m5b["Summa avräknas i balans"], "MWh",
-    ),
-    (
-        "Uppmätt",
-        m1a["Uppmätt"], m1b["Uppmätt"], m2a["Uppmätt"], m2b["Uppmätt"],
-        m3a["Uppmätt"], m3b["Uppmätt"], m4a["Uppmätt"], m4b["Uppmätt"],
-        m5a["Uppmätt"], m5b["Uppmätt"], "MWh",
-    ),
-    (
-        "Balanshandel (köp − / sälj +)",
-        m1a["Balanshandel (köp − / sälj +)"], m1b["Balanshandel (köp − / sälj +)"],
-        m2a["Balanshandel (köp − / sälj +)"], m2b["Balanshandel (köp − / sälj +)"],
-        m3a["Balanshandel (köp − / sälj +)"], m3b["Balanshandel (köp − / sälj +)"],
-        m4a["Balanshandel (köp − / sälj +)"], m4b["Balanshandel (köp − / sälj +)"],
-        m5a["Balanshandel (köp − / sälj +)"], m5b["Balanshandel (köp − / sälj +)"], "MWh",
-    ),
-    (
-        "Obalanspris",
-        m1a["Obalanspris"], m1b["Obalanspris"], m2a["Obalanspris"], m2b["Obalanspris"],
-        m3a["Obalanspris"], m3b["Obalanspris"], m4a["Obalanspris"], m4b["Obalanspris"],
-        m5a["Obalanspris"], m5b["Obalanspris"], "€/MWh",
-    ),
-    (
-        "Balanskostnad BRP",
-        m1a["Balanskostnad BRP"], m1b["Balanskostnad BRP"], m2a["Balanskostnad BRP"], m2b["Balanskostnad BRP"],
-        m3a["Balanskostnad BRP"], m3b["Balanskostnad BRP"], m4a["Balanskostnad BRP"], m4b["Balanskostnad BRP"],
-        m5a["Balanskostnad BRP"], m5b["Balanskostnad BRP"], "EUR",
-    ),
-    (
-        "Inköpt el som faktureras",
-        m1a["Inköpt el som faktureras"], m1b["Inköpt el som faktureras"],
-        m2a["Inköpt el som faktureras"], m2b["Inköpt el som faktureras"],
-        m3a["Inköpt el som faktureras"], m3b["Inköpt el som faktureras"],
-        m4a["Inköpt el som faktureras"], m4b["Inköpt el som faktureras"],
-        m5a["Inköpt el som faktureras"], m5b["Inköpt el som faktureras"], "EUR",
-    ),
-    (
-        "Obalanskostnad som faktureras",
-        m1a["Obalanskostnad som faktureras"], m1b["Obalanskostnad som faktureras"],
-        m2a["Obalanskostnad som faktureras"], m2b["Obalanskostnad som faktureras"],
-        m3a["Obalanskostnad som faktureras"], m3b["Obalanskostnad som faktureras"],
-        m4a["Obalanskostnad som faktureras"], m4b["Obalanskostnad som faktureras"],
-        m5a["Obalanskostnad som faktureras"], m5b["Obalanskostnad som faktureras"], "EUR",
-    ),
-    (
-        "BRP fakturerar elhandlare",
-        m1a["BRP fakturerar elhandlare"], m1b["BRP fakturerar elhandlare"],
-        m2a["BRP fakturerar elhandlare"], m2b["BRP fakturerar elhandlare"],
-        m3a["BRP fakturerar elhandlare"], m3b["BRP fakturerar elhandlare"],
-        m4a["BRP fakturerar elhandlare"], m4b["BRP fakturerar elhandlare"],
-        m5a["BRP fakturerar elhandlare"], m5b["BRP fakturerar elhandlare"], "EUR",
-    ),
-    (
-        "BRP nettokostnad",
-        m1a["BRP nettokostnad"], m1b["BRP nettokostnad"],
-        m2a["BRP nettokostnad"], m2b["BRP nettokostnad"],
-        m3a["BRP nettokostnad"], m3b["BRP nettokostnad"],
-        m4a["BRP nettokostnad"], m4b["BRP nettokostnad"],
-        m5a["BRP nettokostnad"], m5b["BRP nettokostnad"], "EUR",
-    ),
-]
-
-df_brp = pd.DataFrame(
-    rows_brp,
-    columns=[
-        "Fält",
-        "1a BRP=BSP, Upp – Bud/underlev.",
-        "1b BRP=BSP, Ned – Bud/underlev.",
-        "2a BRP=BSP, Upp – Bud/överlev.",
-        "2b BRP=BSP, Ned – Bud/överlev.",
-        "3a BRP=BSP, Upp – Uppmätt akt.",
-        "3b BRP=BSP, Ned – Uppmätt akt.",
-        "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-        "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-        "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-        "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-        "Enhet",
-    ],
-)
-
-# Formatera värdena (siffror → strängar med rätt antal decimaler)
-for col in df_brp.columns[1:-1]:
-    df_brp[col] = [_fmt_cell(v, e) for v, e in zip(df_brp[col], df_brp["Enhet"])]
-
-# ----- Rad-tooltips: text till varje "Fält" -----
-# ----- Rad-tooltips: text till varje "Fält" -----
-brp_row_tips = {
-    "Obalansjusteras baserat på":
-        "Visar om obalansjusteringen görs mot bud (E_bud) eller uppmätt aktivering (E_akt), samt riktning: upp eller ned.",
-    "Handel":
-        "DA-handeln mot marknaden: handel_sign × V_DA (köp = negativ, sälj = positiv). Enhet: MWh.",
-    "DA Pris":
-        "Day-Ahead-priset P_DA som används för DA-handeln. Enhet: €/MWh.",
-    "Kostnad handel":
-        "Kostnad/intäkt för DA-handeln: Handel × P_DA. Enhet: EUR.",
-    "Obalansjustering":
-        "Volym som justeras i balansavräkningen (E_bud eller E_akt; tecken vänds i ned-scenarier). Enhet: MWh.",
-    "Summa avräknas i balans":
-        "Handel + Obalansjustering. Summan som går in i balansavräkningen. Enhet: MWh.",
-    "Uppmätt":
-        "Uppmätt förbrukning i scenariot (E_cons_x). Enhet: MWh.",
-    "Balanshandel (köp − / sälj +)":
-        "Motpost som balanserar mätning och avräknad handel: −(Uppmätt + Summa avräknas i balans). Enhet: MWh.",
-    "Obalanspris":
-        "Obalanspris P_IMB som används för balanshandeln. Enhet: €/MWh.",
-    "Balanskostnad BRP":
-        "Kostnad/intäkt för balanshandeln: Balanshandel × P_IMB. Enhet: EUR.",
-    "Inköpt el som faktureras":
-        "Belopp för DA-inköp som BRP fakturerar elhandlaren: |Handel| × P_DA. Enhet: EUR.",
-    "Obalanskostnad som faktureras":
-        "Den del av BRP:s balanskostnad som faktureras vidare till elhandlaren (styrt av checkboxen). Enhet: EUR.",
-    "BRP fakturerar elhandlare":
-        "Summa faktura till elhandlaren: Inköpt el som faktureras + Obalanskostnad som faktureras. Enhet: EUR.",
-    "BRP nettokostnad":
-        "BRP:s resultat: Kostnad handel + Balanskostnad BRP + Inköpt el som faktureras + Obalanskostnad som faktureras. Enhet: EUR.",
-}
-
-# Bygg tooltip-matris i samma form som df_brp (alla kolumner, innan filtrering)
-tooltips = pd.DataFrame("", index=df_brp.index, columns=df_brp.columns)
-for i, field in enumerate(df_brp["Fält"]):
-    tooltips.iloc[i, 0] = brp_row_tips.get(field, "")
-
-# --------- NYTT: filtrera kolumner utifrån scenario-checkboxar ---------
-visible_scenario_cols = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-# Se till att alltid ha Fält + Enhet kvar
-ordered_cols = ["Fält", *visible_scenario_cols, "Enhet"]
-
-df_brp_visible = df_brp[ordered_cols]
-tooltips_visible = tooltips[ordered_cols]
-
-# Skapa Styler med tooltips för den filtrerade tabellen
-styled_brp = df_brp_visible.style.set_tooltips(tooltips_visible)
-
-# ----- Visa BRP-tabellen med hover-tooltips på första kolumnen -----
-st.table(styled_brp)
-
-
-
-
-
-# BSP köper in energi vid nedreglering (default: False)
-bsp_buy_up = st.checkbox(
-    "BSP köper in energi vid nedreglering",
-    value=False,
-    help="När ikryssad bokas en DA-handel till P_DA för uppregleringsscenarier (B)."
-)
-
-
-
-# ---------- Checkbox för avdrag på över/underleverans ----------
-apply_penalty = st.checkbox(
-    "Tillämpa avdrag för BSP vid över/underleverans",
-    value=False,
-    help="Om urkryssad sätts över/underleveranspris till 0 €/MWh.",
-)
-
-
-# >>> Lägg in DEN HÄR BLOCKET HÄR <<<
-st.checkbox(
-    "Motsatt kompensation i 5b (RE → BSP)",
-    value=False,
-    key="rev_comp_5b",   # unik nyckel
-    help="Default: ingen kompensation i 5b. Om ikryssad betalar RE kompensation till BSP."
-)
-rev_comp_5b = st.session_state.get("rev_comp_5b", False)
-# >>> slut på nytt block <<<
-
-
-
-
-# ---------- TABELL 2: BSP (1a–5b) ----------
-st.markdown("## BSP")
-
-def _bsp_metrics(
-    pay_basis: str,
-    with_comp: bool,
-    E_bud_x: float,
-    E_akt_x: float,
-    is_up: bool,                 # True = B-scenario (ned), False = A-scenario (upp)
-    comp_sign: int = -1
-):
-    # 1) Ersättning (bud eller akt)
-    raw_vol_pay = E_bud_x if pay_basis == "bud" else E_akt_x      # "äkta" volym för beräkning
-    disp_vol_pay = -raw_vol_pay if is_up else raw_vol_pay         # visningsvolym: minus i B
-    price_pay = P_COMP
-    res_pay   = abs(raw_vol_pay) * price_pay                      # resultat baserat på absolut volym
-
-    # 2) Under/överleverans (endast när baserat på bud)
-    if pay_basis == "bud":
-        vol_dev   = abs(E_akt_x - E_bud_x)
-        price_dev = P_PEN if apply_penalty else 0.0
-        res_dev   = -(vol_dev * price_dev)
-    else:
-        vol_dev = price_dev = res_dev = 0.0
-
-    # 3) Kompensation BSP↔RE
-    if with_comp:
-        vol_comp   = E_akt_x
-        price_comp = P_RECOMP
-        res_comp   = comp_sign * vol_comp * price_comp
-    else:
-        vol_comp = price_comp = res_comp = 0.0
-
-    # 4) DA-handel vid nedreglering (endast om checkbox ikryssad och scenario är B)
-    if is_up and bsp_buy_up:
-        da_vol   = E_akt_x
-        da_price = P_DA
-        da_cost  = -(da_vol * da_price)   # kostnad för BSP => negativ
-    else:
-        da_vol = da_price = da_cost = 0.0
-
-    # 5) Nettoresultat
-    res_netto = res_pay + res_dev + res_comp + da_cost
-
-    return {
-        "Budvolym/Aktiverad volym": disp_vol_pay,   # visar minus i B
-        "Ersättningspris": price_pay,
-        "Ersättningsresultat": res_pay,            # absolutvolym
-        "Under/överleveransvolym": vol_dev,
-        "Under/överleveranspris": price_dev,
-        "Under/överleveransresultat": res_dev,
-        "Kompensationsvolym": vol_comp,
-        "Kompensationspris": price_comp,
-        "Kompensationsresultat": res_comp,
-
-        "DA handel vid nedreglering": da_vol,
-        "DA pris": da_price,
-        "Kostnad DA handel": da_cost,
-
-        "BSP nettoresultat": res_netto,
-    }
-
-
-# A (ned) & B (upp)
-E_bud_down, E_bud_up   = E_bud, 10.0
-E_akt_down, E_akt_up   = E_akt, 8.0
-
-# 10 scenarier (1a–5b)
-bsp_1a = _bsp_metrics("bud", False, E_bud_down, E_akt_down, is_up=False)
-bsp_1b = _bsp_metrics("bud", False, E_bud_up,   E_akt_up,   is_up=True)
-
-bsp_2a = _bsp_metrics("bud", False, E_bud_down, E_akt_down, is_up=False)
-bsp_2b = _bsp_metrics("bud", False, E_bud_up,   E_akt_up,   is_up=True)
-
-bsp_3a = _bsp_metrics("akt", False, E_bud_down, E_akt_down, is_up=False)
-bsp_3b = _bsp_metrics("akt", False, E_bud_up,   E_akt_up,   is_up=True)
-
-bsp_4a = _bsp_metrics("akt", False, E_bud_down, E_akt_down, is_up=False)
-bsp_4b = _bsp_metrics("akt", False, E_bud_up,   E_akt_up,   is_up=True)
-
-# 5a: BSP betalar komp (negativt) – ned (a)
-bsp_5a = _bsp_metrics("akt", True,  E_bud_down, E_akt_down, comp_sign=-1, is_up=False)
-
-# 5b: motsatt komp ev. aktiv – upp (b)
-bsp_5b = _bsp_metrics("akt", rev_comp_5b, E_bud_up, E_akt_up, comp_sign=+1, is_up=True)
-
-
-rows_bsp = [
-    ("Budvolym/Aktiverad volym",
-        bsp_1a["Budvolym/Aktiverad volym"], bsp_1b["Budvolym/Aktiverad volym"],
-        bsp_2a["Budvolym/Aktiverad volym"], bsp_2b["Budvolym/Aktiverad volym"],
-        bsp_3a["Budvolym/Aktiverad volym"], bsp_3b["Budvolym/Aktiverad volym"],
-        bsp_4a["Budvolym/Aktiverad volym"], bsp_4b["Budvolym/Aktiverad volym"],
-        bsp_5a["Budvolym/Aktiverad volym"], bsp_5b["Budvolym/Aktiverad volym"], "MWh"
-    ),
-    ("Ersättningspris",
-        bsp_1a["Ersättningspris"], bsp_1b["Ersättningspris"],
-        bsp_2a["Ersättningspris"], bsp_2b["Ersättningspris"],
-        bsp_3a["Ersättningspris"], bsp_3b["Ersättningspris"],
-        bsp_4a["Ersättningspris"], bsp_4b["Ersättningspris"],
-        bsp_5a["Ersättningspris"], bsp_5b["Ersättningspris"], "€/MWh"
-    ),
-    ("Ersättningsresultat",
-        bsp_1a["Ersättningsresultat"], bsp_1b["Ersättningsresultat"],
-        bsp_2a["Ersättningsresultat"], bsp_2b["Ersättningsresultat"],
-        bsp_3a["Ersättningsresultat"], bsp_3b["Ersättningsresultat"],
-        bsp_4a["Ersättningsresultat"], bsp_4b["Ersättningsresultat"],
-        bsp_5a["Ersättningsresultat"], bsp_5b["Ersättningsresultat"], "EUR"
-    ),
-    ("Under/överleveransvolym",
-        bsp_1a["Under/överleveransvolym"], bsp_1b["Under/överleveransvolym"],
-        bsp_2a["Under/överleveransvolym"], bsp_2b["Under/överleveransvolym"],
-        bsp_3a["Under/överleveransvolym"], bsp_3b["Under/överleveransvolym"],
-        bsp_4a["Under/överleveransvolym"], bsp_4b["Under/överleveransvolym"],
-        bsp_5a["Under/överleveransvolym"], bsp_5b["Under/överleveransvolym"], "MWh"
-    ),
-    ("Under/överleveranspris",
-        bsp_1a["Under/överleveranspris"], bsp_1b["Under/överleveranspris"],
-        bsp_2a["Under/överleveranspris"], bsp_2b["Under/överleveranspris"],
-        bsp_3a["Under/överleveranspris"], bsp_3b["Under/överleveranspris"],
-        bsp_4a["Under/överleveranspris"], bsp_4b["Under/överleveranspris"],
-        bsp_5a["Under/överleveranspris"], bsp_5b["Under/överleveranspris"], "€/MWh"
-    ),
-    ("Under/överleveransresultat",
-        bsp_1a["Under/överleveransresultat"], bsp_1b["Under/överleveransresultat"],
-        bsp_2a["Under/överleveransresultat"], bsp_2b["Under/överleveransresultat"],
-        bsp_3a["Under/överleveransresultat"], bsp_3b["Under/överleveransresultat"],
-        bsp_4a["Under/överleveransresultat"], bsp_4b["Under/överleveransresultat"],
-        bsp_5a["Under/överleveransresultat"], bsp_5b["Under/överleveransresultat"], "EUR"
-    ),
-    ("Kompensationsvolym",
-        bsp_1a["Kompensationsvolym"], bsp_1b["Kompensationsvolym"],
-        bsp_2a["Kompensationsvolym"], bsp_2b["Kompensationsvolym"],
-        bsp_3a["Kompensationsvolym"], bsp_3b["Kompensationsvolym"],
-        bsp_4a["Kompensationsvolym"], bsp_4b["Kompensationsvolym"],
-        bsp_5a["Kompensationsvolym"], bsp_5b["Kompensationsvolym"], "MWh"
-    ),
-    ("Kompensationspris",
-        bsp_1a["Kompensationspris"], bsp_1b["Kompensationspris"],
-        bsp_2a["Kompensationspris"], bsp_2b["Kompensationspris"],
-        bsp_3a["Kompensationspris"], bsp_3b["Kompensationspris"],
-        bsp_4a["Kompensationspris"], bsp_4b["Kompensationspris"],
-        bsp_5a["Kompensationspris"], bsp_5b["Kompensationspris"], "€/MWh"
-    ),
-    ("Kompensationsresultat",
-        bsp_1a["Kompensationsresultat"], bsp_1b["Kompensationsresultat"],
-        bsp_2a["Kompensationsresultat"], bsp_2b["Kompensationsresultat"],
-        bsp_3a["Kompensationsresultat"], bsp_3b["Kompensationsresultat"],
-        bsp_4a["Kompensationsresultat"], bsp_4b["Kompensationsresultat"],
-        bsp_5a["Kompensationsresultat"], bsp_5b["Kompensationsresultat"], "EUR"
-    ),
-    ("DA handel vid nedreglering",
-        bsp_1a["DA handel vid nedreglering"], bsp_1b["DA handel vid nedreglering"],
-        bsp_2a["DA handel vid nedreglering"], bsp_2b["DA handel vid nedreglering"],
-        bsp_3a["DA handel vid nedreglering"], bsp_3b["DA handel vid nedreglering"],
-        bsp_4a["DA handel vid nedreglering"], bsp_4b["DA handel vid nedreglering"],
-        bsp_5a["DA handel vid nedreglering"], bsp_5b["DA handel vid nedreglering"], "MWh"
-    ),
-    ("DA pris",
-        bsp_1a["DA pris"], bsp_1b["DA pris"],
-        bsp_2a["DA pris"], bsp_2b["DA pris"],
-        bsp_3a["DA pris"], bsp_3b["DA pris"],
-        bsp_4a["DA pris"], bsp_4b["DA pris"],
-        bsp_5a["DA pris"], bsp_5b["DA pris"], "€/MWh"
-    ),
-    ("Kostnad DA handel",
-        bsp_1a["Kostnad DA handel"], bsp_1b["Kostnad DA handel"],
-        bsp_2a["Kostnad DA handel"], bsp_2b["Kostnad DA handel"],
-        bsp_3a["Kostnad DA handel"], bsp_3b["Kostnad DA handel"],
-        bsp_4a["Kostnad DA handel"], bsp_4b["Kostnad DA handel"],
-        bsp_5a["Kostnad DA handel"], bsp_5b["Kostnad DA handel"], "EUR"
-    ),
-    ("BSP nettoresultat",
-        bsp_1a["BSP nettoresultat"], bsp_1b["BSP nettoresultat"],
-        bsp_2a["BSP nettoresultat"], bsp_2b["BSP nettoresultat"],
-        bsp_3a["BSP nettoresultat"], bsp_3b["BSP nettoresultat"],
-        bsp_4a["BSP nettoresultat"], bsp_4b["BSP nettoresultat"],
-        bsp_5a["BSP nettoresultat"], bsp_5b["BSP nettoresultat"], "EUR"
-    ),
-]
-
-
-columns_bsp = [
-    "Fält",
-    "1a BRP=BSP, Upp – Bud/underlev.",
-    "1b BRP=BSP, Ned – Bud/underlev.",
-    "2a BRP=BSP, Upp – Bud/överlev.",
-    "2b BRP=BSP, Ned – Bud/överlev.",
-    "3a BRP=BSP, Upp – Uppmätt akt.",
-    "3b BRP=BSP, Ned – Uppmätt akt.",
-    "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-    "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-    "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-    "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-    "Enhet",
-]
-
-
-def _fmt_bsp(v, unit):
-    try:
-        if unit == "MWh":
-            return f"{float(v):,.0f}"
-        if unit == "€/MWh":
-            return f"{float(v):,.2f}"
-        if unit == "EUR":
-            return f"{float(v):,.0f}"
-    except Exception:
-        return v
-    return v
-
-
-df_bsp = pd.DataFrame(rows_bsp, columns=columns_bsp)
-
-# Formatera värden
-for col in df_bsp.columns[1:-1]:
-    df_bsp[col] = [_fmt_bsp(v, u) for v, u in zip(df_bsp[col], df_bsp["Enhet"])]
-
-# ---------- (NYTT) Tooltips för BSP-rader ----------
-bsp_row_tips = {
-    "Budvolym/Aktiverad volym":
-        "Volym som ersättning baseras på: E_bud (bud) eller E_akt (uppmätt). Negativ i B-scenarier (nedreglering).",
-    "Ersättningspris":
-        "Pris per MWh som BSP får för aktiveringen: P_COMP (alt. obalanspris om checkbox).",
-    "Ersättningsresultat":
-        "Intäkt baserad på ersättningsvolym: |Budvolym/Aktiverad volym| × Ersättningspris.",
-    "Under/överleveransvolym":
-        "Skillnad mellan uppmätt aktivering och budad volym: |E_akt − E_bud| (endast när ersättning baseras på bud).",
-    "Under/överleveranspris":
-        "Avdragspris P_PEN för över-/underleverans (0 om checkbox för avdrag ej ikryssad).",
-    "Under/överleveransresultat":
-        "Avdrag för över-/underleverans: − Under/överleveransvolym × Under/överleveranspris.",
-    "Kompensationsvolym":
-        "Volym som används för kompensation mellan BSP och RE (oftast E_akt i scen 5).",
-    "Kompensationspris":
-        "Pris för kompensation mellan BSP och RE: P_RECOMP.",
-    "Kompensationsresultat":
-        "Resultat av kompensationen: Kompensationsvolym × Kompensationspris × comp_sign (tecken beror på riktning).",
-    "DA handel vid nedreglering":
-        "Extra DA-handel BSP gör i ned-scenarier när checkboxen 'BSP köper in energi vid nedreglering' är ikryssad.",
-    "DA pris":
-        "DA-pris P_DA som används för köp/sälj i raden 'DA handel vid nedreglering'.",
-    "Kostnad DA handel":
-        "Kostnad/intäkt för DA-handel vid nedreglering: − DA handel × DA pris (negativt = kostnad).",
-    "BSP nettoresultat":
-        "Samlat resultat för BSP: Ersättningsresultat + Under/överleveransresultat + Kompensationsresultat + Kostnad DA handel.",
-}
-
-# Bygg tooltip-matris: samma form som df_bsp, men fyll bara första kolumnen
-tooltips_bsp = pd.DataFrame("", index=df_bsp.index, columns=df_bsp.columns)
-for i, field in enumerate(df_bsp["Fält"]):
-    tooltips_bsp.iloc[i, 0] = bsp_row_tips.get(field, "")
-
-# --------- NYTT: filtrera kolumner utifrån scenario-checkboxar ---------
-# Vi återanvänder samma BRP_SCENARIO_COLUMNS som för BRP-tabellen
-visible_scenario_cols = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-# Se till att alltid ha Fält + Enhet kvar
-ordered_cols_bsp = ["Fält", *visible_scenario_cols, "Enhet"]
-
-df_bsp_visible = df_bsp[ordered_cols_bsp]
-tooltips_bsp_visible = tooltips_bsp[ordered_cols_bsp]
-
-# Skapa Styler med tooltips
-styled_bsp = df_bsp_visible.style.set_tooltips(tooltips_bsp_visible)
-
-# Visa tabellen med hover-tooltips på kolumnen "Fält"
-st.table(styled_bsp)
-
-
-
-
-
-
-
-
-# ---------- Checkbox: Elhandlaren vidarefakturerar balanskostnader ----------
-# Initiera session state vid behov
-if "re_forward_balance_costs" not in st.session_state:
-    st.session_state["re_forward_balance_costs"] = True
-
-# Visa checkbox ovanför RE-tabellen
-re_forward_balance_costs = st.checkbox(
-    "Elhandlaren vidarefakturerar balanskostnader till slutkunden",
-    key="re_forward_balance_costs",
-    help="Om urkryssad står elhandlaren själv för balanskostnaden och fakturerar inte slutkunden."
-)
-
-
-# Hämtar värdet direkt från session_state så det fungerar även vid dubblett-checkboxes
-re_forward_balance_costs = st.session_state["re_forward_balance_costs"]
-
-
-# ---------- Checkbox: Elhandlaren använder DA pris som slutkundspris ----------
-use_da_price = st.checkbox(
-    "Använd DA pris som slutkundens elpris",
-    value=False,
-    key="use_da_price",
-    help="När ikryssad sätts slutkundens elpris = P_DA istället för att räknas från kostnad/volym."
-)
-
-
-
-
-# ---------- TABELL 3: Elhandlare / RE (Scenario 1–5) ----------
-# ---------- TABELL 3: Elhandlare / RE (Scenario 1–5) ----------
-# ---------- TABELL 3: Elhandlare / RE (Scenario 1a–5b) ----------
-st.markdown("## RE")
-
-def _re_metrics_v4(
-    m_brp: dict,
-    e_cons: float,
-    obalansjust_mwh: float,
-    with_comp: bool,
-    re_sign: int = +1,  # +1 = RE får från BSP, -1 = RE betalar BSP
-):
-    re_forward_balance_costs = st.session_state.get("re_forward_balance_costs", True)
-    use_da_as_customer_price = st.session_state.get("use_da_as_customer_price", False)
-
-    # BRP → RE
-    re_inkop_eur = -abs(m_brp["Handel"]) * P_DA
-    re_balansfakt_eur = -m_brp["Obalanskostnad som faktureras"] if brp_forward_balance_costs else 0.0
-
-    # Kompensation (RE ↔ BSP)
-    re_comp_vol_mwh = obalansjust_mwh if with_comp else 0.0
-    re_comp_eur = re_sign * re_comp_vol_mwh * P_RECOMP   # + intäkt för RE / − kostnad för RE
-
-    # Vad skickas vidare till kund?
-    balans_till_kund_eur = re_balansfakt_eur if re_forward_balance_costs else 0.0
-
-    # Total kostnad som ska faktureras (belopp, ej pris)
-    re_kostnad_att_fakturera_eur = -(re_inkop_eur + balans_till_kund_eur + re_comp_eur)
-
-    # Volym till kund
-    re_cust_vol_mwh = e_cons
-
-    # Kostnadsbaserat snittpris (används om man inte låser till DA-pris)
-    if re_cust_vol_mwh:
-        pris_kund_kostnadsbas = re_kostnad_att_fakturera_eur / re_cust_vol_mwh
-    else:
-        pris_kund_kostnadsbas = 0.0
-
-    # (NYTT) Slutkundens elpris: använd DA-pris om checkboxen är ikryssad
-    if st.session_state.get("use_da_price", False):
-        slutkund_elpris_per_mwh = P_DA
-    else:
-        slutkund_elpris_per_mwh = (
-            re_kostnad_att_fakturera_eur / re_cust_vol_mwh
-        ) if re_cust_vol_mwh else 0.0
-
-    # Kundens kostnad enligt valt pris
-    re_cust_cost_eur = re_cust_vol_mwh * slutkund_elpris_per_mwh
-
-    # RE:s resultat
-    re_net_eur = re_inkop_eur + re_balansfakt_eur + re_comp_eur + re_cust_cost_eur
-
-    # (NYTT) Snittpris för inköp el som kan faktureras
-    vol_att_fakturera = re_cust_vol_mwh
-    snittpris_inkop = (
-        re_kostnad_att_fakturera_eur / vol_att_fakturera
-    ) if vol_att_fakturera else 0.0
-
-    return {
-        "Inköpt el fakturerad av BRP": re_inkop_eur,
-        "Balanskostnad fakturerad av BRP": re_balansfakt_eur,
-        "Kompensationsvolym för flexibilitet": re_comp_vol_mwh,
-        "Kompensationsbelopp": re_comp_eur,  # + intäkt för RE / − kostnad för RE
-
-        # (NYTT namn) – var tidigare "Kostnad att fakturera kunden"
-        "Kostnad att fakturera slutkunden": re_kostnad_att_fakturera_eur,
-
-        # (NY etikett för visningen i tabellen)
-        "Volym att fakturera kunden": vol_att_fakturera,
-
-        # (NY rad)
-        "Snittpris för inköp el som kan faktureras": snittpris_inkop,
-
-        "Slutkundens elpris": slutkund_elpris_per_mwh,
-        "Kostnad som faktureras slutkund": re_cust_cost_eur,
-
-        # Bakåtkompatibilitet
-        "Volym som faktureras slutkund": re_cust_vol_mwh,
-
-        "Resultat": re_net_eur,
-    }
-
-
-# --- Definiera scenarier 1a–5b ---
-re_1a = _re_metrics_v4(m1a, E_cons_1a, E_bud_down, with_comp=False)
-re_1b = _re_metrics_v4(m1b, E_cons_1b, E_bud_up,   with_comp=False)
-re_2a = _re_metrics_v4(m2a, E_cons_2a, E_bud_down, with_comp=False)
-re_2b = _re_metrics_v4(m2b, E_cons_2b, E_bud_up,   with_comp=False)
-re_3a = _re_metrics_v4(m3a, E_cons_3a, E_akt_down, with_comp=False)
-re_3b = _re_metrics_v4(m3b, E_cons_3b, E_akt_up,   with_comp=False)
-re_4a = _re_metrics_v4(m4a, E_cons_4a, E_akt_down, with_comp=False)
-re_4b = _re_metrics_v4(m4b, E_cons_4b, E_akt_up,   with_comp=False)
-
-# 5a: RE ska ALLTID få kompensation (BSP → RE)
-re_5a = _re_metrics_v4(m5a, E_cons_5a, E_akt_down, with_comp=True,  re_sign=+1)
-
-# 5b: default ingen komp; om checkbox ✓ så betalar RE BSP
-re_5b = _re_metrics_v4(m5b, E_cons_5b, E_akt_up,   with_comp=rev_comp_5b, re_sign=-1)
-
-
-# --- Tabellstruktur ---
-re_row_specs = [
-    ("Inköpt el fakturerad av BRP", "EUR"),
-    ("Balanskostnad fakturerad av BRP", "EUR"),
-    ("Kompensationsvolym för flexibilitet", "MWh"),
-    ("Kompensationsbelopp", "EUR"),
-    ("Kostnad att fakturera slutkunden", "EUR"),
-    ("Volym att fakturera kunden", "MWh"),
-    ("Snittpris för inköp el som kan faktureras", "€/MWh"),
-    ("Slutkundens elpris", "€/MWh"),
-    ("Kostnad som faktureras slutkund", "EUR"),
-    ("Resultat", "EUR"),
-]
-
-rows_re = []
-for f, unit in re_row_specs:
-    rows_re.append((
-        f,
-        re_1a[f], re_1b[f],
-        re_2a[f], re_2b[f],
-        re_3a[f], re_3b[f],
-        re_4a[f], re_4b[f],
-        re_5a[f], re_5b[f],
-        unit
-    ))
-
-df_re = pd.DataFrame(rows_re, columns=[
-    "Fält",
-    "1a BRP=BSP, Upp – Bud/underlev.",
-    "1b BRP=BSP, Ned – Bud/underlev.",
-    "2a BRP=BSP, Upp – Bud/överlev.",
-    "2b BRP=BSP, Ned – Bud/överlev.",
-    "3a BRP=BSP, Upp – Uppmätt akt.",
-    "3b BRP=BSP, Ned – Uppmätt akt.",
-    "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-    "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-    "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-    "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-    "Enhet",
-])
-
-def _fmt_re(v, e):
-    try:
-        if e == "MWh":
-            return f"{float(v):,.0f}"
-        if e == "€/MWh":
-            return f"{float(v):,.2f}"
-        if e == "EUR":
-            return f"{float(v):,.0f}"
-    except Exception:
-        return v
-    return v
-
-for col in df_re.columns[1:-1]:
-    df_re[col] = [_fmt_re(v, e) for v, e in zip(df_re[col], df_re["Enhet"])]
-
-# ---------- (NYTT) Tooltips för RE-rader ----------
-re_row_tips = {
-    "Inköpt el fakturerad av BRP":
-        "RE:s kostnad för el som köps från BRP: −|Handel| × P_DA. Negativt värde = kostnad.",
-    "Balanskostnad fakturerad av BRP":
-        "Del av BRP:s balanskostnad som faktureras vidare till RE (beroende på om BRP vidarefakturerar).",
-    "Kompensationsvolym för flexibilitet":
-        "Volym som ligger till grund för kompensation mellan RE och BSP (ofta lika med obalansjusteringen).",
-    "Kompensationsbelopp":
-        "Belopp för kompensation mellan RE och BSP: re_sign × Kompensationsvolym × P_RECOMP.",
-    "Kostnad att fakturera slutkunden":
-        "Total kostnad (inköp + ev. balans + komp) som RE behöver täcka genom kundfakturering.",
-    "Volym att fakturera kunden":
-        "MWh som RE fakturerar slutkund för (normalt samma som kundens förbrukning E_cons).",
-    "Snittpris för inköp el som kan faktureras":
-        "Kostnadsbaserat snittpris: (Kostnad att fakturera slutkunden) / (Volym att fakturera kunden).",
-    "Slutkundens elpris":
-        "Elpris som faktiskt används mot slutkunden: antingen snittpriset eller P_DA om checkboxen är ikryssad.",
-    "Kostnad som faktureras slutkund":
-        "Beloppet på kundens faktura: Slutkundens elpris × Volym som faktureras slutkund.",
-    "Resultat":
-        "RE:s resultat i timmen: inköp från BRP + balanskostnad + kompensation + intäkt från slutkund.",
-}
-
-# Bygg tooltip-matris: samma form som df_re, fyll bara första kolumnen ("Fält")
-tooltips_re = pd.DataFrame("", index=df_re.index, columns=df_re.columns)
-for i, field in enumerate(df_re["Fält"]):
-    tooltips_re.iloc[i, 0] = re_row_tips.get(field, "")
-
-# --------- NYTT: filtrera kolumner utifrån scenario-checkboxar ---------
-# Vi återanvänder samma BRP_SCENARIO_COLUMNS som för BRP- och BSP-tabellerna
-visible_scenario_cols_re = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-# Se till att alltid ha Fält + Enhet kvar
-ordered_cols_re = ["Fält", *visible_scenario_cols_re, "Enhet"]
-
-df_re_visible = df_re[ordered_cols_re]
-tooltips_re_visible = tooltips_re[ordered_cols_re]
-
-# Skapa Styler med tooltips
-styled_re = df_re_visible.style.set_tooltips(tooltips_re_visible)
-
-# Visa tabellen med hover-tooltips på kolumnen "Fält"
-st.table(styled_re)
-
-
-
-
-# ---------- TABELL 4: Sammanställning – resultat per aktör och scenario ----------
-# ---------- TABELL 4: Sammanställning – resultat per aktör och scenario ----------
-# ---------- TABELL 4: Sammanställning – resultat per aktör och scenario ----------
-st.markdown("## Aktörers resultat per scenario")
-
-# --- Resultat per aktör & scenario (A/B) ---
-brp_1a = m1a["BRP nettokostnad"]; brp_1b = m1b["BRP nettokostnad"]
-brp_2a = m2a["BRP nettokostnad"]; brp_2b = m2b["BRP nettokostnad"]
-brp_3a = m3a["BRP nettokostnad"]; brp_3b = m3b["BRP nettokostnad"]
-brp_4a = m4a["BRP nettokostnad"]; brp_4b = m4b["BRP nettokostnad"]
-brp_5a = m5a["BRP nettokostnad"]; brp_5b = m5b["BRP nettokostnad"]
-
-bsp_1a_res = bsp_1a["BSP nettoresultat"]; bsp_1b_res = bsp_1b["BSP nettoresultat"]
-bsp_2a_res = bsp_2a["BSP nettoresultat"]; bsp_2b_res = bsp_2b["BSP nettoresultat"]
-bsp_3a_res = bsp_3a["BSP nettoresultat"]; bsp_3b_res = bsp_3b["BSP nettoresultat"]
-bsp_4a_res = bsp_4a["BSP nettoresultat"]; bsp_4b_res = bsp_4b["BSP nettoresultat"]
-bsp_5a_res = bsp_5a["BSP nettoresultat"]; bsp_5b_res = bsp_5b["BSP nettoresultat"]
-
-re_1a_res = re_1a["Resultat"]; re_1b_res = re_1b["Resultat"]
-re_2a_res = re_2a["Resultat"]; re_2b_res = re_2b["Resultat"]
-re_3a_res = re_3a["Resultat"]; re_3b_res = re_3b["Resultat"]
-re_4a_res = re_4a["Resultat"]; re_4b_res = re_4b["Resultat"]
-re_5a_res = re_5a["Resultat"]; re_5b_res = re_5b["Resultat"]
-
-# Hjälpfunktioner
-def _na_or_sum(a, b, enabled: bool):
-    return (a + b) if enabled else "NA"
-
-def _na_or_sum3(a, b, c, enabled: bool):
-    return (a + b + c) if enabled else "NA"
-
-def _na_or_value(value, enabled: bool):
-    return value if enabled else "NA"
-
-# BRP=BSP i scen 1–3 (a & b). Scen 4–5 är BRP≠BSP.
-en_brp_eq_bsp = {
-    "1a": True, "1b": True, "2a": True, "2b": True, "3a": True, "3b": True,
-    "4a": False, "4b": False, "5a": False, "5b": False
-}
-
-# Kombinerade resultat
-brp_bsp_1a = _na_or_sum(brp_1a, bsp_1a_res, en_brp_eq_bsp["1a"])
-brp_bsp_1b = _na_or_sum(brp_1b, bsp_1b_res, en_brp_eq_bsp["1b"])
-brp_bsp_2a = _na_or_sum(brp_2a, bsp_2a_res, en_brp_eq_bsp["2a"])
-brp_bsp_2b = _na_or_sum(brp_2b, bsp_2b_res, en_brp_eq_bsp["2b"])
-brp_bsp_3a = _na_or_sum(brp_3a, bsp_3a_res, en_brp_eq_bsp["3a"])
-brp_bsp_3b = _na_or_sum(brp_3b, bsp_3b_res, en_brp_eq_bsp["3b"])
-brp_bsp_4a = _na_or_sum(brp_4a, bsp_4a_res, en_brp_eq_bsp["4a"])
-brp_bsp_4b = _na_or_sum(brp_4b, bsp_4b_res, en_brp_eq_bsp["4b"])
-brp_bsp_5a = _na_or_sum(brp_5a, bsp_5a_res, en_brp_eq_bsp["5a"])
-brp_bsp_5b = _na_or_sum(brp_5b, bsp_5b_res, en_brp_eq_bsp["5b"])
-
-total_1a = _na_or_sum3(brp_1a, bsp_1a_res, re_1a_res, en_brp_eq_bsp["1a"])
-total_1b = _na_or_sum3(brp_1b, bsp_1b_res, re_1b_res, en_brp_eq_bsp["1b"])
-total_2a = _na_or_sum3(brp_2a, bsp_2a_res, re_2a_res, en_brp_eq_bsp["2a"])
-total_2b = _na_or_sum3(brp_2b, bsp_2b_res, re_2b_res, en_brp_eq_bsp["2b"])
-total_3a = _na_or_sum3(brp_3a, bsp_3a_res, re_3a_res, en_brp_eq_bsp["3a"])
-total_3b = _na_or_sum3(brp_3b, bsp_3b_res, re_3b_res, en_brp_eq_bsp["3b"])
-total_4a = _na_or_sum3(brp_4a, bsp_4a_res, re_4a_res, en_brp_eq_bsp["4a"])
-total_4b = _na_or_sum3(brp_4b, bsp_4b_res, re_4b_res, en_brp_eq_bsp["4b"])
-total_5a = _na_or_sum3(brp_5a, bsp_5a_res, re_5a_res, en_brp_eq_bsp["5a"])
-total_5b = _na_or_sum3(brp_5b, bsp_5b_res, re_5b_res, en_brp_eq_bsp["5b"])
-
-# --- Målresultat (Scenario 5a – BSP resultat) ---
-goal_value = bsp_5a_res  # välj 5a (nedreglering) som referens
-goal_row = (
-    "Målresultat för aktör (Scenario 5a – BSP resultat)",
-    _na_or_value(goal_value, True),  _na_or_value(goal_value, True),
-    _na_or_value(goal_value, True),  _na_or_value(goal_value, True),
-    _na_or_value(goal_value, True),  _na_or_value(goal_value, True),
-    _na_or_value(goal_value, False), _na_or_value(goal_value, False),
-    _na_or_value(goal_value, False), _na_or_value(goal_value, False),
-    "EUR/NA",
-)
-
-def _diff_or_na(goal, total, enabled: bool):
-    if not enabled or isinstance(total, str):
-        return "NA"
-    return goal - total
-
-diff_row = (
-    "Avvikelse mot aktörers målresultat",
-    _diff_or_na(goal_value, total_1a, en_brp_eq_bsp["1a"]),
-    _diff_or_na(goal_value, total_1b, en_brp_eq_bsp["1b"]),
-    _diff_or_na(goal_value, total_2a, en_brp_eq_bsp["2a"]),
-    _diff_or_na(goal_value, total_2b, en_brp_eq_bsp["2b"]),
-    _diff_or_na(goal_value, total_3a, en_brp_eq_bsp["3a"]),
-    _diff_or_na(goal_value, total_3b, en_brp_eq_bsp["3b"]),
-    _diff_or_na(goal_value, total_4a, en_brp_eq_bsp["4a"]),
-    _diff_or_na(goal_value, total_4b, en_brp_eq_bsp["4b"]),
-    _diff_or_na(goal_value, total_5a, en_brp_eq_bsp["5a"]),
-    _diff_or_na(goal_value, total_5b, en_brp_eq_bsp["5b"]),
-    "EUR/NA",
-)
-
-# --- Tabellinnehåll (10 kolumner: 1a–5b) ---
-rows_sum = [
-    ("BRP resultat",                brp_1a,       brp_1b,       brp_2a,       brp_2b,       brp_3a,       brp_3b,       brp_4a,       brp_4b,       brp_5a,       brp_5b,       "EUR"),
-    ("BSP resultat",                bsp_1a_res,   bsp_1b_res,   bsp_2a_res,   bsp_2b_res,   bsp_3a_res,   bsp_3b_res,   bsp_4a_res,   bsp_4b_res,   bsp_5a_res,   bsp_5b_res,   "EUR"),
-    ("Elhandlare resultat",         re_1a_res,    re_1b_res,    re_2a_res,    re_2b_res,    re_3a_res,    re_3b_res,    re_4a_res,    re_4b_res,    re_5a_res,    re_5b_res,    "EUR"),
-    ("BRP+BSP resultat",            brp_bsp_1a,   brp_bsp_1b,   brp_bsp_2a,   brp_bsp_2b,   brp_bsp_3a,   brp_bsp_3b,   brp_bsp_4a,   brp_bsp_4b,   brp_bsp_5a,   brp_bsp_5b,   "EUR/NA"),
-    ("BRP+BSP+Elhandlare resultat", total_1a,     total_1b,     total_2a,     total_2b,     total_3a,     total_3b,     total_4a,     total_4b,     total_5a,     total_5b,     "EUR/NA"),
-    goal_row,
-    diff_row,
-]
-
-df_sum = pd.DataFrame(
-    rows_sum,
-    columns=[
-        "Fält",
-        "1a BRP=BSP, Upp – Bud/underlev.",
-        "1b BRP=BSP, Ned – Bud/underlev.",
-        "2a BRP=BSP, Upp – Bud/överlev.",
-        "2b BRP=BSP, Ned – Bud/överlev.",
-        "3a BRP=BSP, Upp – Uppmätt akt.",
-        "3b BRP=BSP, Ned – Uppmätt akt.",
-        "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-        "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-        "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-        "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-        "Enhet",
-    ],
-)
-
-def _fmt_any(v, unit):
-    if isinstance(v, str):
-        return v
-    try:
-        if unit in ("EUR", "EUR/NA"):
-            return f"{float(v):,.0f}"
-        if unit == "€/MWh":
-            return f"{float(v):,.2f}"
-        if unit == "MWh":
-            return f"{float(v):,.0f}"
-    except Exception:
-        return str(v)
-    return str(v)
-
-for col in df_sum.columns[1:-1]:
-    df_sum[col] = [_fmt_any(v, u) for v, u in zip(df_sum[col], df_sum["Enhet"])]
-
-# ---------- (NYTT) Tooltips för sammanställningen ----------
-sum_row_tips = {
-    "BRP resultat":
-        "BRP:s nettokostnad per scenario (från Tabell 1). Negativt = kostnad, positivt = intäkt.",
-    "BSP resultat":
-        "BSP:s nettoresultat per scenario (från Tabell 2). Positivt = intäkt, negativt = kostnad.",
-    "Elhandlare resultat":
-        "Elhandlarens (RE:s) nettoresultat per scenario (från Tabell 3). Positivt = vinst, negativt = förlust.",
-    "BRP+BSP resultat":
-        "Summa BRP resultat + BSP resultat i scenarion där BRP=BSP (1a–3b). I övriga scenarion visas 'NA'.",
-    "BRP+BSP+Elhandlare resultat":
-        "Totalsumma för BRP + BSP + RE i scenarion där BRP=BSP (1a–3b). Ger systemets samlade resultat.",
-    "Målresultat för aktör (Scenario 5a – BSP resultat)":
-        "Mål-/referensnivå: BSP:s nettoresultat i scenario 5a (nedreglering). Används som benchmark.",
-    "Avvikelse mot aktörers målresultat":
-        "Skillnad mellan målresultatet (5a, BSP) och totalsumman per scenario. "
-        "Positivt = bättre än mål, negativt = sämre. 'NA' där jämförelse inte är relevant.",
-}
-
-tooltips_sum = pd.DataFrame("", index=df_sum.index, columns=df_sum.columns)
-for i, field in enumerate(df_sum["Fält"]):
-    tooltips_sum.iloc[i, 0] = sum_row_tips.get(field, "")
-
-# ------- Scenario-kolumnfiltrering (samma logik som Tabell 1–3) -------
-
-# BRP_SCENARIO_COLUMNS är samma dict som används av BRP/BSP/RE:
-# { "1a": "1a BRP=BSP, Upp – Bud/underlev.",  ... }
-
-visible_scenario_cols_sum = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-# Nya kolumnordningen
-ordered_cols_sum = ["Fält", *visible_scenario_cols_sum, "Enhet"]
-
-df_sum_visible = df_sum[ordered_cols_sum]
-tooltips_sum_visible = tooltips_sum[ordered_cols_sum]
-
-# ------- Skapa styler med tooltips -------
-styled_sum = df_sum_visible.style.set_tooltips(tooltips_sum_visible)
-
-# ------- Visa tabellen -------
-st.table(styled_sum)
-
-
-
-
-
-
-
-
-# ---------- TABELL 5: Slutkundens elpris per scenario ----------
-# ---------- TABELL 5: Slutkundens elpris per scenario ----------
-# ---------- TABELL 5: Slutkundens elpris per scenario ----------
-st.markdown("## Slutkundens elpris per scenario")
-
-# Pris per scenario (hämtat från RE-tabellen), A/B
-def _price_from_re(re_row: dict) -> float:
-    # Läs direkt från RE-tabellen så checkboxen "Använd DA pris…" får effekt
-    return re_row["Slutkundens elpris"]
-
-
-price_1a = _price_from_re(re_1a); price_1b = _price_from_re(re_1b)
-price_2a = _price_from_re(re_2a); price_2b = _price_from_re(re_2b)
-price_3a = _price_from_re(re_3a); price_3b = _price_from_re(re_3b)
-price_4a = _price_from_re(re_4a); price_4b = _price_from_re(re_4b)
-price_5a = _price_from_re(re_5a); price_5b = _price_from_re(re_5b)
-
-# Målpris = scenario 5a (ned). Byt till price_5b om du vill jämföra mot upp.
-goal_price_value = price_5a
-
-def _fmt_any(v, unit):
-    if isinstance(v, str):
-        return v
-    try:
-        if unit in ("EUR", "EUR/NA"):
-            return f"{float(v):,.0f}"
-        if unit == "€/MWh":
-            return f"{float(v):,.2f}"
-        return v
-    except Exception:
-        return v
-
-def _diff_price(goal, price):
-    try:
-        return price - goal
-    except Exception:
-        return "NA"
-
-def _extra_cost(diff, volume):
-    try:
-        return diff * volume
-    except Exception:
-        return "NA"
-
-# Avvikelser mot målpris
-diff_1a = _diff_price(goal_price_value, price_1a); diff_1b = _diff_price(goal_price_value, price_1b)
-diff_2a = _diff_price(goal_price_value, price_2a); diff_2b = _diff_price(goal_price_value, price_2b)
-diff_3a = _diff_price(goal_price_value, price_3a); diff_3b = _diff_price(goal_price_value, price_3b)
-diff_4a = _diff_price(goal_price_value, price_4a); diff_4b = _diff_price(goal_price_value, price_4b)
-diff_5a = _diff_price(goal_price_value, price_5a); diff_5b = _diff_price(goal_price_value, price_5b)
-
-# Ökad totalkostnad = diff * volym (volym per scenario)
-extra_1a = _extra_cost(diff_1a, re_1a["Volym som faktureras slutkund"])
-extra_1b = _extra_cost(diff_1b, re_1b["Volym som faktureras slutkund"])
-extra_2a = _extra_cost(diff_2a, re_2a["Volym som faktureras slutkund"])
-extra_2b = _extra_cost(diff_2b, re_2b["Volym som faktureras slutkund"])
-extra_3a = _extra_cost(diff_3a, re_3a["Volym som faktureras slutkund"])
-extra_3b = _extra_cost(diff_3b, re_3b["Volym som faktureras slutkund"])
-extra_4a = _extra_cost(diff_4a, re_4a["Volym som faktureras slutkund"])
-extra_4b = _extra_cost(diff_4b, re_4b["Volym som faktureras slutkund"])
-extra_5a = _extra_cost(diff_5a, re_5a["Volym som faktureras slutkund"])
-extra_5b = _extra_cost(diff_5b, re_5b["Volym som faktureras slutkund"])
-
-rows_cust = [
-    (
-        "Slutkundens elpris (från RE-tabellen)",
-        price_1a, price_1b, price_2a, price_2b, price_3a, price_3b, price_4a, price_4b, price_5a, price_5b,
-        "€/MWh",
-    ),
-    (
-        "Målresultat för slutkunds elpris (Scenario 5a – Slutkundens elpris)",
-        goal_price_value, goal_price_value, goal_price_value, goal_price_value, goal_price_value,
-        goal_price_value, goal_price_value, goal_price_value, goal_price_value, goal_price_value,
-        "€/MWh",
-    ),
-    (
-        "Avvikelse slutkundens elpris",
-        diff_1a, diff_1b, diff_2a, diff_2b, diff_3a, diff_3b, diff_4a, diff_4b, diff_5a, diff_5b,
-        "€/MWh",
-    ),
-    (
-        "Ökad totalkostnad slutkund",
-        extra_1a, extra_1b, extra_2a, extra_2b, extra_3a, extra_3b, extra_4a, extra_4b, extra_5a, extra_5b,
-        "EUR",
-    ),
-]
-
-df_cust = pd.DataFrame(
-    rows_cust,
-    columns=[
-        "Fält",
-        "1a BRP=BSP, Upp – Bud/underlev.",
-        "1b BRP=BSP, Ned – Bud/underlev.",
-        "2a BRP=BSP, Upp – Bud/överlev.",
-        "2b BRP=BSP, Ned – Bud/överlev.",
-        "3a BRP=BSP, Upp – Uppmätt akt.",
-        "3b BRP=BSP, Ned – Uppmätt akt.",
-        "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-        "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-        "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-        "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-        "Enhet",
-    ],
-)
-
-for col in df_cust.columns[1:-1]:
-    df_cust[col] = [_fmt_any(v, u) for v, u in zip(df_cust[col], df_cust["Enhet"])]
-
-# ---------- (NYTT) Tooltips för kundpris-tabellen ----------
-cust_row_tips = {
-    "Slutkundens elpris (från RE-tabellen)":
-        "Det elpris per MWh som kunden faktiskt betalar i varje scenario, hämtat direkt från RE-tabellen "
-        "(påverkas av checkboxen 'Använd DA pris…').",
-    "Målresultat för slutkunds elpris (Scenario 5a – Slutkundens elpris)":
-        "Mål-/referenspris för slutkunden: slutkundens elpris i scenario 5a (nedreglering). Används som jämförelsenivå.",
-    "Avvikelse slutkundens elpris":
-        "Skillnad mellan kundens pris i respektive scenario och målpriset (5a). "
-        "Positivt värde = dyrare än mål, negativt = billigare än mål.",
-    "Ökad totalkostnad slutkund":
-        "Extra (eller minskad) total kostnad i EUR för kunden jämfört med målpris: "
-        "Avvikelse i pris × volym som faktureras slutkund i scenariot.",
-}
-
-tooltips_cust = pd.DataFrame("", index=df_cust.index, columns=df_cust.columns)
-for i, field in enumerate(df_cust["Fält"]):
-    tooltips_cust.iloc[i, 0] = cust_row_tips.get(field, "")
-
-# -------- Scenario-kolumnfiltrering för Tabell 5 --------
-# Använder samma BRP_SCENARIO_COLUMNS och show_brp_* som övriga tabeller
-
-visible_scenario_cols_cust = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-ordered_cols_cust = ["Fält", *visible_scenario_cols_cust, "Enhet"]
-
-df_cust_visible = df_cust[ordered_cols_cust]
-tooltips_cust_visible = tooltips_cust[ordered_cols_cust]
-
-# Skapa Styler med tooltips på "Fält"-kolumnen
-styled_cust = df_cust_visible.style.set_tooltips(tooltips_cust_visible)
-
-# Visa tabellen
-st.table(styled_cust)
-
-# Tillåt omvänd neutralisering till/från slutkund
-allow_reverse_neutral = st.checkbox(
-    "Tillåt omvänd neutralisering till/från slutkund",
-    value=False,
-    help="Om ikryssad neutraliseras även lägre kundpris än målpris (kund betalar tillbaka)."
-)
-
-
-
-# ---------- TABELL 6: Aktörers resultat efter kompensation (A/B) ----------
-st.markdown("## Aktörers resultat efter kompensation")
-
-def _safe_float(x):
-    try:
-        return float(x)
-    except (TypeError, ValueError):
-        return None
-
-def _comp_need(val, allow_reverse: bool):
-    v = _safe_float(val) or 0.0
-    return v if allow_reverse else (v if v > 0 else 0.0)
-
-def _base_result(total, bsp):
-    t_val = _safe_float(total)
-    b_val = _safe_float(bsp)
-    return t_val if t_val is not None else (b_val if b_val is not None else 0.0)
-
-def _subtract_base(total, bsp, comp):
-    base = _base_result(total, bsp)
-    c_val = _safe_float(comp) or 0.0
-    return base - c_val
-
-# Kompensationsbehov = max(0, ökad totalkostnad) eller signerat om omvänd neutralisering
-comp_need_1a = _comp_need(extra_1a, allow_reverse_neutral); comp_need_1b = _comp_need(extra_1b, allow_reverse_neutral)
-comp_need_2a = _comp_need(extra_2a, allow_reverse_neutral); comp_need_2b = _comp_need(extra_2b, allow_reverse_neutral)
-comp_need_3a = _comp_need(extra_3a, allow_reverse_neutral); comp_need_3b = _comp_need(extra_3b, allow_reverse_neutral)
-comp_need_4a = _comp_need(extra_4a, allow_reverse_neutral); comp_need_4b = _comp_need(extra_4b, allow_reverse_neutral)
-comp_need_5a = _comp_need(extra_5a, allow_reverse_neutral); comp_need_5b = _comp_need(extra_5b, allow_reverse_neutral)
-
-# Resultat efter kompensation
-tot_after_1a = _subtract_base(total_1a, bsp_1a_res, comp_need_1a)
-tot_after_1b = _subtract_base(total_1b, bsp_1b_res, comp_need_1b)
-tot_after_2a = _subtract_base(total_2a, bsp_2a_res, comp_need_2a)
-tot_after_2b = _subtract_base(total_2b, bsp_2b_res, comp_need_2b)
-tot_after_3a = _subtract_base(total_3a, bsp_3a_res, comp_need_3a)
-tot_after_3b = _subtract_base(total_3b, bsp_3b_res, comp_need_3b)
-tot_after_4a = _subtract_base(total_4a, bsp_4a_res, comp_need_4a)
-tot_after_4b = _subtract_base(total_4b, bsp_4b_res, comp_need_4b)
-tot_after_5a = _subtract_base(total_5a, bsp_5a_res, comp_need_5a)
-tot_after_5b = _subtract_base(total_5b, bsp_5b_res, comp_need_5b)
-
-label_neutral = (
-    "Neutralisering till/från slutkund"
-    if allow_reverse_neutral
-    else "Kompensation till slutkund för neutralisering"
-)
-
-rows_comp_total = [
-    (
-        label_neutral,
-        comp_need_1a, comp_need_1b, comp_need_2a, comp_need_2b,
-        comp_need_3a, comp_need_3b, comp_need_4a, comp_need_4b,
-        comp_need_5a, comp_need_5b,
-        "EUR",
-    ),
-    (
-        "Aktörers resultat efter kompensation",
-        tot_after_1a, tot_after_1b, tot_after_2a, tot_after_2b,
-        tot_after_3a, tot_after_3b, tot_after_4a, tot_after_4b,
-        tot_after_5a, tot_after_5b,
-        "EUR",
-    ),
-]
-
-df_comp_total = pd.DataFrame(
-    rows_comp_total,
-    columns=[
-        "Fält",
-        "1a BRP=BSP, Upp – Bud/underlev.",
-        "1b BRP=BSP, Ned – Bud/underlev.",
-        "2a BRP=BSP, Upp – Bud/överlev.",
-        "2b BRP=BSP, Ned – Bud/överlev.",
-        "3a BRP=BSP, Upp – Uppmätt akt.",
-        "3b BRP=BSP, Ned – Uppmätt akt.",
-        "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
-        "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
-        "5a BRP≠BSP, Upp – Uppmätt (med komp)",
-        "5b BRP≠BSP, Ned – Uppmätt (med komp)",
-        "Enhet",
-    ],
-)
-
-for col in df_comp_total.columns[1:-1]:
-    df_comp_total[col] = [_fmt_any(v, u) for v, u in zip(df_comp_total[col], df_comp_total["Enhet"])]
-
-# ---------- (NYTT) Tooltips för kompensations-tabellen ----------
-comp_row_tips = {
-    label_neutral:
-        "Belopp som överförs till/från slutkund för att neutralisera prisavvikelsen: "
-        "beräknas från ‘Ökad totalkostnad slutkund’. "
-        "Om ‘omvänd neutralisering’ är urkryssad tas bara positiva belopp med.",
-    "Aktörers resultat efter kompensation":
-        "Samlat resultat för alla aktörer efter att neutraliserings-/kompensationsbeloppet "
-        "dragits från utgångsresultatet (totalresultat eller BSP-resultat om total saknas).",
-}
-
-tooltips_comp_total = pd.DataFrame("", index=df_comp_total.index, columns=df_comp_total.columns)
-for i, field in enumerate(df_comp_total["Fält"]):
-    tooltips_comp_total.iloc[i, 0] = comp_row_tips.get(field, "")
-
-# -------- Scenario-kolumnfiltrering för Tabell 6 --------
-visible_scenario_cols_comp = [
-    full_label
-    for short_key, full_label in BRP_SCENARIO_COLUMNS.items()
-    if st.session_state.get(f"show_brp_{short_key}", True)
-]
-
-ordered_cols_comp = ["Fält", *visible_scenario_cols_comp, "Enhet"]
-
-df_comp_total_visible = df_comp_total[ordered_cols_comp]
-tooltips_comp_total_visible = tooltips_comp_total[ordered_cols_comp]
-
-styled_comp_total = df_comp_total_visible.style.set_tooltips(tooltips_comp_total_visible)
-
-# Visa med hover-tooltips på kolumnen "Fält"
-st.table(styled_comp_total)
-
-st.caption(
-    "Neutralisering = prisavvikelse × volym. Om ‘omvänd neutralisering’ är ikryssad kan beloppet vara negativt (kunden betalar tillbaka)."
-)
-
-
-
-
-# ---------- Export: Excel med alla tabeller ----------
-from io import BytesIO
-from datetime import datetime
-import pandas as pd
-
-def _to_excel_sheets(sheets: dict) -> BytesIO:
-    output = BytesIO()
-    try:
-        # Försök använda XlsxWriter om det finns
-        writer_engine = "xlsxwriter"
-        import xlsxwriter
-    except ImportError:
-        # Annars använd openpyxl
-        writer_engine = "openpyxl"
-
-    with pd.ExcelWriter(output, engine=writer_engine) as writer:
-        for sheet_name, df in sheets.items():
-            safe_name = sheet_name[:31]
-            df.to_excel(writer, index=False, sheet_name=safe_name)
-
-            # Autofit fungerar bara om XlsxWriter används
-            if writer_engine == "xlsxwriter":
-                ws = writer.sheets[safe_name]
-                for col_idx, col in enumerate(df.columns):
-                    try:
-                        max_len = max(
-                            len(str(col)),
-                            int(df[col].astype(str).str.len().max() or 0)
-                        )
-                    except Exception:
-                        max_len = len(str(col))
-                    ws.set_column(col_idx, col_idx, min(50, max(12, max_len + 2)))
-
-    output.seek(0)
-    return output
-
-
-# Samla alla dina DataFrames här:
-sheets = {
-    "BRP": df_brp,
-    "BSP": df_bsp,
-    "RE": df_re,
-    "Sammanställning": df_sum,
-    "Slutkundens elpris": df_cust,
-    "Kompensation": df_comp_total,
-}
-
-excel_bytes = _to_excel_sheets(sheets)
-
-st.download_button(
-    label="📥 Exportera Excel (alla tabeller)",
-    data=excel_bytes,
-    file_name=f"scenarios_{datetime.now().strftime('%Y-%m-%d_%H%M')}.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    help="Laddar ner en Excel-fil med ett blad per tabell."
-)
-
-
-
-
-
-
-
-
-
-
-
-
-
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timedelta
+from functools import partial
+from io import BytesIO
+
+import streamlit as st
+import numpy as np
+import pandas as pd
+
+from engine import (
+    DEFAULT_PARAMS, SCENARIOS, TARGET_SCENARIO, by_actor, deviation_matrix, required_scenarios, settle, summarize,
+)
+from invariants import check_invariants
+from timeseries import read_series_csv, series_values
+from charts import downsample_long, page_count, result_page
+from store import DEFAULT_STORE, INDEX_FILE, list_series, open_series
+from live import DEFAULT_INBOX, InboxFeed, LiveSettlement
+from export import EXPORT_FORMATS, write_export
+from linear import compile_operator
+from zones import ALL_ZONES, settle_zones, zone_totals
+from pricepaths import BLOCK_MTU, EXACT_PATHS, STATISTICS, bootstrap_paths, distribution, evaluate_paths, sketch_paths
+from formatting import UNIT_COLUMN_FORMATS, row_tooltips, style_by_unit, style_matrix
+from ladder import ladder_params, read_bids
+from rebound import KERNEL_SHAPES, apply_rebound, rebound_kernel
+from storage import storage_params
+from tariffs import ALL_CONTRACTS, CONTRACTS, PEAK_HOURS, customer_settlement, peak_mask, read_customers, tariff_summary
+from compensation import INVOICE_COLUMNS, log_invoices, read_site_mapping
+from backtest import (
+    BACKTEST_SCENARIOS, PERIODS, REPORT_FIELDS, backtest, backtest_report, backtest_sketch, read_activation_log,
+)
+from sketches import SKETCH_STATISTICS, ResultSketch
+from assets import (
+    ACTOR_TABLES, BACKTEST_SCENARIO_COLUMNS, BRP_ROW_SPECS, BSP_ROW_SPECS, COMP_ROW_SPECS, CUST_ROW_SPECS, DEVIATION_UNITS,
+    LIVE_ROW_SPECS, PAGE_CSS, RE_ROW_SPECS, ROW_TIPS, SCENARIO_COLUMNS, SCENARIO_NOTES, SUM_ROW_SPECS, TARIFF_ROW_SPECS,
+    TARIFF_ROW_TIPS,
+)
+
+st.set_page_config(page_title="Scenariosimulator för BRP&BSP", layout="wide")
+
+
+# Tillåt radbryt i rubriker för både DataFrame och DataEditor
+st.markdown(PAGE_CSS, unsafe_allow_html=True)
+
+
+# ---------- Sidopanel: Parametrar (i angiven ordning) ----------
+st.sidebar.title("Parametrar")
+
+# 1) DA Handelsvolym (standard 100 MWh)
+V_DA  = st.sidebar.number_input(
+    "DA Handelsvolym (MWh)", min_value=0.0, value=100.0, step=1.0, format="%.0f"
+)
+
+# Handelstyp styr tecknet i tabellen (köp = negativ rad, sälj = positiv rad)
+handel_typ = st.sidebar.radio(
+    "Handelstyp",
+    ["Köp (visa negativ i tabell)", "Sälj (visa positiv i tabell)"],
+    index=0,
+)
+
+# --- Uppmätt förbrukning (default 92% av DA-handeln, avrundat till heltal) ---
+default_e_cons = int(round(0.92 * V_DA))  # 92% och närmaste heltal
+E_cons = st.sidebar.number_input(
+    "Uppmätt förbrukning E_cons (MWh)",
+    min_value=0.0,
+    value=float(default_e_cons),
+    step=1.0,
+    format="%.0f",
+    help="Default sätts till 92% av DA-handeln, avrundat till heltal."
+)
+
+# 2) Budstorlek
+E_bud = st.sidebar.number_input("Budstorlek E_bud (MWh)", min_value=0.0, value=10.0, step=0.5, format="%.3f")
+# 3) Uppmätt aktivering (för jämförelser/Scenario 3–5)
+E_akt = st.sidebar.number_input("Uppmätt aktivering E_akt (MWh)", min_value=0.0, value=8.0, step=0.5, format="%.3f")
+
+# 4) Pris DA (standard 2 €/MWh)
+P_DA  = st.sidebar.number_input(
+    "Pris DA P_DA (EUR/MWh)", min_value=-200.0, value=2.0, step=0.5, format="%.2f"
+)
+# 5) Pris Obalanskostnad (standard 5 €/MWh)
+P_IMB = st.sidebar.number_input(
+    "Pris Obalanskostnad P_IMB (EUR/MWh)", min_value=-200.0, value=5.0, step=0.5, format="%.2f"
+)
+
+# Tecken för handel i tabellen
+handel_sign = -1 if "Köp" in handel_typ else 1
+
+# 6) BSP ersättningspris = obalanspris (checkbox, default)
+use_imb_for_comp = st.sidebar.checkbox("BSP ersättningspris = obalanspris",
+                                       value=DEFAULT_PARAMS["use_imb_for_comp"])
+P_comp_custom    = st.sidebar.number_input(
+    "BSP annat ersättningspris P_COMP (EUR/MWh)",
+    min_value=-200.0, value=7.0, step=1.0, format="%.2f",
+    disabled=use_imb_for_comp
+)
+P_COMP = P_IMB if use_imb_for_comp else P_comp_custom
+
+# 7) BSP avdrag över/underleverans = obalanspris (checkbox, default)
+use_imb_for_pen  = st.sidebar.checkbox("BSP avdrag över/underleverans = obalanspris",
+                                       value=DEFAULT_PARAMS["use_imb_for_pen"])
+P_pen_custom     = st.sidebar.number_input(
+    "BSP avdragspris P_PEN (EUR/MWh)",
+    min_value=-200.0, value=9.0, step=1.0, format="%.2f",
+    disabled=use_imb_for_pen
+)
+P_PEN = P_IMB if use_imb_for_pen else P_pen_custom
+
+# --- RE-komp (parametrar, används ej i scen 1 just nu; scen 4–5 styrs av scenariot) ---
+re_comp_is_da = st.sidebar.checkbox("Kompensationspris till RE = DA (P_DA)",
+                                    value=DEFAULT_PARAMS["re_comp_is_da"])
+re_comp_custom = st.sidebar.number_input(
+    "Annat kompensationspris till RE (EUR/MWh)",
+    min_value=-200.0, value=4.0, step=1.0, format="%.2f",
+    disabled=re_comp_is_da
+)
+P_RECOMP = P_DA if re_comp_is_da else re_comp_custom
+
+# --- Kapacitetsmarknad (mFRR-kapacitet/FCR): ersättning per MW och timme utöver aktiveringen ---
+with st.sidebar.expander("Kapacitetsmarknad"):
+    C_cap = st.number_input("Upphandlad kapacitet C_cap (MW)", min_value=0.0, value=0.0, step=1.0, format="%.3f")
+    P_CAP = st.number_input("Kapacitetspris P_CAP (EUR/MW,h)", min_value=-200.0, value=0.0, step=1.0, format="%.2f")
+    check_availability = st.checkbox(
+        "Kontrollera tillgänglighet mot mätdata", value=False,
+        help="Otillgänglig kapacitet max(C_cap − C_avail, 0) ersätts inte och ger avdrag P_CAP_PEN. "
+             "C_avail kan anges per MTU som kolumn i tidsserien.",
+    )
+    C_avail = st.number_input("Tillgänglig kapacitet C_avail (MW)", min_value=0.0, value=C_cap, step=1.0,
+                              format="%.3f", disabled=not check_availability)
+    P_CAP_PEN = st.number_input("Avdrag otillgänglighet P_CAP_PEN (EUR/MW,h)", min_value=-200.0, value=0.0,
+                                step=1.0, format="%.2f", disabled=not check_availability)
+
+# ---------- Tidsserie per MTU (valfri) ----------
+st.sidebar.markdown("---")
+stored_series = list_series(DEFAULT_STORE)
+stored_zones = sorted({area for area, _ in stored_series})
+series_sources = ["Uppladdad CSV", "Lokal datalagring"] if stored_series else ["Uppladdad CSV"]
+if len(stored_zones) > 1:
+    series_sources.append("Elområden (lagring)")
+series_source = st.sidebar.radio("Tidsserie per MTU", [*series_sources, "Live (inkorg)"], horizontal=True)
+
+series_file = None
+store_selection = None
+zone_selection = None
+live_inbox = None
+if series_source == "Live (inkorg)":
+    live_inbox = st.sidebar.text_input(
+        "Inkorg",
+        value=DEFAULT_INBOX,
+        help="Katalog där nya CSV-filer (samma format som uppladdningen) läggs under dygnet. "
+             "Nya och korrigerade MTU läggs till de löpande summorna.",
+    )
+    live_refresh = st.sidebar.number_input("Uppdatera var (sekunder)", min_value=5, max_value=900, value=30, step=5)
+elif series_source == "Uppladdad CSV":
+    series_file = st.sidebar.file_uploader(
+        "Tidsserie per MTU (CSV)",
+        type=["csv"],
+        help="En rad per MTU med valfria kolumner tid, P_DA, P_IMB, E_cons, E_bud, E_akt, C_cap, C_avail. "
+             "Saknade kolumner tas från parametrarna ovan. Avräknas för synliga scenarier och visas som diagram.",
+    )
+elif series_source == "Lokal datalagring":
+    area_site = st.sidebar.selectbox(
+        "Elområde / anläggning",
+        sorted(stored_series),
+        format_func=lambda k: f"{k[0]} / {k[1]}",
+        help="Serier konverterade med `python store.py convert`. Läses via minnesmappning.",
+    )
+    first, last, _ = stored_series[area_site]
+    date_range = st.sidebar.date_input(
+        "Datumintervall",
+        value=(max(first.date(), last.date() - timedelta(days=30)), last.date()),
+        min_value=first.date(),
+        max_value=last.date(),
+    )
+    if len(date_range) == 2:
+        store_selection = (*area_site, date_range[0].isoformat(), date_range[1].isoformat())
+elif series_source == "Elområden (lagring)":
+    # En lagrad anläggning per elområde; alla områden avräknas i samma anrop
+    zone_sites = {}
+    for zone in st.sidebar.multiselect("Elområden", stored_zones, default=stored_zones, key="zone_areas"):
+        sites = sorted(site for area, site in stored_series if area == zone)
+        zone_sites[zone] = st.sidebar.selectbox(f"Anläggning {zone}", sites, key=f"zone_site_{zone}")
+    if zone_sites:
+        zone_spans = [stored_series[z, site] for z, site in zone_sites.items()]
+        first, last = max(s[0] for s in zone_spans), min(s[1] for s in zone_spans)
+        if first > last:
+            st.sidebar.warning("De valda serierna har ingen gemensam tidsperiod.")
+        else:
+            zone_range = st.sidebar.date_input(
+                "Datumintervall (alla elområden)",
+                value=(max(first.date(), last.date() - timedelta(days=30)), last.date()),
+                min_value=first.date(),
+                max_value=last.date(),
+                key="zone_range",
+            )
+            if len(zone_range) == 2:
+                zone_selection = (
+                    tuple(zone_sites.items()), zone_range[0].isoformat(), zone_range[1].isoformat(),
+                )
+
+bids_file = None
+if series_source in ("Uppladdad CSV", "Lokal datalagring"):
+    bids_file = st.sidebar.file_uploader(
+        "Budstege per MTU (CSV, valfri)",
+        type=["csv"],
+        help="En rad per bud: tid (eller mtu), riktning (upp/ned), pris och volym. Bud i merit order "
+             "aktiveras mot obalanspriset och ger E_bud per MTU; levererad volym E_akt tas ur tidsserien "
+             "om den finns, annars full leverans.",
+    )
+
+battery = ()
+rebound_kernel_values = ()
+if series_source in ("Uppladdad CSV", "Lokal datalagring"):
+    with st.sidebar.expander("Batteri (laddningsnivå)"):
+        use_battery = st.checkbox(
+            "Flexibiliteten är ett batteri", value=False, key="use_battery",
+            help="Levererad volym E_akt (och E_akt_up) beräknas MTU för MTU ur begärd volym E_bud givet "
+                 "laddningsnivå, effekt och verkningsgrad. Underleverans avräknas som vanligt (P_PEN).",
+        )
+        if use_battery:
+            battery = (
+                ("capacity", st.number_input("Energikapacitet (MWh)", min_value=0.1, value=10.0, step=1.0,
+                                             key="battery_capacity")),
+                ("power", st.number_input("Effekt (MW)", min_value=0.1, value=5.0, step=0.5, key="battery_power")),
+                ("efficiency", st.slider("Verkningsgrad tur och retur (%)", 50, 100, 90, key="battery_efficiency") / 100),
+                ("soc0", st.slider("Laddningsnivå vid start (%)", 0, 100, 50, key="battery_soc0") / 100),
+            )
+    with st.sidebar.expander("Rebound efter aktivering"):
+        rebound_share = st.slider(
+            "Andel som återkommer (%)", min_value=0, max_value=150, value=0, step=5, key="rebound_share",
+            help="Andel av aktiverad energi som tas igen (uppreglering) eller avstås (nedreglering) "
+                 "under följande MTU. Läggs på förbrukningen och påverkar BRP:s obalans.",
+        )
+        rebound_length = st.number_input("Antal MTU", min_value=1, max_value=96, value=4, step=1, key="rebound_length")
+        rebound_shape = st.selectbox("Form", list(KERNEL_SHAPES), key="rebound_shape")
+    rebound_kernel_values = tuple(rebound_kernel(rebound_share / 100, int(rebound_length), rebound_shape))
+
+# ---------- Prisscenarier ur prishistorik (valfritt) ----------
+st.sidebar.markdown("---")
+price_history_file = st.sidebar.file_uploader(
+    "Prishistorik för prisscenarier (CSV)",
+    type=["csv"],
+    help="En rad per MTU med kolumnerna tid, P_DA och P_IMB. Hela dygn dras med återläggning "
+         "(DA- och obalanspris tillsammans) till nya prisbanor som avräknas i alla scenarier.",
+)
+if price_history_file is not None:
+    n_paths = st.sidebar.number_input(
+        "Antal prisbanor", min_value=10, max_value=10_000_000, value=1000, step=100,
+        help=f"Över {EXACT_PATHS:,} banor sammanfattas fördelningen med en kvantilskiss (ungefärliga percentiler).",
+    )
+    path_days = st.sidebar.number_input("Dygn per bana", min_value=1, max_value=366, value=1, step=1)
+    path_seed = st.sidebar.number_input("Slumpfrö", min_value=0, value=0, step=1)
+
+# ---------- Backtest mot aktiveringslogg (valfritt) ----------
+activation_log_file = st.sidebar.file_uploader(
+    "Aktiveringslogg mFRR (CSV)",
+    type=["csv"],
+    help="En rad per aktivering med kolumnerna tid, riktning (upp/ned), E_bud (budvolym) och E_akt "
+         "(levererad volym), valfritt P_DA, P_IMB och E_cons. Uppreglering avräknas som a-scenarierna, "
+         "nedreglering som b-scenarierna.",
+)
+site_mapping_file = None
+if activation_log_file is not None:
+    site_mapping_file = st.sidebar.file_uploader(
+        "Anläggningar → elhandlare (CSV)",
+        type=["csv"],
+        help="En rad per anläggning och elhandlare: anläggning, elhandlare, valfritt andel (summerar till 1 "
+             "per anläggning) och P_RECOMP per elhandlare. Kräver kolumnen anläggning i aktiveringsloggen; "
+             "ger kompensationsfakturor per elhandlare.",
+    )
+
+st.sidebar.markdown("---")
+customers_file = st.sidebar.file_uploader(
+    "Kunder och avtal (CSV)",
+    type=["csv"],
+    help="En rad per kund: kund, avtal (fast, spot, tidstariff eller kostnad), valfritt andel/förbrukning, "
+         "pris, topppris och påslag (€/MWh). Prissätter varje kunds andel av elhandlarens volym enligt avtalet "
+         "och neutraliserar per kund; använder tidsserien om en är vald.",
+)
+
+# ---------- Rubrik ----------
+st.title("Scenariosimulator för BRP&BSP")
+st.caption(
+    "Scenarier: (1) Bud + underleverans, (2) Bud + överleverans (spegling), (3) Uppmätt aktivering (BRP=BSP), "
+    "(4) Uppmätt aktivering, ingen kompensation (BRP≠BSP), "
+    "(5) Uppmätt aktivering, med kompensation (BRP≠BSP). "
+    "Volymer visas per rad. ‘Balanshandel’ följer: köp = negativt, sälj = positivt."
+)
+
+# init
+st.session_state.setdefault("re_forward_balance_costs", True)
+
+
+
+# --- Initiera huvudstate en gång högst upp i appen (innan widgets används) ---
+if "brp_forward_balance_costs" not in st.session_state:
+    st.session_state["brp_forward_balance_costs"] = True
+
+
+
+
+
+# ---------- Scenariogenomgång (kompakt med expanders) ----------
+st.markdown("### Om scenarierna")
+
+for title, text in SCENARIO_NOTES:
+    with st.expander(title, expanded=False):
+        st.markdown(text)
+
+
+# ---------- Scenario-val: Visa scenarier i tabellerna ----------
+with st.expander("Visa scenarier i tabellerna", expanded=False):
+    st.markdown(
+        """
+Markera vilka scenarier som ska visas i tabellerna nedan.
+Om du avmarkerar ett scenarie döljs det i samtliga tabeller (BRP, BSP, RE, resultat, slutkund, kompensation).
+        """
+    )
+
+    # En checkbox per scenario – alla ikryssade som default
+    cols = st.columns(5)  # bara layout/kosmetik
+    for i, (short_key, label) in enumerate(SCENARIO_COLUMNS.items()):
+        with cols[i % 5]:
+            st.checkbox(
+                label,
+                value=True,
+                key=f"show_brp_{short_key}",
+                help=f"Visa/dölj scenario {short_key} i alla tabeller.",
+            )
+
+
+# ---------- Checkbox före BRP-tabellen ----------
+# Checkbox ovanför BRP-tabellen
+brp_forward_balance_costs = st.checkbox(
+    "BRP vidarefakturerar balanskostnader till elhandlare",
+    key="brp_forward_balance_costs",   # <-- huvudnyckeln
+    help="Om urkryssad står BRP själv för balanskostnaden och fakturerar inte elhandlaren."
+)
+
+
+# ---------- Målscenario för avvikelse och neutralisering ----------
+target_scenario = st.selectbox(
+    "Målscenario",
+    list(SCENARIO_COLUMNS),
+    index=list(SCENARIO_COLUMNS).index(TARGET_SCENARIO),
+    format_func=SCENARIO_COLUMNS.get,
+    key="target_scenario",
+    help="Målresultat, målpris, avvikelser och neutralisering jämförs mot detta scenario (förval 5a).",
+)
+
+
+# ---------- Avräkning: endast synliga scenarier (+ målscenariot) ----------
+# Dolda scenarier avräknas och formateras inte alls. Målscenariot avräknas
+# alltid eftersom goal_value och goal_price_value jämför mot det. Med den
+# parvisa avvikelsematrisen (checkbox längre ned) avräknas alla tio.
+visible_scenarios = [
+    short_key
+    for short_key in SCENARIO_COLUMNS
+    if st.session_state.get(f"show_brp_{short_key}", True)
+]
+show_deviation_matrix = st.session_state.get("show_deviation_matrix", False)
+active_scenarios = list(SCENARIOS) if show_deviation_matrix else required_scenarios(visible_scenarios, target_scenario)
+
+# Checkboxarna längre ned på sidan läses från session_state (samma mönster som show_brp_*)
+params = {
+    "V_DA": V_DA,
+    "handel_sign": handel_sign,
+    "E_cons": E_cons,
+    "E_bud": E_bud,
+    "E_akt": E_akt,
+    "P_DA": P_DA,
+    "P_IMB": P_IMB,
+    "P_COMP": P_COMP,
+    "P_PEN": P_PEN,
+    "P_RECOMP": P_RECOMP,
+    "C_cap": C_cap,
+    "C_avail": C_avail,
+    "P_CAP": P_CAP,
+    "P_CAP_PEN": P_CAP_PEN,
+    "check_availability": check_availability,
+    "brp_forward_balance_costs": brp_forward_balance_costs,
+    "bsp_buy_up": st.session_state.get("bsp_buy_up", False),
+    "apply_penalty": st.session_state.get("apply_penalty", False),
+    "rev_comp_5b": st.session_state.get("rev_comp_5b", False),
+    "re_forward_balance_costs": st.session_state.get("re_forward_balance_costs", True),
+    "use_da_price": st.session_state.get("use_da_price", False),
+    "allow_reverse_neutral": st.session_state.get("allow_reverse_neutral", False),
+    # Prisreglerna följer med så att tidsserier får P_COMP/P_PEN/P_RECOMP per MTU
+    "use_imb_for_comp": use_imb_for_comp,
+    "use_imb_for_pen": use_imb_for_pen,
+    "re_comp_is_da": re_comp_is_da,
+}
+
+settled = settle(params, active_scenarios)
+summary = summarize(params, settled, target_scenario)
+
+
+def _show_violations(violations: pd.DataFrame, where: str):
+    # Bokföringsidentiteter som inte går ihop tyder på fel i modellen, inte i indata
+    if len(violations):
+        st.warning(f"{where}: {len(violations)} avvikelse(r) från bokföringsidentiteterna.")
+        st.dataframe(violations, hide_index=True)
+
+
+_show_violations(check_invariants(by_actor(settled, summary), params), "Avräkningen")
+
+
+@st.cache_resource
+def _table_columns(keys: tuple) -> list:
+    # Kolumnrubriker per scenariourval, delade mellan sessioner
+    return ["Fält", *[SCENARIO_COLUMNS[k] for k in keys], "Enhet"]
+
+
+@st.cache_resource
+def _row_tooltips(table: str, labels: tuple) -> pd.DataFrame:
+    # Tooltip-kolumnen beror bara på tabellen och radetiketterna: byggs en gång per process
+    return row_tooltips(pd.DataFrame({"Fält": labels}), ROW_TIPS[table])
+
+
+def _scenario_table(metrics: dict, row_specs: list, keys: list) -> pd.DataFrame:
+    """
+    Bygger en tabell med en kolumn per scenario i `keys`.
+    row_specs: (fält, enhet) eller (etikett, fält, enhet) per rad.
+    """
+    rows = []
+    for spec in row_specs:
+        label, field, unit = spec if len(spec) == 3 else (spec[0], spec[0], spec[1])
+        rows.append((label, *[metrics[k][field] for k in keys], unit))
+    return pd.DataFrame(
+        rows,
+        columns=_table_columns(tuple(keys)),
+    )
+
+
+
+
+
+# ---------- TABELL 1: BRP (1a,1b,2a,2b,3a,3b,4a,4b,5a,5b) ----------
+st.markdown("## BRP")
+
+
+
+# ----- Bygg BRP-DataFrame -----
+df_brp = _scenario_table({k: m["brp"] for k, m in settled.items()}, BRP_ROW_SPECS, visible_scenarios)
+
+
+# ----- Rad-tooltips: text till varje "Fält" -----
+tooltips = _row_tooltips("BRP", tuple(df_brp["Fält"]))
+
+# Skapa Styler med tooltips
+styled_brp = style_by_unit(df_brp).set_tooltips(tooltips)
+
+# ----- Visa BRP-tabellen med hover-tooltips på första kolumnen -----
+st.table(styled_brp)
+
+
+
+
+
+# BSP köper in energi vid nedreglering (default: False)
+bsp_buy_up = st.checkbox(
+    "BSP köper in energi vid nedreglering",
+    value=False,
+    key="bsp_buy_up",
+    help="När ikryssad bokas en DA-handel till P_DA för uppregleringsscenarier (B)."
+)
+
+
+
+# ---------- Checkbox för avdrag på över/underleverans ----------
+apply_penalty = st.checkbox(
+    "Tillämpa avdrag för BSP vid över/underleverans",
+    value=False,
+    key="apply_penalty",
+    help="Om urkryssad sätts över/underleveranspris till 0 €/MWh.",
+)
+
+
+# >>> Lägg in DEN HÄR BLOCKET HÄR <<<
+st.checkbox(
+    "Motsatt kompensation i 5b (RE → BSP)",
+    value=False,
+    key="rev_comp_5b",   # unik nyckel
+    help="Default: ingen kompensation i 5b. Om ikryssad betalar RE kompensation till BSP."
+)
+rev_comp_5b = st.session_state.get("rev_comp_5b", False)
+# >>> slut på nytt block <<<
+
+
+
+
+# ---------- TABELL 2: BSP (1a–5b) ----------
+st.markdown("## BSP")
+
+
+
+
+
+df_bsp = _scenario_table({k: m["bsp"] for k, m in settled.items()}, BSP_ROW_SPECS, visible_scenarios)
+
+
+# ---------- (NYTT) Tooltips för BSP-rader ----------
+tooltips_bsp = _row_tooltips("BSP", tuple(df_bsp["Fält"]))
+
+# Skapa Styler med tooltips
+styled_bsp = style_by_unit(df_bsp).set_tooltips(tooltips_bsp)
+
+# Visa tabellen med hover-tooltips på kolumnen "Fält"
+st.table(styled_bsp)
+
+
+
+
+
+
+
+
+# ---------- Checkbox: Elhandlaren vidarefakturerar balanskostnader ----------
+# Initiera session state vid behov
+if "re_forward_balance_costs" not in st.session_state:
+    st.session_state["re_forward_balance_costs"] = True
+
+# Visa checkbox ovanför RE-tabellen
+re_forward_balance_costs = st.checkbox(
+    "Elhandlaren vidarefakturerar balanskostnader till slutkunden",
+    key="re_forward_balance_costs",
+    help="Om urkryssad står elhandlaren själv för balanskostnaden och fakturerar inte slutkunden."
+)
+
+
+# Hämtar värdet direkt från session_state så det fungerar även vid dubblett-checkboxes
+re_forward_balance_costs = st.session_state["re_forward_balance_costs"]
+
+
+# ---------- Checkbox: Elhandlaren använder DA pris som slutkundspris ----------
+use_da_price = st.checkbox(
+    "Använd DA pris som slutkundens elpris",
+    value=False,
+    key="use_da_price",
+    help="När ikryssad sätts slutkundens elpris = P_DA istället för att räknas från kostnad/volym."
+)
+
+
+
+
+# ---------- TABELL 3: Elhandlare / RE (Scenario 1a–5b) ----------
+st.markdown("## RE")
+
+# --- Tabellstruktur ---
+df_re = _scenario_table({k: m["re"] for k, m in settled.items()}, RE_ROW_SPECS, visible_scenarios)
+
+
+
+# ---------- (NYTT) Tooltips för RE-rader ----------
+tooltips_re = _row_tooltips("RE", tuple(df_re["Fält"]))
+
+# Skapa Styler med tooltips
+styled_re = style_by_unit(df_re).set_tooltips(tooltips_re)
+
+# Visa tabellen med hover-tooltips på kolumnen "Fält"
+st.table(styled_re)
+
+
+
+
+# ---------- TABELL 4: Sammanställning – resultat per aktör och scenario ----------
+st.markdown("## Aktörers resultat per scenario")
+
+# --- Målresultat (målscenariots BSP resultat) ---
+goal_value = settled[target_scenario]["bsp"]["BSP nettoresultat"]
+
+# --- Tabellinnehåll (synliga scenarier av 1a–5b) ---
+df_sum = _scenario_table(summary, SUM_ROW_SPECS, visible_scenarios)
+
+
+# ---------- (NYTT) Tooltips för sammanställningen ----------
+tooltips_sum = _row_tooltips("Sammanställning", tuple(df_sum["Fält"]))
+
+# ------- Skapa styler med tooltips -------
+styled_sum = style_by_unit(df_sum).set_tooltips(tooltips_sum)
+
+# ------- Visa tabellen -------
+st.table(styled_sum)
+
+
+
+
+# ---------- TABELL 5: Slutkundens elpris per scenario ----------
+st.markdown("## Slutkundens elpris per scenario")
+
+# Målpris = målscenariots pris. Priset läses från RE-tabellen så checkboxen "Använd DA pris…" får effekt
+goal_price_value = settled[target_scenario]["re"]["Slutkundens elpris"]
+
+
+df_cust = _scenario_table(summary, CUST_ROW_SPECS, visible_scenarios)
+
+
+# ---------- (NYTT) Tooltips för kundpris-tabellen ----------
+tooltips_cust = _row_tooltips("Slutkundens elpris", tuple(df_cust["Fält"]))
+
+# Skapa Styler med tooltips på "Fält"-kolumnen
+styled_cust = style_by_unit(df_cust).set_tooltips(tooltips_cust)
+
+# Visa tabellen
+st.table(styled_cust)
+
+# Tillåt omvänd neutralisering till/från slutkund
+allow_reverse_neutral = st.checkbox(
+    "Tillåt omvänd neutralisering till/från slutkund",
+    value=False,
+    key="allow_reverse_neutral",
+    help="Om ikryssad neutraliseras även lägre kundpris än målpris (kund betalar tillbaka)."
+)
+
+
+
+# ---------- TABELL 6: Aktörers resultat efter kompensation (A/B) ----------
+st.markdown("## Aktörers resultat efter kompensation")
+
+comp_row_specs = COMP_ROW_SPECS[allow_reverse_neutral]
+
+df_comp_total = _scenario_table(summary, comp_row_specs, visible_scenarios)
+
+tooltips_comp_total = _row_tooltips("Kompensation", tuple(df_comp_total["Fält"]))
+
+styled_comp_total = style_by_unit(df_comp_total).set_tooltips(tooltips_comp_total)
+
+# Visa med hover-tooltips på kolumnen "Fält"
+st.table(styled_comp_total)
+
+st.caption(
+    "Neutralisering = prisavvikelse × volym. Om ‘omvänd neutralisering’ är ikryssad kan beloppet vara negativt (kunden betalar tillbaka)."
+)
+
+
+# ---------- Parvis avvikelse: varje scenario som målscenario ----------
+def _deviation_frame(keys: list, matrix: np.ndarray) -> pd.DataFrame:
+    # Rad = scenario, kolumn = målscenario (korta nycklar för en kompakt 10 × 10-tabell)
+    return pd.DataFrame(matrix, index=pd.Index(keys, name="Scenario \\ mål"), columns=keys)
+
+
+st.checkbox(
+    "Visa parvis avvikelsematris (alla tio scenarier)",
+    value=False,
+    key="show_deviation_matrix",
+    help="Avräknar alla scenarier och jämför vart och ett mot varje annat scenario som målscenario.",
+)
+
+if show_deviation_matrix:
+    st.markdown("## Parvis avvikelse mellan scenarier")
+    deviation_keys, deviations = deviation_matrix(by_actor(settled, summary))
+    deviation_field = st.radio("Fält", list(DEVIATION_UNITS), horizontal=True, key="deviation_field")
+    st.table(style_matrix(
+        _deviation_frame(deviation_keys, deviations[deviation_field]), DEVIATION_UNITS[deviation_field],
+    ))
+    st.caption(
+        f"Rad = scenario, kolumn = målscenario; kolumnen {target_scenario} är samma som avvikelseraderna ovan. "
+        "Markerade celler har ingen avvikelse – scenarierna är likvärdiga för kunden (elpris) eller aktörerna."
+    )
+
+
+# ---------- TABELL 7: Känslighet mot priser (exakta derivator) ----------
+st.markdown("## Känslighet mot priser")
+
+# Resultaten är affina i priserna (givet volymer och checkboxar); derivatorna är
+# operatorns koefficienter, lösta vid aktuella priser för neutraliseringens knäckpunkt
+price_op = compile_operator(params, active_scenarios, target_scenario)
+price_labels = {
+    "P_DA": "DA-pris (P_DA)",
+    "P_IMB": "Obalanspris (P_IMB)",
+    "P_COMP": "Ersättningspris (P_COMP)",
+    "P_PEN": "Avdragspris (P_PEN)",
+    "P_RECOMP": "Kompensationspris (P_RECOMP)",
+}
+sens_price = st.radio("Derivata med avseende på", list(price_labels), format_func=price_labels.get,
+                      horizontal=True, key="sens_price")
+sens_jac = price_op.jacobian()[sens_price]
+sens_specs = [
+    (label, field, "€/MWh per €/MWh" if unit == "€/MWh" else "EUR per €/MWh")
+    for label, field, unit in ACTOR_TABLES[allow_reverse_neutral]["Sammanställning"][1]
+]
+df_sens = _scenario_table(
+    {k: {field: sens_jac[(k, "Sammanställning", field)] for _, field, _ in sens_specs} for k in visible_scenarios},
+    sens_specs, visible_scenarios,
+)
+st.table(style_by_unit(df_sens).set_tooltips(_row_tooltips("Summering", tuple(df_sens["Fält"]))))
+kinked = [SCENARIO_COLUMNS[k][:2] for k, cond, _ in price_op.kinks
+          if k in visible_scenarios and price_op.values(rows=[cond])[0, 0] <= 0]
+st.caption(
+    "∂(fält)/∂(pris) per scenario, t.ex. EUR per €/MWh = MWh. Exakt inom aktuell region: "
+    "neutraliseringen byter uttryck när ‘Ökad totalkostnad slutkund’ passerar 0"
+    + (f" (ingen neutralisering just nu i {', '.join(kinked)})." if kinked else ".")
+)
+
+
+
+
+# Tabellerna ovan per aktör (tidsserie- och prisscenariovyerna)
+actor_tables = ACTOR_TABLES[allow_reverse_neutral]
+
+
+# ---------- Tidsserie: diagram per scenario ----------
+CHART_POINTS = 1000   # max antal punkter per serie som skickas till webbläsaren
+
+
+def _export_file(index, results, scenarios, fmt, window):
+    # Zip-arkivet skrivs block för block till en temporär fil på disk i stället för att
+    # byggas som bytes i minnet; filen (obuffrad, RawIOBase) tas bort när den stängs
+    f = tempfile.TemporaryFile(suffix=".zip", buffering=0)
+    write_export(f, index, results, scenarios, fmt, window=window)
+    f.seek(0)
+    return f
+
+
+def _series_params(params: dict, frame: pd.DataFrame, index: pd.Index, bids_bytes: bytes = None,
+                   kernel: tuple = (), battery: tuple = ()) -> dict:
+    # Serier per MTU; med budstege ersätts E_bud/E_bud_up av aktiverad volym i merit order,
+    # med batteri blir E_akt/E_akt_up den levererbara volymen och med reboundkärna läggs
+    # reboundet efter aktiveringarna på förbrukningen
+    p = {**params, **series_values(frame, params)}
+    if bids_bytes is not None:
+        delivered = {True: p["E_akt"] if "E_akt" in frame.columns else None}
+        p = ladder_params(p, read_bids(BytesIO(bids_bytes), index), delivered=delivered)
+    if battery:
+        p = storage_params({**DEFAULT_PARAMS, **p}, dict(battery), len(index))
+    if kernel:
+        p = apply_rebound({**DEFAULT_PARAMS, **p}, kernel)
+    return p
+
+
+@st.cache_data(show_spinner="Avräknar tidsserien …", max_entries=4)
+def _settle_series(file_bytes: bytes, params: dict, scenarios: tuple, target: str, bids_bytes: bytes = None,
+                   kernel: tuple = (), battery: tuple = ()):
+    frame = read_series_csv(BytesIO(file_bytes))
+    p = _series_params(params, frame, frame.index, bids_bytes, kernel, battery)
+    settled = settle(p, scenarios)
+    results = by_actor(settled, summarize(p, settled, target))
+    return frame.index, results, check_invariants(results, p)
+
+
+@st.cache_data(max_entries=64)
+def _chart_data(series_key: tuple, field: str, cumulative: bool, window: tuple, n_points: int,
+                _index: pd.Index, _results: dict, keys: tuple) -> pd.DataFrame:
+    # Cachas per (serie, fält, zoomfönster); _index/_results hashas inte
+    lo, hi = window
+    n = len(_index)
+    series = {}
+    for k in keys:
+        y = np.broadcast_to(np.asarray(_results[k]["Sammanställning"][field], dtype=float), (n,))[lo:hi]
+        series[SCENARIO_COLUMNS[k]] = np.cumsum(y) if cumulative else y
+    return downsample_long(_index[lo:hi], series, n_points)
+
+
+@st.cache_data(max_entries=16)
+def _window_deviations(series_key: tuple, window: tuple, _results: dict) -> tuple:
+    # Parvis avvikelse per MTU i fönstret: belopp summeras, priset som största absoluta avvikelse
+    lo, hi = window
+    sliced = {
+        k: {a: {f: v[lo:hi] if np.ndim(v) else v for f, v in fields.items()} for a, fields in actors.items()}
+        for k, actors in _results.items()
+    }
+    keys, deviations = deviation_matrix(sliced)
+    n_keys = len(keys)
+    reduced = {}
+    for field, m in deviations.items():
+        m = np.broadcast_to(m.reshape(n_keys, n_keys, -1), (n_keys, n_keys, hi - lo))
+        reduced[field] = np.abs(m).max(axis=-1, initial=0) if DEVIATION_UNITS[field] == "€/MWh" else m.sum(axis=-1)
+    return keys, reduced
+
+
+@st.cache_data(show_spinner="Avräknar lagrad tidsserie …", max_entries=4)
+def _settle_stored(selection: tuple, index_mtime: float, params: dict, scenarios: tuple, target: str,
+                   bids_bytes: bytes = None, kernel: tuple = (), battery: tuple = ()):
+    # index_mtime ingår i cachenyckeln så att nykonverterade segment läses in
+    area, site, start, end = selection
+    index, values = open_series(area, site, start, f"{end} 23:59:59.999", DEFAULT_STORE)
+    p = _series_params(params, pd.DataFrame(values), index, bids_bytes, kernel, battery)
+    settled = settle(p, scenarios)
+    results = by_actor(settled, summarize(p, settled, target))
+    return index, results, check_invariants(results, p)
+
+
+ts_index = ts_results = ts_violations = series_key = None
+bids_bytes = bids_file.getvalue() if bids_file is not None else None
+bids_key = hashlib.sha1(bids_bytes).hexdigest() if bids_bytes is not None else None
+if series_file is not None:
+    series_bytes = series_file.getvalue()
+    try:
+        ts_index, ts_results, ts_violations = _settle_series(
+            series_bytes, params, tuple(active_scenarios), target_scenario, bids_bytes, rebound_kernel_values,
+            battery,
+        )
+        series_key = (
+            hashlib.sha1(series_bytes).hexdigest(), bids_key, rebound_kernel_values, battery, target_scenario,
+            tuple(active_scenarios), repr(sorted(params.items())),
+        )
+    except ValueError as exc:
+        st.error(f"Kunde inte läsa tidsserien: {exc}")
+elif store_selection is not None:
+    index_mtime = os.path.getmtime(os.path.join(DEFAULT_STORE, INDEX_FILE))
+    try:
+        ts_index, ts_results, ts_violations = _settle_stored(
+            store_selection, index_mtime, params, tuple(active_scenarios), target_scenario, bids_bytes,
+            rebound_kernel_values, battery,
+        )
+        series_key = (store_selection, index_mtime, bids_key, rebound_kernel_values, battery, target_scenario,
+                      tuple(active_scenarios), repr(sorted(params.items())))
+    except ValueError as exc:
+        st.error(f"Kunde inte läsa budstegen: {exc}")
+
+if ts_results is not None and len(ts_index) == 0:
+    st.info("Ingen data i valt intervall.")
+elif ts_results is not None:
+    st.markdown("## Tidsserie per scenario")
+    _show_violations(ts_violations, "Tidsserien")
+    keys = tuple(visible_scenarios)
+    st.caption(f"{len(ts_index):,} MTU avräknade. Diagrammen visar högst {CHART_POINTS:,} punkter per serie (LTTB-nedsampling).")
+    if rebound_kernel_values:
+        st.caption(
+            f"Rebound: {sum(rebound_kernel_values):.0%} av varje aktivering återkommer under följande "
+            f"{len(rebound_kernel_values)} MTU och ingår i förbrukningen (BRP:s obalans)."
+        )
+
+    # Zoom: välj tidsfönster; varje fönster nedsamplas och cachas för sig
+    if isinstance(ts_index, pd.DatetimeIndex) and len(ts_index) > 1:
+        t_lo, t_hi = st.slider(
+            "Tidsfönster",
+            min_value=ts_index[0].to_pydatetime(),
+            max_value=ts_index[-1].to_pydatetime(),
+            value=(ts_index[0].to_pydatetime(), ts_index[-1].to_pydatetime()),
+            step=timedelta(minutes=15),
+            format="YYYY-MM-DD HH:mm",
+        )
+        window = (int(ts_index.searchsorted(t_lo)), int(ts_index.searchsorted(t_hi, side="right")))
+    elif len(ts_index) > 1:
+        window = st.slider("MTU-fönster", 0, len(ts_index), (0, len(ts_index)))
+    else:
+        window = (0, len(ts_index))
+
+    actor_fields = {"BRP": "BRP resultat", "BSP": "BSP resultat", "Elhandlare": "Elhandlare resultat"}
+    actor = st.radio("Aktör", list(actor_fields), horizontal=True)
+
+    x_name = ts_index.name or "MTU"
+    st.markdown(f"**Ackumulerat resultat – {actor} (EUR)**")
+    st.line_chart(
+        _chart_data(series_key, actor_fields[actor], True, window, CHART_POINTS, ts_index, ts_results, keys),
+        x=x_name, y="Värde", color="Scenario",
+    )
+    st.markdown("**Slutkundens elpris (€/MWh)**")
+    st.line_chart(
+        _chart_data(series_key, "Slutkundens elpris", False, window, CHART_POINTS, ts_index, ts_results, keys),
+        x=x_name, y="Värde", color="Scenario",
+    )
+    st.markdown("**Neutralisering till/från slutkund (EUR)**")
+    st.area_chart(
+        _chart_data(series_key, "Neutralisering", False, window, CHART_POINTS, ts_index, ts_results, keys),
+        x=x_name, y="Värde", color="Scenario",
+    )
+
+    if show_deviation_matrix:
+        st.markdown("**Parvis avvikelse i tidsfönstret**")
+        window_keys, window_deviations = _window_deviations(series_key, window, ts_results)
+        window_field = st.radio("Fält", list(DEVIATION_UNITS), horizontal=True, key="window_deviation_field")
+        st.table(style_matrix(
+            _deviation_frame(window_keys, window_deviations[window_field]), DEVIATION_UNITS[window_field],
+        ))
+        st.caption(
+            "Rad = scenario, kolumn = målscenario. Belopp är summor över fönstret; elpriset visas som största "
+            "absoluta avvikelse i någon MTU, så en markerad cell betyder samma pris för kunden i varje MTU."
+        )
+
+    # ----- Resultat per MTU: sidvis tabell -----
+    # Filtrering och sidindelning görs här; bara synlig sida skickas till webbläsaren.
+    # Fältbeskrivningarna följer med som kolumnmetadata (hjälptext i rubriken).
+    st.markdown("**Resultat per MTU**")
+    g1, g2, g3 = st.columns([1, 3, 1])
+    grid_actor = g1.selectbox("Aktör", list(actor_tables), key="grid_actor")
+    grid_keys = g2.multiselect("Scenarier", keys, default=list(keys), format_func=SCENARIO_COLUMNS.get,
+                               key="grid_scenarios")
+    page_size = g3.selectbox("Rader per sida", [100, 500, 1000, 5000], index=1, key="grid_page_size")
+
+    grid_actor_key, specs, tips_key = actor_tables[grid_actor]
+    grid_columns, column_config = [], {}
+    for spec in specs:
+        label, field, unit = spec if len(spec) == 3 else (spec[0], spec[0], spec[1])
+        if unit not in UNIT_COLUMN_FORMATS:
+            continue  # textrader (t.ex. "Obalansjusteras baserat på") visas inte per MTU
+        grid_columns.append((label, field))
+        column_config[label] = st.column_config.NumberColumn(
+            f"{label} ({unit.split('/NA')[0]})", help=ROW_TIPS[tips_key].get(label), format=UNIT_COLUMN_FORMATS[unit],
+        )
+
+    n_pages = page_count(window, len(grid_keys), page_size)
+    if st.session_state.get("grid_page", 1) > n_pages:
+        st.session_state["grid_page"] = n_pages  # färre sidor efter ändrat filter
+    page = st.number_input(f"Sida (av {n_pages:,})", min_value=1, max_value=n_pages, value=1, key="grid_page")
+    page_df = result_page(
+        ts_index, ts_results, grid_actor_key, {k: SCENARIO_COLUMNS[k] for k in grid_keys},
+        grid_columns, window, int(page) - 1, page_size,
+    )
+    st.dataframe(page_df, hide_index=True, column_config=column_config)
+    n_rows = (window[1] - window[0]) * len(grid_keys)
+    first = (int(page) - 1) * page_size
+    st.caption(f"Rad {min(first + 1, n_rows):,}–{first + len(page_df):,} av {n_rows:,}.")
+
+    # ----- Export av alla MTU i fönstret: CSV/Parquet i block, en fil per aktör -----
+    e1, e2 = st.columns([1, 3])
+    export_fmt = e1.radio("Exportformat", list(EXPORT_FORMATS), horizontal=True, format_func=str.upper,
+                          key="export_format")
+    # Filen byggs först vid klick (inte vid varje omkörning), block för block
+    e2.download_button(
+        label="📥 Exportera resultat per MTU (zip, en fil per aktör)",
+        data=partial(_export_file, ts_index, ts_results, {k: SCENARIO_COLUMNS[k] for k in keys}, export_fmt,
+                     window),
+        file_name=f"resultat_per_mtu_{datetime.now().strftime('%Y-%m-%d_%H%M')}.zip",
+        mime="application/zip",
+        help="Numeriska, oformaterade värden för alla MTU i tidsfönstret och alla synliga scenarier.",
+    )
+
+
+
+
+# ---------- Slutkunder: pris och neutralisering per kund enligt avtal ----------
+@st.cache_data(show_spinner="Prissätter kunder enligt avtal …", max_entries=4)
+def _tariffs(customers_bytes: bytes, results_key: tuple, target: str, allow_reverse: bool,
+             _results: dict, _peak) -> tuple:
+    # Cachas per kundfil och avräkning (results_key); _results/_peak hashas inte
+    customers = read_customers(BytesIO(customers_bytes))
+    settlement = customer_settlement(_results, customers, _peak, target, allow_reverse)
+    return customers, settlement, tariff_summary(settlement, customers)
+
+
+if customers_file is not None:
+    st.markdown("## Slutkunder per avtal")
+    if ts_results is not None and len(ts_index):
+        tariff_results, tariff_peak, tariff_key = ts_results, peak_mask(ts_index), series_key
+        tariff_source = f"tidsserien ({len(ts_index):,} MTU, topplasttid vardagar {PEAK_HOURS[0]}–{PEAK_HOURS[1]})"
+    else:
+        in_peak = st.checkbox("Topplasttid", value=True, key="tariff_peak",
+                              help="Om MTU:n ligger i topplasttid (Topppris för tidstariffer).")
+        tariff_results, tariff_peak = by_actor(settled, summary), in_peak
+        tariff_key = ("punkt", tuple(active_scenarios), target_scenario, in_peak, repr(sorted(params.items())))
+        tariff_source = "sidopanelens MTU"
+    try:
+        customers, customer_results, tariff_totals = _tariffs(
+            customers_file.getvalue(), tariff_key, target_scenario, params["allow_reverse_neutral"],
+            tariff_results, tariff_peak,
+        )
+    except ValueError as exc:
+        st.error(f"Kunde inte läsa kundfilen: {exc}")
+    else:
+        st.caption(
+            f"{len(customers):,} kunder prissatta enligt avtal över {tariff_source}. Neutraliseringen räknas "
+            f"per kund mot målscenariot {target_scenario} och summeras per avtal."
+        )
+        contract_labels = [c for c in [*CONTRACTS, ALL_CONTRACTS] if c in tariff_totals[target_scenario]]
+        for tab, contract in zip(st.tabs(contract_labels), contract_labels):
+            with tab:
+                df_tariff = _scenario_table(
+                    {k: tariff_totals[k][contract] for k in visible_scenarios}, TARIFF_ROW_SPECS, visible_scenarios,
+                )
+                st.table(style_by_unit(df_tariff).set_tooltips(_row_tooltips("Slutkunder", tuple(df_tariff["Fält"]))))
+
+        if not visible_scenarios:
+            st.info("Inga scenarier visas – välj scenarier under ”Visa scenarier i tabellerna” "
+                    "för att se kunderna.")
+        else:
+            # Per kund för ett scenario, störst neutralisering först
+            customer_scenario = st.selectbox("Kunder i scenario", visible_scenarios,
+                                             format_func=SCENARIO_COLUMNS.get, key="customer_scenario")
+            i = customer_results["keys"].index(customer_scenario)
+            t = customer_results["keys"].index(target_scenario)
+            df_customers = customers[["Avtal", "Andel"]].assign(**{
+                "Volym": customer_results["Volym"][i],
+                "Kundkostnad": customer_results["Kundkostnad"][i],
+                "Snittpris": customer_results["Snittpris"][i],
+                "Målpris": customer_results["Snittpris"][t],
+                "Ökad totalkostnad slutkund": customer_results["Ökad totalkostnad slutkund"][i],
+                "Neutralisering": customer_results["Neutralisering"][i],
+            }).sort_values("Neutralisering", ascending=False, kind="stable")
+            st.dataframe(df_customers, column_config={
+                "Andel": st.column_config.NumberColumn("Andel", format="%.6f"),
+                "Volym": st.column_config.NumberColumn("Volym (MWh)", format=UNIT_COLUMN_FORMATS["MWh"]),
+                "Kundkostnad": st.column_config.NumberColumn("Kundkostnad (EUR)",
+                                                             format=UNIT_COLUMN_FORMATS["EUR"]),
+                "Snittpris": st.column_config.NumberColumn("Snittpris (€/MWh)", format=UNIT_COLUMN_FORMATS["€/MWh"]),
+                "Målpris": st.column_config.NumberColumn("Målpris (€/MWh)", format=UNIT_COLUMN_FORMATS["€/MWh"]),
+                "Ökad totalkostnad slutkund": st.column_config.NumberColumn(
+                    "Ökad totalkostnad slutkund (EUR)", format=UNIT_COLUMN_FORMATS["EUR"]),
+                "Neutralisering": st.column_config.NumberColumn(
+                    "Neutralisering (EUR)", help=TARIFF_ROW_TIPS["Neutralisering per kund"],
+                    format=UNIT_COLUMN_FORMATS["EUR"]),
+            })
+
+
+# ---------- Elområden: avräkning per område och totalt ----------
+@st.cache_data(show_spinner="Avräknar elområden …", max_entries=4)
+def _settle_zones(selection: tuple, index_mtime: float, params: dict, scenarios: tuple, target: str):
+    # Serierna matchas på tid (bara MTU som finns i alla områden) och avräknas som en (områden, MTU)-array
+    zone_sites, start, end = selection
+    series = {
+        zone: open_series(zone, site, start, f"{end} 23:59:59.999", DEFAULT_STORE) for zone, site in zone_sites
+    }
+    for zone, (index, values) in series.items():
+        # Dubbletter i tidsaxeln: första förekomsten gäller, annars fungerar inte get_indexer
+        if not index.is_unique:
+            keep = ~index.duplicated()
+            series[zone] = index[keep], {c: v[keep] for c, v in values.items()}
+    common = None
+    for index, _ in series.values():
+        common = index if common is None else common.intersection(index)
+    zone_inputs = {}
+    for zone, (index, values) in series.items():
+        pos = index.get_indexer(common)
+        zone_inputs[zone] = {c: v[pos] for c, v in values.items()}
+    zones, results = settle_zones(params, zone_inputs, scenarios, target)
+    totals = zone_totals(zones, results, params.get("exact", False), target)
+    return len(common), zones, totals, check_invariants(results, params)
+
+
+if zone_selection is not None:
+    st.markdown("## Elområden")
+    index_mtime = os.path.getmtime(os.path.join(DEFAULT_STORE, INDEX_FILE))
+    n_zone_mtu, zones, zone_results, zone_violations = _settle_zones(
+        zone_selection, index_mtime, params, tuple(active_scenarios), target_scenario,
+    )
+    _show_violations(zone_violations, "Elområden")
+    if n_zone_mtu == 0:
+        st.info("De valda serierna har inga gemensamma MTU i intervallet.")
+    else:
+        st.caption(
+            f"{len(zones)} elområden × {n_zone_mtu:,} gemensamma MTU avräknade i ett anrop. Belopp och volymer "
+            "är summor; slutkundens elpris är fakturerad kostnad / fakturerad volym."
+        )
+        for tab, zone in zip(st.tabs([*zones, ALL_ZONES]), [*zones, ALL_ZONES]):
+            with tab:
+                for title, (actor_key, specs, tips_key) in actor_tables.items():
+                    st.markdown(f"**{title}**")
+                    df_zone = _scenario_table(
+                        {k: zone_results[zone][k][actor_key] for k in visible_scenarios}, specs, visible_scenarios,
+                    )
+                    st.table(style_by_unit(df_zone).set_tooltips(_row_tooltips(tips_key, tuple(df_zone["Fält"]))))
+
+
+# ---------- Live: innevarande dygn ----------
+
+
+@st.cache_resource(max_entries=4)
+def _live_tracker(inbox: str, params: dict, scenarios: tuple, target: str):
+    # Delas mellan omkörningar så att summorna byggs på i stället för att räknas om
+    return LiveSettlement(params, scenarios, target), InboxFeed(inbox)
+
+
+if live_inbox:
+    @st.fragment(run_every=timedelta(seconds=live_refresh))
+    def _live_section():
+        live, feed = _live_tracker(live_inbox, params, tuple(active_scenarios), target_scenario)
+        with live.lock:
+            for frame in feed.poll():
+                live.append(frame)
+            totals = live.totals()
+            result_series = live.series("Aktörers resultat efter kompensation") if live.rows else None
+
+        st.markdown("## Live – innevarande dygn")
+        for name, message in feed.errors.items():
+            st.error(f"Kunde inte läsa {name} i inkorgen: {message}")
+        if result_series is None:
+            st.info(f"Väntar på CSV-filer i {live_inbox} …")
+            return
+        st.caption(f"{live.day.date() if live.day is not None else ''} · {len(result_series)} MTU · "
+                   f"senaste {result_series.index[-1]}")
+        metrics = {
+            k: {spec[-2]: totals[k]["Sammanställning"].get(spec[-2], np.nan) for spec in LIVE_ROW_SPECS}
+            for k in visible_scenarios
+        }
+        df_live = _scenario_table(metrics, LIVE_ROW_SPECS, visible_scenarios)
+        st.table(style_by_unit(df_live))
+        st.markdown("**Ackumulerat resultat efter kompensation (EUR)**")
+        st.line_chart(result_series[list(visible_scenarios)].cumsum().rename(columns=SCENARIO_COLUMNS))
+
+    _live_section()
+
+
+# ---------- Prisscenarier: fördelning över bootstrap-banor ----------
+@st.cache_data(show_spinner="Avräknar prisbanor …", max_entries=4)
+def _price_path_totals(file_bytes: bytes, params: dict, scenarios: tuple, target: str, n_paths: int, days: int,
+                       seed: int):
+    # Upp till EXACT_PATHS banor: summor per bana och en skiss över dem; fler: bara skissen
+    history = read_series_csv(BytesIO(file_bytes))
+    if n_paths > EXACT_PATHS:
+        return None, sketch_paths(params, history, n_paths, days * BLOCK_MTU, scenarios, target, seed=seed)
+    paths = bootstrap_paths(history, n_paths, days * BLOCK_MTU, seed=seed)
+    totals = evaluate_paths(params, paths, scenarios, target)
+    return totals, ResultSketch.for_results(totals).update(totals)
+
+
+def _sketch_section(sketch: ResultSketch, keys: list, labels: dict, actor_key: str, key: str):
+    """Kvantilskissens sammanfattning per scenario och fält för en aktör, plus histogram för ett fält."""
+    df = sketch.describe().xs(actor_key, level="Aktör")
+    df = df[df.index.get_level_values("Scenario").isin(keys)].reset_index()
+    df["Scenario"] = df["Scenario"].map(labels)
+    st.dataframe(df, hide_index=True, column_config={
+        "Antal": st.column_config.NumberColumn(format=UNIT_COLUMN_FORMATS["st"]),
+        **{name: st.column_config.NumberColumn(format="%.2f") for name in SKETCH_STATISTICS if name != "Antal"},
+    })
+    c1, c2 = st.columns(2)
+    scenario = c1.selectbox("Scenario", keys, format_func=labels.get, key=f"{key}_scenario")
+    field = c2.selectbox("Fält", list(dict.fromkeys(df["Fält"])), key=f"{key}_field")
+    st.bar_chart(sketch.histogram(scenario, actor_key, field))
+
+
+if price_history_file is not None:
+    st.markdown("## Prisscenarier (block-bootstrap)")
+    try:
+        path_totals, path_sketch = _price_path_totals(
+            price_history_file.getvalue(), params, tuple(active_scenarios), target_scenario, int(n_paths), int(path_days),
+            int(path_seed),
+        )
+    except ValueError as exc:
+        st.error(f"Kunde inte bygga prisbanor: {exc}")
+    else:
+        statistic = st.radio("Statistik över banorna", list(STATISTICS), horizontal=True, key="path_statistic")
+        st.caption(
+            f"{int(n_paths):,} banor om {int(path_days)} dygn. Belopp och volymer är summor per bana, "
+            "priser medelvärden per bana; tabellen visar vald statistik över banorna."
+            + ("" if path_totals is not None else " Percentilerna är ungefärliga (kvantilskiss).")
+        )
+        path_stats = distribution(path_totals, statistic) if path_totals is not None else path_sketch.summary(statistic)
+        for title, (actor_key, specs, tips_key) in actor_tables.items():
+            st.markdown(f"**{title}**")
+            df_paths = _scenario_table({k: path_stats[k][actor_key] for k in visible_scenarios}, specs, visible_scenarios)
+            st.table(style_by_unit(df_paths).set_tooltips(_row_tooltips(tips_key, tuple(df_paths["Fält"]))))
+
+        with st.expander("Fördelning över banorna (kvantilskiss)"):
+            path_actor = st.radio("Aktör", list(actor_tables), horizontal=True, key="path_sketch_actor")
+            _sketch_section(path_sketch, list(visible_scenarios), SCENARIO_COLUMNS, actor_tables[path_actor][0],
+                            "path_sketch")
+
+
+# ---------- Backtest: historiska mFRR-aktiveringar ----------
+@st.cache_data(show_spinner="Avräknar aktiveringsloggen …", max_entries=4)
+def _backtest(file_bytes: bytes, params: dict, target: str):
+    # Hela loggen i ett anrop; cachas per loggfil, parametrar och målscenario
+    log = read_activation_log(BytesIO(file_bytes))
+    return log, backtest(params, log, target)
+
+
+@st.cache_data(max_entries=16)
+def _backtest_report(file_bytes: bytes, params: dict, target: str, period: str) -> pd.DataFrame:
+    log, results = _backtest(file_bytes, params, target)
+    return backtest_report(log, results, period)
+
+
+@st.cache_data(show_spinner="Skissar fördelningen per aktivering …", max_entries=4)
+def _backtest_sketch(file_bytes: bytes, params: dict, target: str) -> ResultSketch:
+    log = read_activation_log(BytesIO(file_bytes))
+    return backtest_sketch(params, log, target, actors=["Sammanställning"], fields=REPORT_FIELDS)
+
+
+@st.cache_data(show_spinner="Avräknar kompensation per elhandlare …", max_entries=4)
+def _log_invoices(file_bytes: bytes, mapping_bytes: bytes, params: dict) -> pd.DataFrame:
+    log = read_activation_log(BytesIO(file_bytes))
+    mapping, prices = read_site_mapping(BytesIO(mapping_bytes))
+    return log_invoices(log, mapping, prices, params)
+
+
+if activation_log_file is not None:
+    st.markdown("## Backtest mot aktiveringslogg")
+    try:
+        activation_log, _ = _backtest(activation_log_file.getvalue(), params, target_scenario)
+    except ValueError as exc:
+        st.error(f"Kunde inte läsa aktiveringsloggen: {exc}")
+    else:
+        n_up = int(activation_log["Riktning"].sum())
+        st.caption(
+            f"{len(activation_log):,} aktiveringar ({n_up:,} upp, {len(activation_log) - n_up:,} ned)"
+            + (f", {activation_log.index[0]:%Y-%m-%d}–{activation_log.index[-1]:%Y-%m-%d}" if len(activation_log) else "")
+            + ". Varje aktivering avräknas, och jämförs med målscenariot, i a- eller b-varianten efter riktning; "
+            "belopp och volymer summeras per period."
+        )
+        period = st.radio("Period", list(PERIODS), horizontal=True, key="backtest_period")
+        backtest_keys = [n for n, pair in BACKTEST_SCENARIOS.items() if set(pair) & set(visible_scenarios)]
+        report = _backtest_report(activation_log_file.getvalue(), params, target_scenario, period)
+        report = report[report["Scenario"].isin(backtest_keys)].assign(
+            Scenario=lambda df: df["Scenario"].map(BACKTEST_SCENARIO_COLUMNS)
+        )
+        column_config = {
+            "Budvolym": st.column_config.NumberColumn("Budvolym (MWh)", format=UNIT_COLUMN_FORMATS["MWh"]),
+            "Levererad volym": st.column_config.NumberColumn("Levererad volym (MWh)", format=UNIT_COLUMN_FORMATS["MWh"]),
+            **{
+                f: st.column_config.NumberColumn(f"{f} (EUR)", help=ROW_TIPS["Sammanställning"].get(f),
+                                                 format=UNIT_COLUMN_FORMATS["EUR"])
+                for f in REPORT_FIELDS
+            },
+        }
+        st.dataframe(report, hide_index=True, column_config=column_config)
+        st.markdown("**Neutralisering till/från slutkund per period (EUR)**")
+        st.bar_chart(report, x="Period", y="Neutralisering", color="Scenario", stack=False)
+
+        with st.expander("Fördelning per aktivering (kvantilskiss, EUR)"):
+            st.caption("Resultat per enskild aktivering; percentilerna är ungefärliga.")
+            _sketch_section(_backtest_sketch(activation_log_file.getvalue(), params, target_scenario), backtest_keys,
+                            BACKTEST_SCENARIO_COLUMNS, "Sammanställning", "backtest_sketch")
+
+        # ----- Kompensation per elhandlare (scenario 5, många RE) -----
+        if site_mapping_file is not None:
+            st.markdown("**Kompensation per elhandlare (scenario 5)**")
+            if "Anläggning" not in activation_log.columns:
+                st.warning("Aktiveringsloggen saknar kolumnen anläggning.")
+            else:
+                try:
+                    invoices = _log_invoices(activation_log_file.getvalue(), site_mapping_file.getvalue(), params)
+                except ValueError as exc:
+                    st.error(f"Kunde inte avräkna kompensationen: {exc}")
+                else:
+                    st.caption(
+                        f"{len(invoices):,} elhandlare. BSP betalar RE vid uppreglering"
+                        + (", RE betalar BSP vid nedreglering (omvänd kompensation)." if params["rev_comp_5b"] else ".")
+                    )
+                    st.dataframe(invoices.reset_index(), hide_index=True, column_config={
+                        c: st.column_config.NumberColumn(f"{c} ({unit})", format=UNIT_COLUMN_FORMATS[unit])
+                        for c, unit in INVOICE_COLUMNS
+                    })
+
+
+# ---------- Export: Excel med alla tabeller ----------
+from datetime import datetime
+import pandas as pd
+
+def _to_excel_sheets(sheets: dict) -> BytesIO:
+    output = BytesIO()
+    try:
+        # Försök använda XlsxWriter om det finns
+        writer_engine = "xlsxwriter"
+        import xlsxwriter
+    except ImportError:
+        # Annars använd openpyxl
+        writer_engine = "openpyxl"
+
+    with pd.ExcelWriter(output, engine=writer_engine) as writer:
+        for sheet_name, df in sheets.items():
+            safe_name = sheet_name[:31]
+            df.to_excel(writer, index=False, sheet_name=safe_name)
+
+            # Autofit fungerar bara om XlsxWriter används
+            if writer_engine == "xlsxwriter":
+                ws = writer.sheets[safe_name]
+                for col_idx, col in enumerate(df.columns):
+                    try:
+                        max_len = max(
+                            len(str(col)),
+                            int(df[col].astype(str).str.len().max() or 0)
+                        )
+                    except Exception:
+                        max_len = len(str(col))
+                    ws.set_column(col_idx, col_idx, min(50, max(12, max_len + 2)))
+
+    output.seek(0)
+    return output
+
+
+# Samla alla dina DataFrames här:
+sheets = {
+    "BRP": df_brp,
+    "BSP": df_bsp,
+    "RE": df_re,
+    "Sammanställning": df_sum,
+    "Slutkundens elpris": df_cust,
+    "Kompensation": df_comp_total,
+}
+
+excel_bytes = _to_excel_sheets(sheets)
+
+st.download_button(
+    label="📥 Exportera Excel (alla tabeller)",
+    data=excel_bytes,
+    file_name=f"scenarios_{datetime.now().strftime('%Y-%m-%d_%H%M')}.xlsx",
+    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    help="Laddar ner en Excel-fil med ett blad per tabell."
+)
+
+
+
+
+
+
+
+
+
+
+
+
+
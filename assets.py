@@ -0,0 +1,446 @@
+"""
+Statiskt sidinnehåll för appen: CSS, scenariobeskrivningar, scenarioetiketter,
+radspecifikationer och tooltips per tabell.
+
+Modulen importeras en gång per process, så texterna byggs en gång och delas av
+alla sessioner; app.py lägger bara till de parameterberoende talen.
+"""
+
+# Tillåt radbryt i rubriker för både DataFrame och DataEditor
+PAGE_CSS = """
+<style>
+/* DataEditor: bryt rubriktext på \n */
+[data-testid="stDataEditorColumnHeader"] div {
+  white-space: pre-line !important;
+}
+
+/* DataFrame: bryt rubriktext på \n */
+[data-testid="stDataFrame"] th div {
+  white-space: pre-line !important;
+}
+
+/* (frivilligt) centrera headern lite snyggare */
+[data-testid="stDataEditorColumnHeader"], [data-testid="stDataFrame"] th {
+  text-align: center !important;
+}
+</style>
+"""
+
+# Expanders under "Om scenarierna": (rubrik, markdown)
+SCENARIO_NOTES = [
+    (
+        "Gemensamma antaganden (A/B)",
+        """
+- **A = uppreglering** (förbrukningen sänks mot DA-plan), **B = nedreglering** (förbrukningen höjs mot DA-plan).
+- **Balanshandelstecken:** köp visas som **negativ** volym, sälj som **positiv**.
+- **Obalanskostnad:** beräknas med obalanspriset `P_IMB` på balanshandeln.
+- **Checkboxar som kan påverka flöden och rader i tabeller:**
+  
+  - *BRP vidarefakturerar balanskostnader till elhandlare* – om ikryssad går BRP:s balanskostnad vidare till RE.
+  - *BSP köper in energi vid nedreglering* – om ikryssad bokas en DA-handel till `P_DA` för samtliga **B-scenarier** (nedreglering); extra rader visas i BSP-tabellen.
+  - *Tillämpa avdrag för BSP vid över/underleverans* – aktiverar avdrag baserat på differensen mellan aktiverad och budad volym (`E_akt` – `E_bud`) i BSP-tabellen.  
+    Under- eller överleverans ger ett avdrag enligt `P_PEN` om aktiverad.
+  - *Motsatt kompensation i 5b (RE → BSP)* – om ikryssad betalar RE kompensation till BSP i scenario 5b (default: ingen kompensation i 5b).
+  - *Elhandlaren vidarefakturerar balanskostnader till slutkunden* – om ikryssad skickas BRP:s balansfaktura vidare på kundfakturan.
+  
+  
+  
+  
+  
+  
+  
+    """,
+    ),
+    (
+        "Scenario 1 – BRP = BSP, bud och **underleverans** (1a = upp, 1b = ned)",
+        """
+- BRP/BSP lämnar bud `E_bud` på reglering.
+- Utfallet ger **underleverans** mot budet: faktisk aktivering < budad aktivering.
+- Obalansjusteringen i BRP-tabellen baseras på **`E_bud`**.
+- I BSP-tabellen kan avdrag för under/överleverans aktiveras via checkboxen *Tillämpa avdrag...*.
+- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **1b** (ned).
+    """,
+    ),
+    (
+        "Scenario 2 – BRP = BSP, bud och **överleverans** (2a = upp, 2b = ned)",
+        """
+- Spegling av Scenario 1 men med **överleverans**: faktisk aktivering > budad aktivering.
+- Obalansjusteringen baseras på **`E_bud`**.
+- Avdrag i BSP-tabellen hanteras som i Scenario 1.
+- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **2b** (ned).
+    """,
+    ),
+    (
+        "Scenario 3 – BRP = BSP, **uppmätt aktivering** (3a = upp, 3b = ned)",
+        """
+- BRP och BSP är samma aktör.
+- Obalansjusteringen baseras på **uppmätt aktivering `E_akt`** (inte `E_bud`).
+- Ingen separat kompensation mellan aktörer.
+- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **3b** (ned).
+    """,
+    ),
+    (
+        "Scenario 4 – BRP ≠ BSP, uppmätt aktivering **utan kompensation** (4a = upp, 4b = ned)",
+        """
+- BRP och BSP är **olika** aktörer.
+- Obalansjusteringen baseras på **`E_akt`**.
+- **Ingen kompensation** mellan BSP och RE.
+- Om *BSP köper in energi vid ndereglering* är ikryssad visas DA-rader i **4b** (ned).
+    """,
+    ),
+    (
+        "Scenario 5 – BRP ≠ BSP, uppmätt aktivering **med kompensation** (5a = upp, 5b = ned)",
+        """
+- Baseras på **`E_akt`**.
+- **5a (ned):** BSP → RE (RE får kompensation) med pris **`P_RECOMP`**. *Denna kompensation är alltid aktiv i 5a.*
+- **5b (ned):** Default **ingen kompensation**. Om *Motsatt kompensation i 5b (RE → BSP)* är ikryssad betalar RE kompensation till BSP.
+- Om *BSP köper in energi vid nedreglering* är ikryssad visas DA-rader i **5b** (ned).
+    """,
+    ),
+    (
+        "Slutkundens elpris & tabeller",
+        """
+- **Slutkundens elpris** i RE-tabellen:
+  \n  `Pris = –(Inköp från BRP + ev. balans som skickas vidare + ev. kompensation) / fakturerad volym`
+- Tabellen **”Slutkundens elpris per scenario”** visar även avvikelse mot vald målkolumn (default 5a) samt **Ökad totalkostnad slutkund** (= prisavvikelse × fakturerad volym).
+    """,
+    ),
+    (
+        "Kompensation till slutkund (Tabell 6)",
+        """
+- **Kompensation = max(0, Ökad totalkostnad slutkund)** per scenario för att neutralisera merkostnaden mot målscenariot.
+- **Aktörers resultat efter kompensation** räknas från **BRP+BSP+Elhandlare resultat** (om ”NA” används **BSP resultat** som bas) minus kompensationen.
+- Om *Motsatt kompensation i 5b* är aktiverad påverkar detta resultaten i 5b innan neutraliseringskompensation beräknas.
+    """,
+    ),
+]
+
+# Kort nyckel → kolumnrubrik i tabellerna
+SCENARIO_COLUMNS = {
+    "1a": "1a BRP=BSP, Upp – Bud/underlev.",
+    "1b": "1b BRP=BSP, Ned – Bud/underlev.",
+    "2a": "2a BRP=BSP, Upp – Bud/överlev.",
+    "2b": "2b BRP=BSP, Ned – Bud/överlev.",
+    "3a": "3a BRP=BSP, Upp – Uppmätt akt.",
+    "3b": "3b BRP=BSP, Ned – Uppmätt akt.",
+    "4a": "4a BRP≠BSP, Upp – Uppmätt (ingen komp)",
+    "4b": "4b BRP≠BSP, Ned – Uppmätt (ingen komp)",
+    "5a": "5a BRP≠BSP, Upp – Uppmätt (med komp)",
+    "5b": "5b BRP≠BSP, Ned – Uppmätt (med komp)",
+}
+# Backtest: scenario 1–5 med varianten (a/b) vald per aktivering
+BACKTEST_SCENARIO_COLUMNS = {
+    "1": "1 BRP=BSP – Bud/underlev.",
+    "2": "2 BRP=BSP – Bud/överlev.",
+    "3": "3 BRP=BSP – Uppmätt akt.",
+    "4": "4 BRP≠BSP – Uppmätt (ingen komp)",
+    "5": "5 BRP≠BSP – Uppmätt (med komp)",
+}
+
+
+# Radspec: (fält, enhet) eller (etikett, fält, enhet) per rad; tooltips per etikett
+
+# ---------- TABELL 1: BRP ----------
+BRP_ROW_SPECS = [
+    ("Obalansjusteras baserat på", ""),
+    ("Handel", "MWh"),
+    ("DA Pris", "€/MWh"),
+    ("Kostnad handel", "EUR"),
+    ("Obalansjustering", "MWh"),
+    ("Summa avräknas i balans", "MWh"),
+    ("Uppmätt", "MWh"),
+    ("Balanshandel (köp − / sälj +)", "MWh"),
+    ("Obalanspris", "€/MWh"),
+    ("Balanskostnad BRP", "EUR"),
+    ("Inköpt el som faktureras", "EUR"),
+    ("Obalanskostnad som faktureras", "EUR"),
+    ("BRP fakturerar elhandlare", "EUR"),
+    ("BRP nettokostnad", "EUR"),
+]
+
+BRP_ROW_TIPS = {
+    "Obalansjusteras baserat på":
+        "Visar om obalansjusteringen görs mot bud (E_bud) eller uppmätt aktivering (E_akt), samt riktning: upp eller ned.",
+    "Handel":
+        "DA-handeln mot marknaden: handel_sign × V_DA (köp = negativ, sälj = positiv). Enhet: MWh.",
+    "DA Pris":
+        "Day-Ahead-priset P_DA som används för DA-handeln. Enhet: €/MWh.",
+    "Kostnad handel":
+        "Kostnad/intäkt för DA-handeln: Handel × P_DA. Enhet: EUR.",
+    "Obalansjustering":
+        "Volym som justeras i balansavräkningen (E_bud eller E_akt; tecken vänds i ned-scenarier). Enhet: MWh.",
+    "Summa avräknas i balans":
+        "Handel + Obalansjustering. Summan som går in i balansavräkningen. Enhet: MWh.",
+    "Uppmätt":
+        "Uppmätt förbrukning i scenariot (E_cons_x). Enhet: MWh.",
+    "Balanshandel (köp − / sälj +)":
+        "Motpost som balanserar mätning och avräknad handel: −(Uppmätt + Summa avräknas i balans). Enhet: MWh.",
+    "Obalanspris":
+        "Obalanspris P_IMB som används för balanshandeln. Enhet: €/MWh.",
+    "Balanskostnad BRP":
+        "Kostnad/intäkt för balanshandeln: Balanshandel × P_IMB. Enhet: EUR.",
+    "Inköpt el som faktureras":
+        "Belopp för DA-inköp som BRP fakturerar elhandlaren: |Handel| × P_DA. Enhet: EUR.",
+    "Obalanskostnad som faktureras":
+        "Den del av BRP:s balanskostnad som faktureras vidare till elhandlaren (styrt av checkboxen). Enhet: EUR.",
+    "BRP fakturerar elhandlare":
+        "Summa faktura till elhandlaren: Inköpt el som faktureras + Obalanskostnad som faktureras. Enhet: EUR.",
+    "BRP nettokostnad":
+        "BRP:s resultat: Kostnad handel + Balanskostnad BRP + Inköpt el som faktureras + Obalanskostnad som faktureras. Enhet: EUR.",
+}
+
+
+# ---------- TABELL 2: BSP ----------
+BSP_ROW_SPECS = [
+    ("Budvolym/Aktiverad volym", "MWh"),
+    ("Ersättningspris", "€/MWh"),
+    ("Ersättningsresultat", "EUR"),
+    ("Under/överleveransvolym", "MWh"),
+    ("Under/överleveranspris", "€/MWh"),
+    ("Under/överleveransresultat", "EUR"),
+    ("Kompensationsvolym", "MWh"),
+    ("Kompensationspris", "€/MWh"),
+    ("Kompensationsresultat", "EUR"),
+    ("DA handel vid nedreglering", "MWh"),
+    ("DA pris", "€/MWh"),
+    ("Kostnad DA handel", "EUR"),
+    ("Upphandlad kapacitet", "MW"),
+    ("Otillgänglig kapacitet", "MW"),
+    ("Kapacitetspris", "€/MW,h"),
+    ("Kapacitetsersättning", "EUR"),
+    ("Avdrag otillgänglighet", "EUR"),
+    ("BSP nettoresultat", "EUR"),
+]
+
+BSP_ROW_TIPS = {
+    "Budvolym/Aktiverad volym":
+        "Volym som ersättning baseras på: E_bud (bud) eller E_akt (uppmätt). Negativ i B-scenarier (nedreglering).",
+    "Ersättningspris":
+        "Pris per MWh som BSP får för aktiveringen: P_COMP (alt. obalanspris om checkbox).",
+    "Ersättningsresultat":
+        "Intäkt baserad på ersättningsvolym: |Budvolym/Aktiverad volym| × Ersättningspris.",
+    "Under/överleveransvolym":
+        "Skillnad mellan uppmätt aktivering och budad volym: |E_akt − E_bud| (endast när ersättning baseras på bud).",
+    "Under/överleveranspris":
+        "Avdragspris P_PEN för över-/underleverans (0 om checkbox för avdrag ej ikryssad).",
+    "Under/överleveransresultat":
+        "Avdrag för över-/underleverans: − Under/överleveransvolym × Under/överleveranspris.",
+    "Kompensationsvolym":
+        "Volym som används för kompensation mellan BSP och RE (oftast E_akt i scen 5).",
+    "Kompensationspris":
+        "Pris för kompensation mellan BSP och RE: P_RECOMP.",
+    "Kompensationsresultat":
+        "Resultat av kompensationen: Kompensationsvolym × Kompensationspris × comp_sign (tecken beror på riktning).",
+    "DA handel vid nedreglering":
+        "Extra DA-handel BSP gör i ned-scenarier när checkboxen 'BSP köper in energi vid nedreglering' är ikryssad.",
+    "DA pris":
+        "DA-pris P_DA som används för köp/sälj i raden 'DA handel vid nedreglering'.",
+    "Kostnad DA handel":
+        "Kostnad/intäkt för DA-handel vid nedreglering: − DA handel × DA pris (negativt = kostnad).",
+    "Upphandlad kapacitet":
+        "Kapacitet (MW) som BSP sålt på kapacitetsmarknaden (mFRR-kapacitet/FCR) för MTU:n: C_cap.",
+    "Otillgänglig kapacitet":
+        "Del av upphandlad kapacitet som enligt mätdata inte fanns tillgänglig: max(C_cap − C_avail, 0). "
+        "0 om tillgänglighetskontrollen inte är ikryssad.",
+    "Kapacitetspris":
+        "Ersättning per MW och timme för tillgänglig kapacitet: P_CAP.",
+    "Kapacitetsersättning":
+        "(Upphandlad − otillgänglig kapacitet) × Kapacitetspris × 0,25 h per MTU.",
+    "Avdrag otillgänglighet":
+        "− Otillgänglig kapacitet × avdragspris P_CAP_PEN × 0,25 h per MTU.",
+    "BSP nettoresultat":
+        "Samlat resultat för BSP: Ersättningsresultat + Under/överleveransresultat + Kompensationsresultat + "
+        "Kostnad DA handel + Kapacitetsersättning + Avdrag otillgänglighet.",
+}
+
+
+# ---------- TABELL 3: Elhandlare / RE ----------
+RE_ROW_SPECS = [
+    ("Inköpt el fakturerad av BRP", "EUR"),
+    ("Balanskostnad fakturerad av BRP", "EUR"),
+    ("Kompensationsvolym för flexibilitet", "MWh"),
+    ("Kompensationsbelopp", "EUR"),
+    ("Kostnad att fakturera slutkunden", "EUR"),
+    ("Volym att fakturera kunden", "MWh"),
+    ("Snittpris för inköp el som kan faktureras", "€/MWh"),
+    ("Slutkundens elpris", "€/MWh"),
+    ("Kostnad som faktureras slutkund", "EUR"),
+    ("Resultat", "EUR"),
+]
+
+RE_ROW_TIPS = {
+    "Inköpt el fakturerad av BRP":
+        "RE:s kostnad för el som köps från BRP: −|Handel| × P_DA. Negativt värde = kostnad.",
+    "Balanskostnad fakturerad av BRP":
+        "Del av BRP:s balanskostnad som faktureras vidare till RE (beroende på om BRP vidarefakturerar).",
+    "Kompensationsvolym för flexibilitet":
+        "Volym som ligger till grund för kompensation mellan RE och BSP (ofta lika med obalansjusteringen).",
+    "Kompensationsbelopp":
+        "Belopp för kompensation mellan RE och BSP: re_sign × Kompensationsvolym × P_RECOMP.",
+    "Kostnad att fakturera slutkunden":
+        "Total kostnad (inköp + ev. balans + komp) som RE behöver täcka genom kundfakturering.",
+    "Volym att fakturera kunden":
+        "MWh som RE fakturerar slutkund för (normalt samma som kundens förbrukning E_cons).",
+    "Snittpris för inköp el som kan faktureras":
+        "Kostnadsbaserat snittpris: (Kostnad att fakturera slutkunden) / (Volym att fakturera kunden).",
+    "Slutkundens elpris":
+        "Elpris som faktiskt används mot slutkunden: antingen snittpriset eller P_DA om checkboxen är ikryssad.",
+    "Kostnad som faktureras slutkund":
+        "Beloppet på kundens faktura: Slutkundens elpris × Volym som faktureras slutkund.",
+    "Resultat":
+        "RE:s resultat i timmen: inköp från BRP + balanskostnad + kompensation + intäkt från slutkund.",
+}
+
+
+# ---------- TABELL 4: Sammanställning ----------
+SUM_ROW_SPECS = [
+    ("BRP resultat", "BRP resultat", "EUR"),
+    ("BSP resultat", "BSP resultat", "EUR"),
+    ("Elhandlare resultat", "Elhandlare resultat", "EUR"),
+    ("BRP+BSP resultat", "BRP+BSP resultat", "EUR/NA"),
+    ("BRP+BSP+Elhandlare resultat", "BRP+BSP+Elhandlare resultat", "EUR/NA"),
+    ("Målresultat för aktör (målscenariots BSP resultat)", "Målresultat", "EUR/NA"),
+    ("Avvikelse mot aktörers målresultat", "Avvikelse mot aktörers målresultat", "EUR/NA"),
+]
+
+SUM_ROW_TIPS = {
+    "BRP resultat":
+        "BRP:s nettokostnad per scenario (från Tabell 1). Negativt = kostnad, positivt = intäkt.",
+    "BSP resultat":
+        "BSP:s nettoresultat per scenario (från Tabell 2). Positivt = intäkt, negativt = kostnad.",
+    "Elhandlare resultat":
+        "Elhandlarens (RE:s) nettoresultat per scenario (från Tabell 3). Positivt = vinst, negativt = förlust.",
+    "BRP+BSP resultat":
+        "Summa BRP resultat + BSP resultat i scenarion där BRP=BSP (1a–3b). I övriga scenarion visas 'NA'.",
+    "BRP+BSP+Elhandlare resultat":
+        "Totalsumma för BRP + BSP + RE i scenarion där BRP=BSP (1a–3b). Ger systemets samlade resultat.",
+    "Målresultat för aktör (målscenariots BSP resultat)":
+        "Mål-/referensnivå: BSP:s nettoresultat i valt målscenario (förval 5a). Används som benchmark.",
+    "Avvikelse mot aktörers målresultat":
+        "Skillnad mellan målresultatet (målscenariots BSP) och totalsumman per scenario. "
+        "Positivt = bättre än mål, negativt = sämre. 'NA' där jämförelse inte är relevant.",
+}
+
+
+# ---------- TABELL 5: Slutkundens elpris ----------
+CUST_ROW_SPECS = [
+    ("Slutkundens elpris (från RE-tabellen)", "Slutkundens elpris", "€/MWh"),
+    ("Målresultat för slutkunds elpris (målscenariots elpris)", "Målpris", "€/MWh"),
+    ("Avvikelse slutkundens elpris", "Avvikelse slutkundens elpris", "€/MWh"),
+    ("Ökad totalkostnad slutkund", "Ökad totalkostnad slutkund", "EUR"),
+]
+
+CUST_ROW_TIPS = {
+    "Slutkundens elpris (från RE-tabellen)":
+        "Det elpris per MWh som kunden faktiskt betalar i varje scenario, hämtat direkt från RE-tabellen "
+        "(påverkas av checkboxen 'Använd DA pris…').",
+    "Målresultat för slutkunds elpris (målscenariots elpris)":
+        "Mål-/referenspris för slutkunden: slutkundens elpris i valt målscenario (förval 5a). Används som jämförelsenivå.",
+    "Avvikelse slutkundens elpris":
+        "Skillnad mellan kundens pris i respektive scenario och målpriset (målscenariot). "
+        "Positivt värde = dyrare än mål, negativt = billigare än mål.",
+    "Ökad totalkostnad slutkund":
+        "Extra (eller minskad) total kostnad i EUR för kunden jämfört med målpris: "
+        "Avvikelse i pris × volym som faktureras slutkund i scenariot.",
+}
+
+
+# ---------- Parvis avvikelsematris (engine.deviation_matrix) ----------
+# Fält → enhet. Rad = scenario, kolumn = målscenario.
+DEVIATION_UNITS = {
+    "Avvikelse mot aktörers målresultat": "EUR/NA",
+    "Avvikelse slutkundens elpris": "€/MWh",
+    "Ökad totalkostnad slutkund": "EUR",
+}
+
+
+# ---------- TABELL 6: Kompensation ----------
+# Neutraliseringsraden byter etikett med checkboxen för omvänd neutralisering
+NEUTRAL_LABELS = {
+    True: "Neutralisering till/från slutkund",
+    False: "Kompensation till slutkund för neutralisering",
+}
+COMP_ROW_SPECS = {
+    reverse: [
+        (label, "Neutralisering", "EUR"),
+        ("Aktörers resultat efter kompensation", "Aktörers resultat efter kompensation", "EUR"),
+    ]
+    for reverse, label in NEUTRAL_LABELS.items()
+}
+COMP_ROW_TIPS = {
+    **{
+        label: "Belopp som överförs till/från slutkund för att neutralisera prisavvikelsen: "
+               "beräknas från ‘Ökad totalkostnad slutkund’. "
+               "Om ‘omvänd neutralisering’ är urkryssad tas bara positiva belopp med."
+        for label in NEUTRAL_LABELS.values()
+    },
+    "Aktörers resultat efter kompensation":
+        "Samlat resultat för alla aktörer efter att neutraliserings-/kompensationsbeloppet "
+        "dragits från utgångsresultatet (totalresultat eller BSP-resultat om total saknas).",
+}
+
+
+# ---------- Live: innevarande dygn ----------
+LIVE_ROW_SPECS = [
+    ("BRP resultat", "EUR"),
+    ("BSP resultat", "EUR"),
+    ("Elhandlare resultat", "EUR"),
+    ("BRP+BSP+Elhandlare resultat", "EUR/NA"),
+    ("Slutkundens elpris (snitt)", "Slutkundens elpris", "€/MWh"),
+    ("Avvikelse slutkundens elpris", "€/MWh"),
+    ("Ökad totalkostnad slutkund", "EUR"),
+    ("Neutralisering", "EUR"),
+    ("Aktörers resultat efter kompensation", "EUR"),
+]
+
+
+# ---------- Slutkunder per avtal (tariffs.py) ----------
+TARIFF_ROW_SPECS = [
+    ("Kunder", "st"),
+    ("Volym", "MWh"),
+    ("Kundkostnad enligt avtal", "EUR"),
+    ("Snittpris", "€/MWh"),
+    ("Ökad totalkostnad slutkund", "EUR"),
+    ("Neutralisering per kund", "EUR"),
+    ("Kunder med merkostnad", "st"),
+]
+
+TARIFF_ROW_TIPS = {
+    "Kunder": "Antal kunder med avtalet.",
+    "Volym": "Kundernas fakturerade volym: kundens andel av RE:s fakturerade volym per MTU.",
+    "Kundkostnad enligt avtal":
+        "Summa av volym × avtalspris per MTU (fast, spot + påslag, tidstariff eller RE:s snittpris + påslag).",
+    "Snittpris": "Kundkostnad / volym.",
+    "Ökad totalkostnad slutkund":
+        "Summa per kund av volym × (kundens snittpris − kundens snittpris i målscenariot).",
+    "Neutralisering per kund":
+        "Kompensationsbehovet räknat per kund (max(0, merkostnad), signerat med omvänd neutralisering) och "
+        "summerat. Större än eller lika med neutraliseringen på totalen när kunderna påverkas olika.",
+    "Kunder med merkostnad": "Antal kunder vars kostnad ökar med minst en cent mot målscenariot.",
+}
+
+
+# ---------- Tabeller per aktör ----------
+# Tooltips per tabell (nyckel för den cachade tooltip-ramen i app.py)
+ROW_TIPS = {
+    "BRP": BRP_ROW_TIPS,
+    "BSP": BSP_ROW_TIPS,
+    "RE": RE_ROW_TIPS,
+    "Sammanställning": SUM_ROW_TIPS,
+    "Slutkundens elpris": CUST_ROW_TIPS,
+    "Kompensation": COMP_ROW_TIPS,
+    "Summering": {**SUM_ROW_TIPS, **CUST_ROW_TIPS, **COMP_ROW_TIPS},
+    "Slutkunder": TARIFF_ROW_TIPS,
+}
+
+# Visningsnamn → (aktör i resultaten, radspec, tooltip-tabell), per läge för omvänd neutralisering.
+# Används av tidsserie- och prisscenariovyerna.
+ACTOR_TABLES = {
+    reverse: {
+        "BRP": ("BRP", BRP_ROW_SPECS, "BRP"),
+        "BSP": ("BSP", BSP_ROW_SPECS, "BSP"),
+        "Elhandlare": ("RE", RE_ROW_SPECS, "RE"),
+        "Sammanställning": ("Sammanställning", SUM_ROW_SPECS + CUST_ROW_SPECS + COMP_ROW_SPECS[reverse], "Summering"),
+    }
+    for reverse in NEUTRAL_LABELS
+}
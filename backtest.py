@@ -0,0 +1,162 @@
+"""
+Backtest mot historiska mFRR-aktiveringar.
+
+En aktiveringslogg har en rad per aktivering: tid, riktning, budvolym och
+levererad volym (valfritt även P_DA, P_IMB och E_cons för perioden; utan
+E_cons räknas förbrukningen ur V_DA och den levererade volymen).
+Riktningen väljer variant – uppreglering ger a-scenarierna (A-sidan, E_bud/
+E_akt), nedreglering b-scenarierna (B-sidan, E_bud_up/E_akt_up) – och
+volymerna läggs in som serier. Hela loggen avräknas i ett vektoriserat anrop
+för alla tio scenarier; därefter väljs varje rads variant, så att resultatet
+blir ett värde per rad och scenario 1–5.
+
+Rapporterna summerar aktörernas resultat och neutraliseringen mot slutkund
+per dygn eller per månad. backtest_sketch() avräknar loggen i block och
+behåller bara en kvantilskiss över resultaten per aktivering, för loggar som
+sträcker sig över många år.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import ACTORS, DEFAULT_PARAMS, TARGET_SCENARIO, by_actor, settle, summarize
+from sketches import DEFAULT_K, ResultSketch
+from timeseries import TIME_COLUMNS
+
+# Scenario 1–5 → (variant vid uppreglering, variant vid nedreglering)
+BACKTEST_SCENARIOS = {str(n): (f"{n}a", f"{n}b") for n in range(1, 6)}
+
+# Accepterade kolumnnamn i loggen (gemener) → kolumn i den inlästa loggen
+LOG_COLUMNS = {
+    "riktning": "Riktning", "direction": "Riktning",
+    "e_bud": "E_bud", "bud": "E_bud", "budvolym": "E_bud", "bid_volume": "E_bud",
+    "e_akt": "E_akt", "levererad": "E_akt", "levererad volym": "E_akt", "delivered_volume": "E_akt",
+    "p_da": "P_DA", "p_imb": "P_IMB", "e_cons": "E_cons",
+    "anläggning": "Anläggning", "site": "Anläggning",
+}
+REQUIRED_LOG_COLUMNS = ("Riktning", "E_bud", "E_akt")
+
+# Riktning i loggen (gemener) → True för uppreglering (a), False för nedreglering (b)
+DIRECTIONS = {
+    "upp": True, "up": True, "uppreglering": True, "a": True, "+": True,
+    "ned": False, "down": False, "nedreglering": False, "b": False, "-": False,
+}
+
+# Rapportfält (Sammanställning) och perioder
+REPORT_FIELDS = (
+    "BRP resultat", "BSP resultat", "Elhandlare resultat", "Neutralisering", "Aktörers resultat efter kompensation",
+)
+PERIODS = {"Dygn": "D", "Månad": "M"}
+
+# Loggrader per block i backtest_sketch()
+SKETCH_ROWS = 100_000
+
+
+def read_activation_log(buf) -> pd.DataFrame:
+    """
+    Läser en aktiveringslogg (CSV, avgränsare och decimalkomma som
+    read_series_csv). Returnerar en tidssorterad DataFrame med tidsindex,
+    kolumnen Riktning (True = uppreglering) och E_bud, E_akt samt de av
+    P_DA, P_IMB, E_cons och Anläggning som finns.
+    """
+    raw = pd.read_csv(buf, sep=None, engine="python", dtype=str)
+    raw.columns = [c.strip() for c in raw.columns]
+    names = {c: LOG_COLUMNS[c.lower()] for c in raw.columns if c.lower() in LOG_COLUMNS}
+    time_col = next((c for c in raw.columns if c.lower() in TIME_COLUMNS), None)
+    missing = [c for c in REQUIRED_LOG_COLUMNS if c not in names.values()]
+    if time_col is None or missing:
+        raise ValueError(f"Loggen saknar kolumner: {', '.join((['tid'] if time_col is None else []) + missing)}")
+
+    raw = raw.rename(columns=names)
+    direction = raw["Riktning"].str.strip().str.lower().map(DIRECTIONS)
+    if direction.isna().any():
+        bad = sorted(set(raw.loc[direction.isna(), "Riktning"].astype(str)))
+        raise ValueError(f"Okänd riktning: {', '.join(bad[:5])} (förväntar upp/ned)")
+
+    df = pd.DataFrame({"Riktning": direction.astype(bool)})
+    for c in dict.fromkeys(names.values()):
+        if c == "Anläggning":
+            df[c] = raw[c].str.strip().to_numpy()
+        elif c != "Riktning":
+            df[c] = pd.to_numeric(raw[c].str.replace(",", ".", regex=False).str.strip(), errors="raise")
+    df.index = pd.DatetimeIndex(pd.to_datetime(raw[time_col]), name="Tid")
+    return df.sort_index(kind="stable")
+
+
+def backtest(params: dict, log: pd.DataFrame, target: str = TARGET_SCENARIO) -> dict:
+    """
+    Avräknar loggen i ett anrop. Returnerar scenario (1–5) → aktör → fält med
+    ett värde per loggrad, från a-varianten vid uppreglering och b-varianten
+    vid nedreglering. Målet följer raden på samma sätt: uppregleringar jämförs
+    med målscenariots a-variant och nedregleringar med dess b-variant.
+    Rader utan E_cons får förbrukningen V_DA − E_akt (uppreglering) respektive
+    V_DA + E_akt (nedreglering).
+    """
+    up = log["Riktning"].to_numpy(dtype=bool)
+    p = {**DEFAULT_PARAMS, **params}
+    bud, akt = log["E_bud"].to_numpy(dtype=float), log["E_akt"].to_numpy(dtype=float)
+    p.update({"E_bud": bud, "E_akt": akt, "E_bud_up": bud, "E_akt_up": akt})
+    for c in ("P_DA", "P_IMB"):
+        if c in log.columns:
+            p[c] = log[c].fillna(p[c]).to_numpy(dtype=float)
+    measured = log["E_cons"].to_numpy(dtype=float) if "E_cons" in log.columns else np.full(len(log), np.nan)
+    v_da = np.asarray(p["V_DA"], dtype=float)
+    p["E_cons"] = np.where(np.isnan(measured), v_da - akt, measured)
+    p["E_cons_up"] = np.where(np.isnan(measured), v_da + akt, measured)
+
+    settled = settle(p, [k for pair in BACKTEST_SCENARIOS.values() for k in pair])
+    up_target, down_target = BACKTEST_SCENARIOS[target[:-1]]
+    results_up = by_actor(settled, summarize(p, settled, up_target))
+    results_down = by_actor(settled, summarize(p, settled, down_target))
+
+    def pick(va, vb):
+        if isinstance(va, str):
+            return va
+        return np.where(up, va, vb)
+
+    return {
+        n: {a: {f: pick(v, results_down[b][a][f]) for f, v in results_up[a_key][a].items()} for a in ACTORS}
+        for n, (a_key, b) in BACKTEST_SCENARIOS.items()
+    }
+
+
+def backtest_report(log: pd.DataFrame, results: dict, period: str = "Dygn", scenarios=None,
+                    fields=REPORT_FIELDS) -> pd.DataFrame:
+    """
+    Summor per period (nyckel i PERIODS) och scenario i långt format:
+    Period, Scenario, antal aktiveringar, bud- och levererad volym och fälten
+    (Sammanställning). En rad per period med aktiveringar och scenario.
+    """
+    scenarios = list(scenarios or BACKTEST_SCENARIOS)
+    periods = log.index.to_period(PERIODS[period])
+    n = len(log)
+    base = pd.DataFrame({
+        "Aktiveringar": np.ones(n, dtype=int),
+        "Budvolym": log["E_bud"].to_numpy(dtype=float),
+        "Levererad volym": log["E_akt"].to_numpy(dtype=float),
+    })
+    frames = []
+    for k in scenarios:
+        df = base.assign(**{
+            f: np.broadcast_to(np.asarray(results[k]["Sammanställning"][f], dtype=float), (n,)) for f in fields
+        })
+        sums = df.groupby(periods, sort=True).sum()
+        sums.insert(0, "Scenario", k)
+        frames.append(sums)
+    report = pd.concat(frames).rename_axis("Period").reset_index()
+    report["Period"] = report["Period"].astype(str)
+    return report.sort_values(["Period", "Scenario"], kind="stable").reset_index(drop=True)
+
+
+def backtest_sketch(params: dict, log: pd.DataFrame, target: str = TARGET_SCENARIO, actors=None, fields=None,
+                    rows: int = SKETCH_ROWS, k: int = DEFAULT_K) -> ResultSketch:
+    """
+    Fördelningen av resultaten per aktivering (scenario 1–5 → aktör → fält)
+    utan att spara dem: loggen avräknas i block om `rows` rader och varje
+    block läggs in i en ResultSketch (valfritt bara vissa aktörer och fält).
+    """
+    sketch = None
+    for lo in range(0, len(log), rows):
+        results = backtest(params, log.iloc[lo:lo + rows], target)
+        sketch = sketch or ResultSketch.for_results(results, actors, fields, k)
+        sketch.update(results)
+    return sketch
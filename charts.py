@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+
+# ---------- Nedsampling av långa serier (serversidan) ----------
+# Diagrammen får aldrig fler än ~n_out punkter per serie, oavsett hur många
+# MTU som avräknats. Båda metoderna behåller seriens första och sista punkt.
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Min/max-hinkar: delar serien i n_out/2 hinkar och behåller index för
+    min och max i varje hink (i tidsordning). Bevarar toppar och dalar exakt.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 4:
+        return np.arange(n)
+    n_buckets = n_out // 2
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    # Hinkarna läggs som rader i en (hinkar × bredd)-matris så att argmin/argmax blir en operation
+    starts = edges[:-1]
+    width = np.diff(edges)
+    pad = width.max()
+    idx = starts[:, None] + np.arange(pad)[None, :]
+    valid = idx < edges[1:, None]
+    idx = np.where(valid, idx, starts[:, None])
+    vals = y[idx]
+    i_min = idx[np.arange(n_buckets), np.argmin(np.where(valid, vals, np.inf), axis=1)]
+    i_max = idx[np.arange(n_buckets), np.argmax(np.where(valid, vals, -np.inf), axis=1)]
+    return np.unique(np.concatenate(([0, n - 1], i_min, i_max)))
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: väljer i varje hink den punkt som bildar
+    störst triangel med föregående vald punkt och nästa hinks medelpunkt.
+    """
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+
+    # Medelpunkt per hink (används som "nästa" hörn i triangeln)
+    csx = np.concatenate(([0.0], np.cumsum(x)))
+    csy = np.concatenate(([0.0], np.cumsum(y)))
+    nxt_lo = edges[1:]
+    nxt_hi = np.append(edges[2:], n)
+    cnt = np.maximum(nxt_hi - nxt_lo, 1)
+    avg_x = (csx[nxt_hi] - csx[nxt_lo]) / cnt
+    avg_y = (csy[nxt_hi] - csy[nxt_lo]) / cnt
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        if hi <= lo:
+            hi = lo + 1
+        xs, ys = x[lo:hi], y[lo:hi]
+        area = np.abs((x[a] - avg_x[b]) * (ys - y[a]) - (x[a] - xs) * (avg_y[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        out[b + 1] = a
+    return out
+
+
+def downsample(x: np.ndarray, y: np.ndarray, n_out: int, method: str = "lttb") -> np.ndarray:
+    """Index att behålla för serien (x, y). NaN behandlas som 0 vid urvalet."""
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    if method == "minmax":
+        return minmax_indices(y, n_out)
+    return lttb_indices(np.asarray(x, dtype=float), y, n_out)
+
+
+def downsample_long(index: pd.Index, series: dict, n_out: int, method: str = "lttb",
+                    name: str = "Scenario", value: str = "Värde") -> pd.DataFrame:
+    """
+    Nedsamplar varje serie för sig och returnerar långt format
+    (index, name, value) – färdigt för st.line_chart/st.area_chart med color=name.
+    """
+    x = index.asi8.astype(float) if isinstance(index, pd.DatetimeIndex) else np.asarray(index, dtype=float)
+    x_name = index.name or "MTU"
+    parts = []
+    for label, y in series.items():
+        y = np.broadcast_to(np.asarray(y, dtype=float), (len(index),))
+        keep = downsample(x, y, n_out, method)
+        parts.append(pd.DataFrame({x_name: index[keep], name: label, value: y[keep]}))
+    return pd.concat(parts, ignore_index=True)
+
+
+# ---------- Sidvis resultattabell (serversidan) ----------
+# Resultaten ligger kvar som arrayer; filtrering på scenario, aktör och
+# tidsfönster görs med index och bara den sida som visas byggs som DataFrame.
+# Raderna ordnas tid för tid med de valda scenarierna efter varandra.
+
+def page_count(window: tuple, n_scenarios: int, page_size: int) -> int:
+    """Antal sidor för fönstret [lo, hi) och n_scenarios scenarier (minst 1)."""
+    lo, hi = window
+    return max(1, -(-(hi - lo) * n_scenarios // page_size))
+
+
+def result_page(index: pd.Index, results: dict, actor: str, scenarios: dict, columns: list,
+                window: tuple, page: int, page_size: int) -> pd.DataFrame:
+    """
+    En sida (0-baserad) av resultaten i långt format: (index, Scenario, fält …).
+    results: scenario → aktör → fält (ndarray eller skalär), scenarios:
+    scenario → visningsnamn, columns: (kolumnnamn, fält). Saknade fält blir NaN.
+    """
+    lo, hi = window
+    keys = list(scenarios)
+    n_keys = max(len(keys), 1)
+    first = page * page_size
+    rows = np.arange(first, min(first + page_size, (hi - lo) * len(keys)))
+    mtu, which = np.divmod(rows, n_keys)
+    mtu += lo
+
+    n = len(index)
+    out = {
+        index.name or "MTU": index[mtu],
+        "Scenario": np.array([scenarios[k] for k in keys], dtype=object)[which] if keys else [],
+    }
+    for name, field in columns:
+        col = np.full(len(rows), np.nan)
+        for s, k in enumerate(keys):
+            v = results[k][actor].get(field)
+            if v is None or isinstance(v, str):
+                continue
+            sel = which == s
+            col[sel] = np.broadcast_to(np.asarray(v, dtype=float), (n,))[mtu[sel]]
+        out[name] = col
+    return pd.DataFrame(out)
@@ -0,0 +1,177 @@
+"""
+Kompensation mellan en BSP och många elhandlare (scenario 5).
+
+Motorns scenario 5 har en BSP och en RE med ett gemensamt kompensationspris
+P_RECOMP. Här kopplas anläggningar till elhandlare via en gles mappning
+(anläggning → RE, med andel om en anläggnings kunder delas mellan flera RE)
+och varje RE har sitt eget pris.
+
+Flödena per MTU och RE är produkten av aktiveringarna (MTU × anläggningar)
+och mappningen (anläggningar × RE). Båda är glesa, och produkten räknas utan
+att någon av dem görs tät: mappningen lagras som CSR per anläggning, varje
+aktivering expanderas till sina länkar och volym × andel summeras med
+np.bincount direkt i (MTU × riktning × RE). Minnet växer med antalet
+aktiveringar och länkar, inte med anläggningar × MTU.
+
+Uppreglering (5a): BSP betalar RE, volym × RE:s pris. Nedreglering (5b): RE
+betalar BSP om omvänd kompensation (rev_comp_5b) är vald, annars inget flöde.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import CENT_PER_EUR, DEFAULT_PARAMS, KWH_PER_MWH, amount, apply_price_rules
+
+# Kolumnnamn i mappningsfilen (gemener) → kolumn
+MAPPING_COLUMNS = {
+    "anläggning": "Anläggning", "site": "Anläggning",
+    "elhandlare": "Elhandlare", "re": "Elhandlare", "retailer": "Elhandlare",
+    "andel": "Andel", "share": "Andel",
+    "p_recomp": "P_RECOMP",
+}
+SHARE_TOL = 1e-9
+
+# Fakturakolumner per elhandlare: (kolumn, enhet)
+INVOICE_COLUMNS = (
+    ("Volym BSP → RE", "MWh"),
+    ("Belopp BSP → RE", "EUR"),
+    ("Volym RE → BSP", "MWh"),
+    ("Belopp RE → BSP", "EUR"),
+    ("Netto till RE", "EUR"),
+    ("Snittpris", "€/MWh"),
+)
+
+
+def site_mapping(sites, retailers, shares=None) -> dict:
+    """
+    Gles mappning ur länkar (en rad per anläggning och RE). shares är
+    anläggningens andel till respektive RE (default 1); andelarna per
+    anläggning ska summera till 1. Returnerar en dict med
+    sites/retailers (pd.Index) och CSR-arrayerna indptr, re, share.
+    """
+    sites, retailers = np.asarray(sites), np.asarray(retailers)
+    shares = np.ones(len(sites)) if shares is None else np.asarray(shares, dtype=float)
+    if not (len(sites) == len(retailers) == len(shares)):
+        raise ValueError("Anläggningar, elhandlare och andelar måste ha samma längd")
+    site_pos, site_index = pd.factorize(sites, sort=True)
+    re_pos, re_index = pd.factorize(retailers, sort=True)
+
+    totals = np.bincount(site_pos, weights=shares, minlength=len(site_index))
+    bad = np.flatnonzero(np.abs(totals - 1) > SHARE_TOL)
+    if len(bad):
+        names = ", ".join(str(site_index[i]) for i in bad[:5])
+        raise ValueError(f"Andelarna summerar inte till 1 för {len(bad)} anläggningar ({names} …)")
+
+    order = np.argsort(site_pos, kind="stable")
+    return {
+        "sites": pd.Index(site_index, name="Anläggning"),
+        "retailers": pd.Index(re_index, name="Elhandlare"),
+        "indptr": np.concatenate(([0], np.cumsum(np.bincount(site_pos, minlength=len(site_index))))),
+        "re": re_pos[order],
+        "share": shares[order],
+    }
+
+
+def read_site_mapping(buf) -> tuple:
+    """
+    Läser en mappningsfil (CSV: anläggning, elhandlare, valfritt andel och
+    P_RECOMP per elhandlare). Returnerar (mappning, priser per RE som
+    pd.Series, tom om P_RECOMP saknas).
+    """
+    raw = pd.read_csv(buf, sep=None, engine="python", dtype=str)
+    raw = raw.rename(columns={c: MAPPING_COLUMNS.get(c.strip().lower(), c.strip()) for c in raw.columns})
+    missing = [c for c in ("Anläggning", "Elhandlare") if c not in raw.columns]
+    if missing:
+        raise ValueError(f"Mappningen saknar kolumner: {', '.join(missing)}")
+
+    def numeric(c):
+        return pd.to_numeric(raw[c].str.replace(",", ".", regex=False).str.strip(), errors="raise")
+
+    sites, retailers = raw["Anläggning"].str.strip(), raw["Elhandlare"].str.strip()
+    mapping = site_mapping(sites, retailers, numeric("Andel") if "Andel" in raw.columns else None)
+    prices = pd.Series(dtype=float)
+    if "P_RECOMP" in raw.columns:
+        prices = numeric("P_RECOMP").groupby(retailers).first().dropna()
+    return mapping, prices
+
+
+def compensation_flows(mapping: dict, mtu, site, volume, up, n_mtu: int) -> np.ndarray:
+    """
+    Kompensationsvolym per MTU, riktning och RE ur glesa aktiveringar
+    (MTU-nummer, anläggning, volym, True = uppreglering). Returnerar en
+    array (n_mtu, 2, RE): [:, 0] uppreglering, [:, 1] nedreglering.
+    """
+    pos = mapping["sites"].get_indexer(np.asarray(site))
+    if (pos < 0).any():
+        unknown = pd.unique(np.asarray(site)[pos < 0])
+        raise ValueError(f"{len(unknown)} anläggningar saknas i mappningen ({', '.join(map(str, unknown[:5]))} …)")
+    mtu = np.asarray(mtu, dtype=np.int64)
+    down = ~np.asarray(up, dtype=bool)
+    volume = np.asarray(volume, dtype=float)
+
+    # Expandera varje aktivering till anläggningens länkar (CSR-rader)
+    start, count = mapping["indptr"][pos], np.diff(mapping["indptr"])[pos]
+    act = np.repeat(np.arange(len(pos)), count)
+    link = np.arange(len(act)) - np.repeat(np.cumsum(count) - count, count) + start[act]
+
+    n_re = len(mapping["retailers"])
+    cell = (mtu[act] * 2 + down[act]) * n_re + mapping["re"][link]
+    flows = np.bincount(cell, weights=volume[act] * mapping["share"][link], minlength=n_mtu * 2 * n_re)
+    return flows.reshape(n_mtu, 2, n_re)
+
+
+def _amounts(vol, price, exact: bool):
+    # Belopp per MTU och RE; i heltalsläge avrundat till hela cent per cell och summerat exakt
+    if not exact:
+        return amount(vol, price).sum(axis=0)
+    cents = amount(np.rint(vol * KWH_PER_MWH).astype(np.int64), np.rint(price * CENT_PER_EUR).astype(np.int64), True)
+    return cents.sum(axis=0) / CENT_PER_EUR
+
+
+def compensation_invoices(mapping: dict, flows: np.ndarray, prices, rev_comp: bool = False,
+                          exact: bool = False) -> pd.DataFrame:
+    """
+    Faktura per elhandlare (INVOICE_COLUMNS) för flödena från
+    compensation_flows(). prices: pris per RE som skalär, array (RE,) eller
+    (MTU, RE), eller pd.Series med RE som index (alla RE måste finnas med).
+    Belopp är positiva i flödets riktning; Netto till RE = BSP → RE − RE → BSP.
+    """
+    retailers = mapping["retailers"]
+    if isinstance(prices, pd.Series):
+        missing = retailers.difference(prices.index)
+        if len(missing):
+            raise ValueError(f"Pris saknas för {len(missing)} elhandlare ({', '.join(map(str, missing[:5]))} …)")
+        prices = prices.reindex(retailers).to_numpy(dtype=float)
+    price = np.broadcast_to(np.asarray(prices, dtype=float), flows[:, 0].shape)
+
+    vol_up = flows[:, 0].sum(axis=0)
+    vol_down = flows[:, 1].sum(axis=0) if rev_comp else np.zeros(len(retailers))
+    pay_up = _amounts(flows[:, 0], price, exact)
+    pay_down = _amounts(flows[:, 1], price, exact) if rev_comp else np.zeros(len(retailers))
+    total_vol = vol_up + vol_down
+    return pd.DataFrame({
+        "Volym BSP → RE": vol_up,
+        "Belopp BSP → RE": pay_up,
+        "Volym RE → BSP": vol_down,
+        "Belopp RE → BSP": pay_down,
+        "Netto till RE": pay_up - pay_down,
+        "Snittpris": np.divide(pay_up + pay_down, total_vol, out=np.zeros(len(retailers)), where=total_vol != 0),
+    }, index=retailers)
+
+
+def log_invoices(log: pd.DataFrame, mapping: dict, prices: pd.Series, params: dict) -> pd.DataFrame:
+    """
+    Fakturor per RE för en aktiveringslogg med kolumnen Anläggning (se
+    backtest.read_activation_log), levererad volym E_akt. RE utan eget pris i
+    prices får P_RECOMP enligt prisreglerna (P_DA per MTU ur loggen om
+    kompensationspriset är DA).
+    """
+    p = apply_price_rules({**DEFAULT_PARAMS, **params})
+    mtu, times = pd.factorize(log.index, sort=True)
+    flows = compensation_flows(mapping, mtu, log["Anläggning"], log["E_akt"], log["Riktning"], len(times))
+
+    fallback = np.full(len(times), float(p["P_RECOMP"]))
+    if p["re_comp_is_da"] and "P_DA" in log.columns:
+        fallback[mtu] = log["P_DA"].fillna(p["P_DA"]).to_numpy(dtype=float)
+    own = prices.reindex(mapping["retailers"]).to_numpy(dtype=float)
+    price = np.where(np.isnan(own), fallback[:, None], own)
+    return compensation_invoices(mapping, flows, price, p["rev_comp_5b"], p["exact"])
@@ -0,0 +1,661 @@
+import numpy as np
+
+
+# ---------- Scenarier ----------
+# Kort nyckel per scenario i visningsordning (1a–5b)
+SCENARIOS = ("1a", "1b", "2a", "2b", "3a", "3b", "4a", "4b", "5a", "5b")
+
+# Förvalt målscenario för "Avvikelse"-raderna (goal_value / goal_price_value); väljs i appen
+TARGET_SCENARIO = "5a"
+
+# Hur varje scenario avräknas:
+#   side       – "down" = A-sidan (E_bud/E_akt/E_cons från sidopanelen), "up" = B-sidan (fasta värden)
+#   cons_delta – förskjutning av uppmätt förbrukning mot sidans E_cons
+#   basis      – "bud" = obalansjustering/ersättning på E_bud, "akt" = på E_akt
+#   is_up      – True = nedreglering (vänd tecken), False = uppreglering
+#   comp       – None = ingen kompensation, "always" = alltid, "rev_comp_5b" = styrs av checkboxen
+#   comp_sign  – tecken för BSP:s kompensation (RE får motsatt tecken)
+#   brp_eq_bsp – BRP och BSP är samma aktör
+SCENARIO_SPECS = {
+    "1a": dict(side="down", cons_delta=0.0,  basis="bud", is_up=False, comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "1b": dict(side="up",   cons_delta=0.0,  basis="bud", is_up=True,  comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "2a": dict(side="down", cons_delta=-4.0, basis="bud", is_up=False, comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "2b": dict(side="up",   cons_delta=4.0,  basis="bud", is_up=True,  comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "3a": dict(side="down", cons_delta=0.0,  basis="akt", is_up=False, comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "3b": dict(side="up",   cons_delta=0.0,  basis="akt", is_up=True,  comp=None, comp_sign=-1, brp_eq_bsp=True),
+    "4a": dict(side="down", cons_delta=0.0,  basis="akt", is_up=False, comp=None, comp_sign=-1, brp_eq_bsp=False),
+    "4b": dict(side="up",   cons_delta=0.0,  basis="akt", is_up=True,  comp=None, comp_sign=-1, brp_eq_bsp=False),
+    "5a": dict(side="down", cons_delta=0.0,  basis="akt", is_up=False, comp="always",      comp_sign=-1, brp_eq_bsp=False),
+    "5b": dict(side="up",   cons_delta=0.0,  basis="akt", is_up=True,  comp="rev_comp_5b", comp_sign=+1, brp_eq_bsp=False),
+}
+
+# Standardvärden för parametrar som inte styrs från sidopanelen
+DEFAULT_PARAMS = {
+    "V_DA": 100.0,
+    "handel_sign": -1,
+    "E_cons": 92.0,
+    "E_bud": 10.0,
+    "E_akt": 8.0,
+    "P_DA": 2.0,
+    "P_IMB": 5.0,
+    "P_COMP": 5.0,
+    "P_PEN": 5.0,
+    "P_RECOMP": 2.0,
+    # B-sidan (nedreglering) har fasta värden
+    "E_bud_up": 10.0,
+    "E_akt_up": 8.0,
+    "E_cons_up": 108.0,
+    # Kapacitetsmarknad (mFRR-kapacitet, FCR): upphandlad kapacitet och tillgänglig kapacitet
+    # enligt mätdata (MW), ersättning och avdrag per MW och timme
+    "C_cap": 0.0,
+    "C_avail": 0.0,
+    "P_CAP": 0.0,
+    "P_CAP_PEN": 0.0,
+    # Checkboxar
+    "brp_forward_balance_costs": True,
+    "bsp_buy_up": False,
+    "apply_penalty": False,
+    "check_availability": False,
+    "rev_comp_5b": False,
+    "re_forward_balance_costs": True,
+    "use_da_price": False,
+    "allow_reverse_neutral": False,
+    # Prisregler från sidopanelen (P_COMP/P_PEN = P_IMB, P_RECOMP = P_DA), påslagna som i appen
+    "use_imb_for_comp": True,
+    "use_imb_for_pen": True,
+    "re_comp_is_da": True,
+    # Heltalsläge: kWh, cent/MWh och cent i int64 (se amount())
+    "exact": False,
+}
+
+# Parametrar som styr logiken (checkboxar) och därför måste vara skalärer
+FLAG_PARAMS = tuple(k for k, v in DEFAULT_PARAMS.items() if isinstance(v, bool))
+
+
+def required_scenarios(visible, target: str = TARGET_SCENARIO) -> list:
+    """
+    Scenarier som måste avräknas för att kunna visa `visible`:
+    de synliga plus målscenariot som Avvikelse-raderna jämför mot.
+    Returneras i visningsordning.
+    """
+    wanted = set(visible) | {target}
+    return [k for k in SCENARIOS if k in wanted]
+
+
+def apply_price_rules(p: dict) -> dict:
+    """Sätter P_COMP, P_PEN och P_RECOMP enligt prisreglerna (fungerar även per MTU)."""
+    p = dict(p)
+    if p["use_imb_for_comp"]:
+        p["P_COMP"] = p["P_IMB"]
+    if p["use_imb_for_pen"]:
+        p["P_PEN"] = p["P_IMB"]
+    if p["re_comp_is_da"]:
+        p["P_RECOMP"] = p["P_DA"]
+    return p
+
+
+def _safe_div(num, den):
+    """num / den, men 0 där den == 0 (fungerar för skalärer och arrayer)."""
+    num = np.asarray(num, dtype=float)
+    den = np.asarray(den, dtype=float)
+    out = np.divide(num, den, out=np.zeros(np.broadcast(num, den).shape), where=den != 0)
+    return out[()]
+
+
+# ---------- Heltalsläge ----------
+# Med p["exact"] räknas volymer i hela kWh, priser i hela cent/MWh och belopp i
+# hela cent (int64). Indata anges som vanligt i MWh och EUR/MWh och kvantiseras
+# i settle(). Varje belopp volym × pris avrundas till hela cent (halva mot jämnt)
+# per MTU och scenario; därefter är allt heltalsaddition, så summor över MTU är
+# exakta och oberoende av ordning, blockindelning och antal processer.
+KWH_PER_MWH = 1000
+CENT_PER_EUR = 100
+MTU_PER_HOUR = 4
+VOLUME_PARAMS = ("V_DA", "E_cons", "E_bud", "E_akt", "E_bud_up", "E_akt_up", "E_cons_up")
+# Kapaciteter (MW) kvantiseras som volymer: kW i heltalsläge
+CAPACITY_PARAMS = ("C_cap", "C_avail")
+PRICE_PARAMS = ("P_DA", "P_IMB", "P_COMP", "P_PEN", "P_RECOMP", "P_CAP", "P_CAP_PEN")
+
+# Fält i kWh resp. cent/MWh i heltalsläge; övriga numeriska fält är belopp i cent
+VOLUME_FIELDS = {
+    "Handel", "Obalansjustering", "Summa avräknas i balans", "Uppmätt", "Balanshandel (köp − / sälj +)",
+    "Budvolym/Aktiverad volym", "Under/överleveransvolym", "Kompensationsvolym", "DA handel vid nedreglering",
+    "Kompensationsvolym för flexibilitet", "Volym att fakturera kunden", "Volym som faktureras slutkund",
+    "Upphandlad kapacitet", "Otillgänglig kapacitet",
+}
+PRICE_FIELDS = {
+    "DA Pris", "Obalanspris", "Ersättningspris", "Under/överleveranspris", "Kompensationspris", "DA pris",
+    "Snittpris för inköp el som kan faktureras", "Slutkundens elpris", "Målpris", "Avvikelse slutkundens elpris",
+    "Kapacitetspris",
+}
+# Effekter (MW) per MTU: medelvärdesbildas som priser när MTU slås ihop
+CAPACITY_FIELDS = {"Upphandlad kapacitet", "Otillgänglig kapacitet"}
+
+
+def _quantize(x, scale: int):
+    return np.rint(np.asarray(x, dtype=float) * scale).astype(np.int64)[()]
+
+
+def _div_round(num, den):
+    """num / den avrundat till heltal, halva mot jämnt (heltal, den != 0)."""
+    num = np.asarray(num, dtype=np.int64)
+    den = np.asarray(den, dtype=np.int64)
+    # Under 2**52 ger float-division + rint samma svar: en kvot som inte ligger
+    # exakt på en halva ligger minst 1/(2·|den|) från den, mer än avrundningsfelet.
+    # Heltalsdivision är flera gånger långsammare och används bara för stora tal.
+    if np.abs(num).max(initial=0) < 2 ** 52 and np.abs(den).max(initial=0) < 2 ** 52:
+        return np.rint(num / den).astype(np.int64)[()]
+    num, den = np.where(den < 0, -num, num), np.abs(den)
+    q, r = np.divmod(num, den)              # golvdivision, 0 <= r < den
+    up = (2 * r > den) | ((2 * r == den) & (q % 2 == 1))
+    return (q + up)[()]
+
+
+def amount(vol, price, exact: bool = False):
+    """Belopp = volym × pris. I heltalsläge kWh × cent/MWh avrundat till hela cent."""
+    if exact:
+        return _div_round(np.multiply(vol, price), KWH_PER_MWH)
+    return vol * price
+
+
+def capacity_amount(mw, price, exact: bool = False):
+    """Belopp för en MTU = effekt (MW) × pris (EUR per MW och timme) / MTU_PER_HOUR. I heltalsläge kW × cent."""
+    if exact:
+        return _div_round(np.multiply(mw, price), KWH_PER_MWH * MTU_PER_HOUR)
+    return mw * price / MTU_PER_HOUR
+
+
+def unit_price(money, vol, exact: bool = False):
+    """Pris = belopp / volym, 0 där volymen är 0. I heltalsläge avrundat till hela cent/MWh."""
+    if not exact:
+        return _safe_div(money, vol)
+    vol = np.asarray(vol, dtype=np.int64)
+    zero = vol == 0
+    out = _div_round(np.multiply(money, KWH_PER_MWH), np.where(zero, 1, vol))
+    return np.where(zero, 0, out)[()]
+
+
+def _zero(p: dict):
+    # Heltalsnolla i heltalsläge, så att int64-arrayer inte blir float
+    return 0 if p["exact"] else 0.0
+
+
+def quantize_params(p: dict) -> dict:
+    """Volymer (MWh) till hela kWh, kapaciteter (MW) till kW och priser till hela cent."""
+    p = dict(p)
+    for k in VOLUME_PARAMS + CAPACITY_PARAMS:
+        p[k] = _quantize(p[k], KWH_PER_MWH)
+    for k in PRICE_PARAMS:
+        p[k] = _quantize(p[k], CENT_PER_EUR)
+    p["handel_sign"] = _quantize(p["handel_sign"], 1)
+    return p
+
+
+def from_exact(metrics: dict) -> dict:
+    """Fält från heltalsläget tillbaka i MWh, EUR/MWh och EUR (för visning)."""
+    out = {}
+    for field, v in metrics.items():
+        if isinstance(v, str):
+            out[field] = v
+        elif field in VOLUME_FIELDS:
+            out[field] = np.asarray(v) / KWH_PER_MWH
+        else:
+            # cent/MWh och cent
+            out[field] = np.asarray(v) / CENT_PER_EUR
+    return out
+
+
+# ---------- BRP ----------
+def _brp_metrics(p: dict, uppmatt_mwh, obalans_vol_mwh, based_on: str, is_up: bool):
+    """
+    uppmatt_mwh: uppmätt förbrukning i scenariot
+    obalans_vol_mwh: volym som ska obalansjusteras (E_bud eller E_akt)
+    based_on: "Bud" eller "Uppmätt aktivering" (för utskrift)
+    is_up: True = nedreglering (vänd tecken), False = uppreglering
+    """
+    P_DA, P_IMB = p["P_DA"], p["P_IMB"]
+    exact = p["exact"]
+
+    # DA-handel
+    handel_mwh = p["handel_sign"] * p["V_DA"]          # köp = -, sälj = +
+    kostnad_handel_eur = amount(handel_mwh, P_DA, exact)
+
+    # Vänd tecken på obalansjustering vid nedreglering
+    obalansjust_mwh = -obalans_vol_mwh if is_up else obalans_vol_mwh
+
+    # Balansavräkning
+    summa_avr_balans_mwh = handel_mwh + obalansjust_mwh
+    obalans_mwh = uppmatt_mwh + summa_avr_balans_mwh
+    balanshandel_mwh = -obalans_mwh
+    balanskostnad_eur = amount(balanshandel_mwh, P_IMB, exact)
+
+    # Vidarefakturering?
+    obalans_fakt_eur = -balanskostnad_eur if p["brp_forward_balance_costs"] else _zero(p)
+
+    # Fakturering till RE
+    inkopt_el_fakt_eur = amount(np.abs(handel_mwh), P_DA, exact)
+    brp_fakt_re_eur = inkopt_el_fakt_eur + obalans_fakt_eur
+
+    # BRP:s eget netto
+    brp_netto_eur = (
+        kostnad_handel_eur
+        + balanskostnad_eur
+        + inkopt_el_fakt_eur
+        + obalans_fakt_eur
+    )
+
+    return {
+        "Obalansjusteras baserat på": f"{based_on} ({'ned' if is_up else 'upp'})",
+        "Handel": handel_mwh,
+        "DA Pris": P_DA,
+        "Kostnad handel": kostnad_handel_eur,
+        "Obalansjustering": obalansjust_mwh,
+        "Summa avräknas i balans": summa_avr_balans_mwh,
+        "Uppmätt": uppmatt_mwh,
+        "Balanshandel (köp − / sälj +)": balanshandel_mwh,
+        "Obalanspris": P_IMB,
+        "Balanskostnad BRP": balanskostnad_eur,
+        "Inköpt el som faktureras": inkopt_el_fakt_eur,
+        "Obalanskostnad som faktureras": obalans_fakt_eur,
+        "BRP fakturerar elhandlare": brp_fakt_re_eur,
+        "BRP nettokostnad": brp_netto_eur,
+    }
+
+
+# ---------- BSP ----------
+def _bsp_metrics(
+    p: dict,
+    pay_basis: str,
+    with_comp: bool,
+    E_bud_x,
+    E_akt_x,
+    is_up: bool,                 # True = B-scenario (ned), False = A-scenario (upp)
+    comp_sign: int = -1
+):
+    exact, zero = p["exact"], _zero(p)
+
+    # 1) Ersättning (bud eller akt)
+    raw_vol_pay = E_bud_x if pay_basis == "bud" else E_akt_x      # "äkta" volym för beräkning
+    disp_vol_pay = -raw_vol_pay if is_up else raw_vol_pay         # visningsvolym: minus i B
+    price_pay = p["P_COMP"]
+    res_pay   = amount(np.abs(raw_vol_pay), price_pay, exact)                  # resultat baserat på absolut volym
+
+    # 2) Under/överleverans (endast när baserat på bud)
+    if pay_basis == "bud":
+        vol_dev   = np.abs(E_akt_x - E_bud_x)
+        price_dev = p["P_PEN"] if p["apply_penalty"] else zero
+        res_dev   = -amount(vol_dev, price_dev, exact)
+    else:
+        vol_dev = price_dev = res_dev = zero
+
+    # 3) Kompensation BSP↔RE
+    if with_comp:
+        vol_comp   = E_akt_x
+        price_comp = p["P_RECOMP"]
+        res_comp   = comp_sign * amount(vol_comp, price_comp, exact)
+    else:
+        vol_comp = price_comp = res_comp = zero
+
+    # 4) DA-handel vid nedreglering (endast om checkbox ikryssad och scenario är B)
+    if is_up and p["bsp_buy_up"]:
+        da_vol   = E_akt_x
+        da_price = p["P_DA"]
+        da_cost  = -amount(da_vol, da_price, exact)   # kostnad för BSP => negativ
+    else:
+        da_vol = da_price = da_cost = zero
+
+    # 5) Kapacitetsersättning per MTU; otillgänglig kapacitet enligt mätdata ger ingen ersättning och avdrag
+    cap = p["C_cap"]
+    cap_unavail = np.maximum(cap - p["C_avail"], 0) if p["check_availability"] else zero
+    cap_pay = capacity_amount(cap - cap_unavail, p["P_CAP"], exact)
+    cap_pen = -capacity_amount(cap_unavail, p["P_CAP_PEN"], exact)
+
+    # 6) Nettoresultat
+    res_netto = res_pay + res_dev + res_comp + da_cost + cap_pay + cap_pen
+
+    return {
+        "Budvolym/Aktiverad volym": disp_vol_pay,   # visar minus i B
+        "Ersättningspris": price_pay,
+        "Ersättningsresultat": res_pay,            # absolutvolym
+        "Under/överleveransvolym": vol_dev,
+        "Under/överleveranspris": price_dev,
+        "Under/överleveransresultat": res_dev,
+        "Kompensationsvolym": vol_comp,
+        "Kompensationspris": price_comp,
+        "Kompensationsresultat": res_comp,
+
+        "DA handel vid nedreglering": da_vol,
+        "DA pris": da_price,
+        "Kostnad DA handel": da_cost,
+
+        "Upphandlad kapacitet": cap,
+        "Otillgänglig kapacitet": cap_unavail,
+        "Kapacitetspris": p["P_CAP"],
+        "Kapacitetsersättning": cap_pay,
+        "Avdrag otillgänglighet": cap_pen,
+
+        "BSP nettoresultat": res_netto,
+    }
+
+
+# ---------- RE ----------
+def _re_metrics_v4(
+    p: dict,
+    m_brp: dict,
+    e_cons,
+    obalansjust_mwh,
+    with_comp: bool,
+    re_sign: int = +1,  # +1 = RE får från BSP, -1 = RE betalar BSP
+):
+    P_DA = p["P_DA"]
+    exact, zero = p["exact"], _zero(p)
+
+    # BRP → RE
+    re_inkop_eur = -amount(np.abs(m_brp["Handel"]), P_DA, exact)
+    re_balansfakt_eur = -m_brp["Obalanskostnad som faktureras"] if p["brp_forward_balance_costs"] else zero
+
+    # Kompensation (RE ↔ BSP)
+    re_comp_vol_mwh = obalansjust_mwh if with_comp else zero
+    re_comp_eur = re_sign * amount(re_comp_vol_mwh, p["P_RECOMP"], exact)   # + intäkt för RE / − kostnad för RE
+
+    # Vad skickas vidare till kund?
+    balans_till_kund_eur = re_balansfakt_eur if p["re_forward_balance_costs"] else zero
+
+    # Total kostnad som ska faktureras (belopp, ej pris)
+    re_kostnad_att_fakturera_eur = -(re_inkop_eur + balans_till_kund_eur + re_comp_eur)
+
+    # Volym till kund
+    re_cust_vol_mwh = e_cons
+
+    # Kostnadsbaserat snittpris
+    snittpris_inkop = unit_price(re_kostnad_att_fakturera_eur, re_cust_vol_mwh, exact)
+
+    # Slutkundens elpris: DA-pris om checkboxen är ikryssad, annars kostnadsbaserat
+    slutkund_elpris_per_mwh = P_DA if p["use_da_price"] else snittpris_inkop
+
+    # Kundens kostnad enligt valt pris
+    re_cust_cost_eur = amount(re_cust_vol_mwh, slutkund_elpris_per_mwh, exact)
+
+    # RE:s resultat
+    re_net_eur = re_inkop_eur + re_balansfakt_eur + re_comp_eur + re_cust_cost_eur
+
+    return {
+        "Inköpt el fakturerad av BRP": re_inkop_eur,
+        "Balanskostnad fakturerad av BRP": re_balansfakt_eur,
+        "Kompensationsvolym för flexibilitet": re_comp_vol_mwh,
+        "Kompensationsbelopp": re_comp_eur,  # + intäkt för RE / − kostnad för RE
+        "Kostnad att fakturera slutkunden": re_kostnad_att_fakturera_eur,
+        "Volym att fakturera kunden": re_cust_vol_mwh,
+        "Snittpris för inköp el som kan faktureras": snittpris_inkop,
+        "Slutkundens elpris": slutkund_elpris_per_mwh,
+        "Kostnad som faktureras slutkund": re_cust_cost_eur,
+        # Bakåtkompatibilitet
+        "Volym som faktureras slutkund": re_cust_vol_mwh,
+        "Resultat": re_net_eur,
+    }
+
+
+# ---------- Avräkning per scenario ----------
+def _scenario_inputs(p: dict, key: str):
+    """Volymer (E_bud_x, E_akt_x, E_cons_x) för scenariots sida."""
+    spec = SCENARIO_SPECS[key]
+    if spec["side"] == "down":
+        e_bud_x, e_akt_x, e_cons_x = p["E_bud"], p["E_akt"], p["E_cons"]
+    else:
+        e_bud_x, e_akt_x, e_cons_x = p["E_bud_up"], p["E_akt_up"], p["E_cons_up"]
+    cons_delta = _quantize(spec["cons_delta"], KWH_PER_MWH) if p["exact"] else spec["cons_delta"]
+    return e_bud_x, e_akt_x, e_cons_x + cons_delta
+
+
+def settle_scenario(p: dict, key: str) -> dict:
+    """BRP-, BSP- och RE-mått för ett scenario."""
+    spec = SCENARIO_SPECS[key]
+    e_bud_x, e_akt_x, e_cons_x = _scenario_inputs(p, key)
+
+    if spec["basis"] == "bud":
+        obalans_vol, based_on = e_bud_x, "Bud"
+    else:
+        obalans_vol, based_on = e_akt_x, "Uppmätt aktivering"
+
+    with_comp = spec["comp"] == "always" or (spec["comp"] == "rev_comp_5b" and p["rev_comp_5b"])
+
+    brp = _brp_metrics(p, e_cons_x, obalans_vol, based_on, is_up=spec["is_up"])
+    bsp = _bsp_metrics(
+        p, spec["basis"], with_comp, e_bud_x, e_akt_x,
+        is_up=spec["is_up"], comp_sign=spec["comp_sign"],
+    )
+    re = _re_metrics_v4(p, brp, e_cons_x, obalans_vol, with_comp=with_comp, re_sign=-spec["comp_sign"])
+    return {"brp": brp, "bsp": bsp, "re": re}
+
+
+def settle(p: dict, scenarios=SCENARIOS) -> dict:
+    """
+    Avräknar de angivna scenarierna (kort nyckel → {"brp", "bsp", "re"}).
+    Scenarier som inte efterfrågas beräknas inte alls; använd
+    required_scenarios() för att få med beroenden som målscenariot.
+    """
+    p = apply_price_rules({**DEFAULT_PARAMS, **p})
+    if p["exact"]:
+        p = quantize_params(p)
+    return {k: settle_scenario(p, k) for k in SCENARIOS if k in set(scenarios)}
+
+
+# ---------- Sammanställning, slutkundspris och neutralisering ----------
+def _comp_need(extra, allow_reverse: bool):
+    """Kompensationsbehov = max(0, ökad totalkostnad) eller signerat om omvänd neutralisering."""
+    return extra if allow_reverse else np.maximum(extra, 0)
+
+
+def summarize(p: dict, settled: dict, target: str = TARGET_SCENARIO) -> dict:
+    """
+    Resultat per aktör, avvikelse mot målscenariot, slutkundspris och
+    neutralisering för de avräknade scenarierna. Ej tillämpliga värden
+    (BRP+BSP i scenarier där BRP≠BSP) är NaN.
+    """
+    p = {**DEFAULT_PARAMS, **p}
+    if target not in settled:
+        raise KeyError(f"Målscenariot {target} är inte avräknat")
+
+    goal_value = settled[target]["bsp"]["BSP nettoresultat"]
+    goal_price_value = settled[target]["re"]["Slutkundens elpris"]
+
+    out = {}
+    for k, m in settled.items():
+        enabled = SCENARIO_SPECS[k]["brp_eq_bsp"]
+        brp = m["brp"]["BRP nettokostnad"]
+        bsp = m["bsp"]["BSP nettoresultat"]
+        re = m["re"]["Resultat"]
+
+        brp_bsp = brp + bsp if enabled else np.nan
+        total = brp + bsp + re if enabled else np.nan
+
+        price = m["re"]["Slutkundens elpris"]
+        diff_price = price - goal_price_value
+        extra = amount(m["re"]["Volym som faktureras slutkund"], diff_price, p["exact"])
+        comp_need = _comp_need(extra, p["allow_reverse_neutral"])
+        tot_after = (total if enabled else bsp) - comp_need
+
+        out[k] = {
+            "BRP resultat": brp,
+            "BSP resultat": bsp,
+            "Elhandlare resultat": re,
+            "BRP+BSP resultat": brp_bsp,
+            "BRP+BSP+Elhandlare resultat": total,
+            "Målresultat": goal_value if enabled else np.nan,
+            "Avvikelse mot aktörers målresultat": goal_value - total if enabled else np.nan,
+            "Slutkundens elpris": price,
+            "Målpris": goal_price_value,
+            "Avvikelse slutkundens elpris": diff_price,
+            "Ökad totalkostnad slutkund": extra,
+            "Neutralisering": comp_need,
+            "Aktörers resultat efter kompensation": tot_after,
+        }
+    return out
+
+
+# ---------- Batch: många parameteruppsättningar och/eller MTU-serier ----------
+ACTORS = ("BRP", "BSP", "RE", "Sammanställning")
+
+
+def by_actor(settled: dict, summary: dict) -> dict:
+    """settle()/summarize()-resultat som scenario → aktör → fält (samma form som settle_batch)."""
+    return {
+        k: dict(zip(ACTORS, (m["brp"], m["bsp"], m["re"], summary[k])))
+        for k, m in settled.items() if k in summary
+    }
+
+
+def deviation_matrix(results: dict, exact: bool = False) -> tuple:
+    """
+    Parvisa avvikelser mellan scenarierna i results (scenario → aktör → fält),
+    som om varje scenario vore målscenariot. Returnerar (nycklar, fält → array
+    (K, K, …)) där [i, j] är scenario i mot målscenario j, dvs. samma värde som
+    summarize(..., target=j) ger för i. Övriga axlar (MTU, banor …) bredds ut.
+    """
+    keys = [k for k in SCENARIOS if k in results]
+    columns = [
+        ("BSP", "BSP nettoresultat"), ("Sammanställning", "BRP+BSP+Elhandlare resultat"),
+        ("RE", "Slutkundens elpris"), ("RE", "Volym som faktureras slutkund"),
+    ]
+    values = [[np.asarray(results[k][a][f]) for k in keys] for a, f in columns]
+    shape = np.broadcast_shapes(*[v.shape for vs in values for v in vs])
+    goal, total, price, volume = (np.stack([np.broadcast_to(v, shape) for v in vs]) for vs in values)
+
+    diff_price = price[:, None] - price[None, :]
+    return keys, {
+        "Avvikelse mot aktörers målresultat": goal[None, :] - total[:, None],
+        "Avvikelse slutkundens elpris": diff_price,
+        "Ökad totalkostnad slutkund": amount(volume[:, None], diff_price, exact),
+    }
+
+
+def reduce_results(results: dict, axis: int = -1) -> dict:
+    """
+    Slår ihop resultat (scenario → aktör → fält) längs en axel, t.ex. MTU:
+    belopp och volymer summeras, priser och kapaciteter (MW) medelvärdesbildas
+    och textfält behålls. Skalärer bredds först ut till resultatens gemensamma form.
+    """
+    shape = np.broadcast_shapes(*[
+        np.shape(v) for actors in results.values() for fields in actors.values() for v in fields.values()
+        if not isinstance(v, str)
+    ])
+
+    def reduce(field, v):
+        if isinstance(v, str):
+            return v
+        v = np.broadcast_to(v, shape)
+        return v.mean(axis=axis) if field in PRICE_FIELDS | CAPACITY_FIELDS else v.sum(axis=axis)
+
+    return {
+        k: {a: {f: reduce(f, v) for f, v in fields.items()} for a, fields in actors.items()}
+        for k, actors in results.items()
+    }
+
+
+# Slutkundens elpris i summerade resultat räknas om från dessa RE-fält (belopp, volym)
+CUSTOMER_PRICE_FIELDS = ("Kostnad som faktureras slutkund", "Volym som faktureras slutkund")
+
+
+def customer_price(totals: dict, exact: bool = False, target: str = TARGET_SCENARIO) -> dict:
+    """
+    Sätter slutkundens elpris i summerade resultat (t.ex. från reduce_results)
+    till fakturerad kostnad / fakturerad volym (volymvägt) i stället för
+    medelvärdet per MTU, med målpris och avvikelse mot målscenariot. Ändrar
+    och returnerar totals.
+    """
+    def price(k):
+        cost, vol = (totals[k]["RE"][f] for f in CUSTOMER_PRICE_FIELDS)
+        return unit_price(cost, vol, exact)
+
+    goal = price(target)
+    for k, actors in totals.items():
+        actors["RE"]["Slutkundens elpris"] = price(k)
+        actors["Sammanställning"]["Slutkundens elpris"] = actors["RE"]["Slutkundens elpris"]
+        actors["Sammanställning"]["Målpris"] = goal
+        actors["Sammanställning"]["Avvikelse slutkundens elpris"] = actors["RE"]["Slutkundens elpris"] - goal
+    return totals
+
+
+def _stack(values: list, lengths: list, scalar: bool) -> np.ndarray:
+    """Slår ihop skalärer/serier till en platt float-array (skalärer bredds ut till sin längd)."""
+    if scalar:
+        return np.asarray(values, dtype=float)
+    return np.concatenate([
+        np.broadcast_to(np.asarray(v, dtype=float), (n,)) for v, n in zip(values, lengths)
+    ])
+
+
+def settle_batch(param_sets: list, scenarios=SCENARIOS, target: str = TARGET_SCENARIO):
+    """
+    Avräknar många parameteruppsättningar på en gång. Varje uppsättning kan ha
+    skalära värden eller lika långa MTU-serier. Uppsättningar med samma
+    checkbox-kombination (FLAG_PARAMS) avräknas i ett enda vektoriserat anrop.
+
+    Returnerar (set_idx, mtu_idx, results) där results[scenario][aktör][fält]
+    är en array med en rad per (uppsättning, MTU) i indataordning. Med
+    "exact" (samma för alla uppsättningar) är arrayerna int64 i kWh, cent/MWh och cent.
+    """
+    unknown = {k for s in param_sets for k in s} - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Okända parametrar: {', '.join(sorted(unknown))}")
+    bad = [k for k in scenarios if k not in SCENARIO_SPECS]
+    if bad:
+        raise ValueError(f"Okända scenarier: {', '.join(bad)}")
+
+    sets = [{**DEFAULT_PARAMS, **s} for s in param_sets]
+    numeric = [k for k in DEFAULT_PARAMS if k not in FLAG_PARAMS]
+
+    # Längd per uppsättning: 1 för enbart skalärer, annars seriernas gemensamma längd
+    lengths, has_series = [], []
+    for i, s in enumerate(param_sets):
+        series = {k: len(v) for k, v in s.items() if isinstance(v, (list, tuple, np.ndarray))}
+        bad_flags = [k for k in series if k in FLAG_PARAMS]
+        if bad_flags:
+            raise ValueError(f"Uppsättning {i}: {', '.join(bad_flags)} måste vara skalära värden")
+        sizes = set(series.values())
+        if len(sizes) > 1:
+            raise ValueError(f"Uppsättning {i}: serierna har olika längd ({sorted(sizes)})")
+        lengths.append(sizes.pop() if sizes else 1)
+        has_series.append(bool(series))
+
+    offsets = np.concatenate(([0], np.cumsum(lengths))).astype(int)
+    n_rows = int(offsets[-1])
+
+    groups = {}
+    for i, s in enumerate(sets):
+        groups.setdefault(tuple(bool(s[f]) for f in FLAG_PARAMS), []).append(i)
+    exact = {bool(s["exact"]) for s in sets}
+    if len(exact) > 1:
+        raise ValueError("exact måste vara samma för alla uppsättningar")
+    exact = exact.pop() if exact else False
+
+    wanted = required_scenarios(scenarios, target)
+    results = {k: {a: {} for a in ACTORS} for k in SCENARIOS if k in set(scenarios)}
+
+    for flags, members in groups.items():
+        lens = [lengths[i] for i in members]
+        scalar = not any(has_series[i] for i in members)
+        p = dict(zip(FLAG_PARAMS, flags))
+        for k in numeric:
+            p[k] = _stack([sets[i][k] for i in members], lens, scalar)
+        if len(members) == len(sets):
+            rows = slice(None)
+        else:
+            rows = np.concatenate([np.arange(offsets[i], offsets[i + 1]) for i in members])
+
+        settled = settle(p, wanted)
+        summary = summarize(p, settled, target)
+        group = by_actor(settled, summary)
+        for k, out in results.items():
+            for actor, metrics in group[k].items():
+                for field, v in metrics.items():
+                    if isinstance(v, str):
+                        continue
+                    if field not in out[actor]:
+                        # int64 i heltalsläget (NA-fält är NaN och förblir float)
+                        out[actor][field] = np.empty(n_rows, dtype=np.result_type(v) if exact else float)
+                    out[actor][field][rows] = v
+
+    set_idx = np.repeat(np.arange(len(sets)), lengths)
+    mtu_idx = np.arange(n_rows) - offsets[set_idx]
+    return set_idx, mtu_idx, results
@@ -0,0 +1,129 @@
+"""
+Export av tidsserieresultat i block (CSV eller Parquet), utan Excel-gränsen
+på ungefär en miljon rader per blad.
+
+Generatorerna ger bytes block för block (EXPORT_CHUNK rader): en tabell per
+aktör i långt format (tid, Scenario, fält …), numeriskt och oformaterat.
+Bara ett block i taget byggs, så minnet är detsamma oavsett seriens längd och
+första blocket kan skickas innan resten är klart. Flera tabeller paketeras
+som ett zip-arkiv med en fil per aktör, som också skrivs blockvis, direkt
+till en fil med write_export.
+"""
+import zipfile
+
+from charts import page_count, result_page
+from engine import ACTORS
+
+EXPORT_CHUNK = 50_000
+# format → (MIME-typ, filändelse)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+class _Chunks:
+    """Skrivbar ström som samlar bytes tills de hämtas med take() (ingen seek: zip skriver då strömmande)."""
+
+    def __init__(self):
+        self.parts = []
+        self.pos = 0
+        self.closed = False
+
+    def write(self, b) -> int:
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts = []
+        return out
+
+
+def _fields(results: dict, actor: str, keys) -> list:
+    # Numeriska fält i motorns ordning (textfält som "Obalansjusteras baserat på" exporteras inte)
+    fields = {}
+    for k in keys:
+        for f, v in results[k][actor].items():
+            if not isinstance(v, str):
+                fields[f] = None
+    return list(fields)
+
+
+def iter_frames(index, results: dict, actor: str, scenarios: dict, window: tuple = None, chunk: int = EXPORT_CHUNK):
+    """DataFrame-block om högst chunk rader för en aktör (samma radordning som resultattabellen per MTU)."""
+    window = window or (0, len(index))
+    columns = [(f, f) for f in _fields(results, actor, scenarios)]
+    for page in range(page_count(window, len(scenarios), chunk)):
+        yield result_page(index, results, actor, scenarios, columns, window, page, chunk)
+
+
+def iter_csv(frames):
+    """CSV (UTF-8, punkt som decimaltecken, tomt för NA) block för block; rubrikraden bara i första blocket."""
+    for i, df in enumerate(frames):
+        yield df.to_csv(index=False, header=(i == 0)).encode("utf-8")
+
+
+def iter_parquet(frames):
+    """Parquet med en radgrupp per block; bytes lämnas vidare efter varje radgrupp."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _Chunks()
+    writer = None
+    for df in frames:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table)
+        yield sink.take()
+    if writer is not None:
+        writer.close()
+    yield sink.take()
+
+
+def iter_zip(members: dict):
+    """Zip-arkiv av filnamn → generator med bytes, skrivet strömmande (ZIP64, inga seek)."""
+    sink = _Chunks()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, parts in members.items():
+            with zf.open(name, "w", force_zip64=True) as f:
+                for part in parts:
+                    f.write(part)
+                    yield sink.take()
+    yield sink.take()
+
+
+def export_results(index, results: dict, scenarios: dict, fmt: str = "csv", actors=ACTORS,
+                   window: tuple = None, chunk: int = EXPORT_CHUNK):
+    """
+    Zip-arkiv med en fil per aktör (t.ex. BRP.csv) som generator med bytes.
+    results: scenario → aktör → fält, scenarios: scenario → visningsnamn.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Okänt exportformat: {fmt}")
+    encode = iter_parquet if fmt == "parquet" else iter_csv
+    suffix = EXPORT_FORMATS[fmt][1]
+    return iter_zip({
+        f"{actor}{suffix}": encode(iter_frames(index, results, actor, scenarios, window, chunk))
+        for actor in actors
+    })
+
+
+def write_export(f, index, results: dict, scenarios: dict, fmt: str = "csv", actors=ACTORS,
+                 window: tuple = None, chunk: int = EXPORT_CHUNK) -> int:
+    """Skriver export_results block för block till filobjektet f. Returnerar antal bytes."""
+    n = 0
+    for part in export_results(index, results, scenarios, fmt, actors, window, chunk):
+        n += f.write(part)
+    return n
@@ -0,0 +1,72 @@
+import pandas as pd
+
+
+# ---------- Visningsformat per enhet ----------
+# Värdena i tabellerna förblir numeriska; formatet sätts på Styler-nivå per enhetsgrupp
+UNIT_FORMATS = {
+    "MWh": "{:,.0f}",
+    "€/MWh": "{:,.2f}",
+    "EUR": "{:,.0f}",
+    "EUR/NA": "{:,.0f}",
+    "MW": "{:,.2f}",
+    "€/MW,h": "{:,.2f}",
+    "st": "{:,.0f}",
+    # Derivator (känslighetstabellen)
+    "EUR per €/MWh": "{:,.3f}",
+    "€/MWh per €/MWh": "{:,.4f}",
+}
+NA_TEXT = "NA"
+# Samma enheter som printf-format för st.column_config (sidvisa tabeller per MTU, fler decimaler)
+UNIT_COLUMN_FORMATS = {
+    "MWh": "%.3f",
+    "€/MWh": "%.2f",
+    "EUR": "%.2f",
+    "EUR/NA": "%.2f",
+    "MW": "%.3f",
+    "€/MW,h": "%.2f",
+    "st": "%d",
+}
+
+
+def style_by_unit(df: pd.DataFrame, unit_col: str = "Enhet", label_col: str = "Fält"):
+    """
+    Styler där varje rad formateras enligt sin enhet i `unit_col`. En format-
+    regel per enhet (alla rader och scenariokolumner med samma enhet på en
+    gång); NaN visas som "NA". Datat förblir numeriskt: textceller (t.ex.
+    "Obalansjusteras baserat på") blir NaN i datat och visas som sin text.
+    """
+    value_cols = [c for c in df.columns if c not in (unit_col, label_col)]
+    data = df.copy()
+    texts = {}
+    for c in value_cols:
+        if data[c].dtype == object:
+            numeric = pd.to_numeric(data[c], errors="coerce")
+            for i in data.index[numeric.isna() & data[c].notna()]:
+                texts[(i, c)] = data.at[i, c]
+            data[c] = numeric
+
+    styler = data.style
+    for unit, fmt in UNIT_FORMATS.items():
+        rows = data.index[data[unit_col] == unit]
+        if len(rows):
+            styler = styler.format(fmt, subset=pd.IndexSlice[rows, value_cols], na_rep=NA_TEXT)
+    for (i, c), text in texts.items():
+        styler = styler.format(lambda _, text=text: text, subset=pd.IndexSlice[[i], [c]])
+    return styler
+
+
+def row_tooltips(df: pd.DataFrame, tips: dict, label_col: str = "Fält") -> pd.DataFrame:
+    """Tooltips som radmetadata: en kolumn (etiketten) i stället för en matris i tabellens storlek."""
+    return pd.DataFrame({label_col: df[label_col].map(tips).fillna("")}, index=df.index)
+
+
+# Avvikelser under toleransen räknas som lika (likvärdiga scenarier)
+EQUAL_TOL = 1e-6
+EQUAL_STYLE = "background-color: #e6f4ea"
+
+
+def style_matrix(df: pd.DataFrame, unit: str):
+    """Styler för en scenario × scenario-matris i en enhet: NaN som "NA" och noll-avvikelser markerade."""
+    return df.style.format(UNIT_FORMATS[unit], na_rep=NA_TEXT).map(
+        lambda v: EQUAL_STYLE if pd.notna(v) and abs(v) < EQUAL_TOL else ""
+    )
@@ -0,0 +1,174 @@
+"""
+Kontroll av bokföringsidentiteter i avräkningsresultat.
+
+Varje identitet är en summa av termer som ska bli 0 och kontrolleras
+vektoriserat över alla MTU, ett scenario i taget (residualen summeras på plats
+i en återanvänd buffert, vilket håller minnestrafiken nere för långa serier). Indata har formen scenario → aktör → fält,
+dvs. det settle_batch() returnerar eller engine.by_actor(settled, summary).
+"""
+import numpy as np
+import pandas as pd
+
+from engine import DEFAULT_PARAMS, SCENARIO_SPECS, amount
+
+# Identitet: (namn, termer, villkor)
+#   term     – (koefficient, aktör, fält) eller (koefficient, aktör, fält, aktör2, fält2) för produkter
+#   villkor  – "flag": (parameter, värde) som måste gälla, "brp_eq_bsp": bool för scenariourval
+INVARIANTS = [
+    ("BRP inköpt el = −RE inköpt el", [
+        (1, "BRP", "Inköpt el som faktureras"),
+        (1, "RE", "Inköpt el fakturerad av BRP"),
+    ], {}),
+    ("BSP kompensation = −RE kompensation", [
+        (1, "BSP", "Kompensationsresultat"),
+        (1, "RE", "Kompensationsbelopp"),
+    ], {}),
+    ("Vidarefakturerad balanskostnad BRP → RE nollsummerar", [
+        (1, "BRP", "Obalanskostnad som faktureras"),
+        (1, "RE", "Balanskostnad fakturerad av BRP"),
+    ], {}),
+    ("BRP:s balanskostnad vidarefaktureras fullt ut", [
+        (1, "BRP", "Balanskostnad BRP"),
+        (1, "BRP", "Obalanskostnad som faktureras"),
+    ], {"flag": ("brp_forward_balance_costs", True)}),
+    ("BRP faktura = inköpt el + obalanskostnad", [
+        (1, "BRP", "BRP fakturerar elhandlare"),
+        (-1, "BRP", "Inköpt el som faktureras"),
+        (-1, "BRP", "Obalanskostnad som faktureras"),
+    ], {}),
+    ("BRP netto = summa delposter", [
+        (1, "BRP", "BRP nettokostnad"),
+        (-1, "BRP", "Kostnad handel"),
+        (-1, "BRP", "Balanskostnad BRP"),
+        (-1, "BRP", "Inköpt el som faktureras"),
+        (-1, "BRP", "Obalanskostnad som faktureras"),
+    ], {}),
+    ("BSP netto = summa delposter", [
+        (1, "BSP", "BSP nettoresultat"),
+        (-1, "BSP", "Ersättningsresultat"),
+        (-1, "BSP", "Under/överleveransresultat"),
+        (-1, "BSP", "Kompensationsresultat"),
+        (-1, "BSP", "Kostnad DA handel"),
+        (-1, "BSP", "Kapacitetsersättning"),
+        (-1, "BSP", "Avdrag otillgänglighet"),
+    ], {}),
+    ("RE resultat = summa delposter", [
+        (1, "RE", "Resultat"),
+        (-1, "RE", "Inköpt el fakturerad av BRP"),
+        (-1, "RE", "Balanskostnad fakturerad av BRP"),
+        (-1, "RE", "Kompensationsbelopp"),
+        (-1, "RE", "Kostnad som faktureras slutkund"),
+    ], {}),
+    ("RE kostnad att fakturera = inköp + balans + komp", [
+        (1, "RE", "Kostnad att fakturera slutkunden"),
+        (1, "RE", "Inköpt el fakturerad av BRP"),
+        (1, "RE", "Balanskostnad fakturerad av BRP"),
+        (1, "RE", "Kompensationsbelopp"),
+    ], {"flag": ("re_forward_balance_costs", True)}),
+    ("RE kostnad att fakturera = inköp + komp", [
+        (1, "RE", "Kostnad att fakturera slutkunden"),
+        (1, "RE", "Inköpt el fakturerad av BRP"),
+        (1, "RE", "Kompensationsbelopp"),
+    ], {"flag": ("re_forward_balance_costs", False)}),
+    ("Kundkostnad = elpris × volym", [
+        (1, "RE", "Kostnad som faktureras slutkund"),
+        (-1, "RE", "Slutkundens elpris", "RE", "Volym som faktureras slutkund"),
+    ], {}),
+    ("BRP+BSP+RE = summa aktörsresultat", [
+        (1, "Sammanställning", "BRP+BSP+Elhandlare resultat"),
+        (-1, "Sammanställning", "BRP resultat"),
+        (-1, "Sammanställning", "BSP resultat"),
+        (-1, "Sammanställning", "Elhandlare resultat"),
+    ], {"brp_eq_bsp": True}),
+    ("Ökad totalkostnad = prisavvikelse × volym", [
+        (1, "Sammanställning", "Ökad totalkostnad slutkund"),
+        (-1, "Sammanställning", "Avvikelse slutkundens elpris", "RE", "Volym som faktureras slutkund"),
+    ], {}),
+    ("Resultat efter kompensation = totalresultat − neutralisering", [
+        (1, "Sammanställning", "Aktörers resultat efter kompensation"),
+        (-1, "Sammanställning", "BRP+BSP+Elhandlare resultat"),
+        (1, "Sammanställning", "Neutralisering"),
+    ], {"brp_eq_bsp": True}),
+    ("Resultat efter kompensation = BSP-resultat − neutralisering", [
+        (1, "Sammanställning", "Aktörers resultat efter kompensation"),
+        (-1, "Sammanställning", "BSP resultat"),
+        (1, "Sammanställning", "Neutralisering"),
+    ], {"brp_eq_bsp": False}),
+]
+
+ABS_TOL = 1e-6    # EUR
+REL_TOL = 1e-9    # relativt summan av termernas absolutbelopp
+
+
+def check_invariants(results: dict, params: dict = None, abs_tol: float = ABS_TOL, rel_tol: float = REL_TOL,
+                     max_rows: int = 1000) -> pd.DataFrame:
+    """
+    Kontrollerar INVARIANTS för alla scenarier och rader i `results`
+    (skalärer eller arrayer av valfri form, t.ex. (områden, MTU)).
+    Flaggor som saknas i params tas från DEFAULT_PARAMS; identiteter med
+    "flag"-villkor hoppas över utan params eller om flaggan är None.
+    Med params["exact"] (heltalsresultat) ska identiteterna gälla exakt och
+    produkter räknas med samma avrundning som motorn.
+    Returnerar avvikande rader (högst max_rows) med kolumnerna
+    Invariant, Scenario, Rad (platt index i resultatens gemensamma form),
+    Residual, Tolerans; tom DataFrame = allt stämmer.
+    """
+    columns = ["Invariant", "Scenario", "Rad", "Residual", "Tolerans"]
+    shape = np.broadcast_shapes(
+        *[np.shape(v) for by_actor in results.values() for fields in by_actor.values() for v in fields.values()
+          if not isinstance(v, str)]
+    ) or (1,)
+    p = None if params is None else {**DEFAULT_PARAMS, **params}
+    exact = bool(p and p["exact"])
+    if exact:
+        abs_tol = rel_tol = 0
+    # En buffert per körning: residualen summeras på plats, utan temporära arrayer per term
+    buf = np.empty(shape, dtype=np.int64 if exact else float)
+    found = []
+
+    for name, terms, cond in INVARIANTS:
+        if "flag" in cond:
+            flag, value = cond["flag"]
+            if p is None or p[flag] is None or bool(p[flag]) != value:
+                continue
+        for k, by_actor in results.items():
+            if "brp_eq_bsp" in cond and SCENARIO_SPECS[k]["brp_eq_bsp"] != cond["brp_eq_bsp"]:
+                continue
+
+            def term_value(term):
+                value = by_actor[term[1]][term[2]]
+                if len(term) == 5:
+                    # Andra faktorn är volymen: amount(volym, pris)
+                    value = amount(by_actor[term[3]][term[4]], value, exact)
+                return value
+
+            buf.fill(0.0)
+            for term in terms:
+                # ±1 utan multiplikation – ett pass mindre över arrayen
+                if term[0] == 1:
+                    np.add(buf, term_value(term), out=buf)
+                elif term[0] == -1:
+                    np.subtract(buf, term_value(term), out=buf)
+                else:
+                    np.add(buf, term[0] * term_value(term), out=buf)
+
+            # Relativ tolerans behövs bara där den absoluta inte räcker; NaN räknas som avvikelse
+            bad = ~(np.abs(buf) <= abs_tol)
+            if not bad.any():
+                continue
+            tol = abs_tol + rel_tol * sum(np.abs(term[0] * np.asarray(term_value(term), dtype=float)) for term in terms)
+            tol = np.broadcast_to(tol, buf.shape).ravel()
+            residual = buf.ravel()
+            rows = np.flatnonzero(~(np.abs(residual) <= tol))
+            if len(rows):
+                found.append(pd.DataFrame({
+                    "Invariant": name,
+                    "Scenario": k,
+                    "Rad": rows,
+                    "Residual": residual[rows],
+                    "Tolerans": tol[rows],
+                }))
+
+    if not found:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(found, ignore_index=True).head(max_rows)
@@ -0,0 +1,122 @@
+"""
+Budstegar (merit order) per MTU och riktning.
+
+I stället för ett enda bud E_bud lämnar BSP flera pris/volym-bud per MTU och
+riktning. En stege lagras som två arrayer (MTU, steg) – pris och volym –
+utfyllda med NaN där en MTU har färre bud, sorterade i merit order:
+stigande pris för uppreglering, fallande för nedreglering.
+
+Avropet avgörs mot det klarerade balanspriset (default P_IMB): uppregleringsbud
+med pris ≤ balanspriset och nedregleringsbud med pris ≥ balanspriset aktiveras.
+För varje MTU är antalet aktiverade steg antalet bud som klarar priskravet;
+eftersom stegen är sorterad är det ett prefix i merit order. Det räknas för
+alla MTU på en gång som (priser <= balanspris).sum(axis=1), och aktiverad
+volym är stegens kumulativa volym vid den positionen.
+
+Aktiverad volym blir E_bud (A-sidan) respektive E_bud_up (B-sidan) och går
+därmed in i BSP:s Budvolym/Aktiverad volym, under-/överleverans och
+kompensation som vanligt.
+"""
+import numpy as np
+import pandas as pd
+
+from timeseries import MTU_COLUMNS, TIME_COLUMNS
+
+# Kolumnnamn i budfilen (gemener) → kolumn
+BID_COLUMNS = {
+    "riktning": "Riktning", "direction": "Riktning",
+    "pris": "Pris", "price": "Pris",
+    "volym": "Volym", "volume": "Volym",
+}
+# Riktning i budfilen (gemener) → True för uppreglering
+BID_DIRECTIONS = {"upp": True, "up": True, "a": True, "ned": False, "down": False, "b": False}
+
+
+def build_ladders(mtu, up, price, volume, n_mtu: int) -> dict:
+    """
+    Budstegar ur bud i långt format (MTU-nummer, True = uppreglering, pris,
+    volym). Returnerar {True: (priser, volymer), False: (priser, volymer)}
+    med arrayer (n_mtu, steg) i merit order, NaN-utfyllda.
+    """
+    mtu = np.asarray(mtu, dtype=np.int64)
+    up = np.asarray(up, dtype=bool)
+    price = np.asarray(price, dtype=float)
+    volume = np.asarray(volume, dtype=float)
+
+    ladders = {}
+    for direction in (True, False):
+        sel = up == direction
+        m, p, v = mtu[sel], price[sel], volume[sel]
+        # Merit order inom varje MTU: stigande pris upp, fallande ned
+        order = np.lexsort((p if direction else -p, m))
+        m, p, v = m[order], p[order], v[order]
+        counts = np.bincount(m, minlength=n_mtu)
+        step = np.arange(len(m)) - np.repeat(np.cumsum(counts) - counts, counts)
+        width = int(counts.max(initial=0))
+        prices, volumes = np.full((n_mtu, width), np.nan), np.full((n_mtu, width), np.nan)
+        prices[m, step] = p
+        volumes[m, step] = v
+        ladders[direction] = (prices, volumes)
+    return ladders
+
+
+def clear_ladder(prices: np.ndarray, volumes: np.ndarray, clearing_price, up: bool = True) -> np.ndarray:
+    """
+    Aktiverad volym per MTU för en stege i merit order mot balanspriset
+    (skalär eller en per MTU). Aktiverade steg = antal steg med pris ≤
+    balanspriset (≥ för nedreglering), räknat för alla rader på en gång.
+    """
+    n_mtu, width = prices.shape
+    clearing = np.broadcast_to(np.asarray(clearing_price, dtype=float), (n_mtu,))
+    # Nedreglering: pris ≥ balanspris ⇔ −pris ≤ −balanspris (stegen är redan fallande)
+    merit = prices if up else -prices
+    target = clearing if up else -clearing
+    # Rader är sorterade och NaN (jämförs som falskt) ligger sist: stegen ≤ målet är ett prefix
+    n_steps = (merit <= target[:, None]).sum(axis=1)
+    cum = np.concatenate([np.zeros((n_mtu, 1)), np.cumsum(np.nan_to_num(volumes), axis=1)], axis=1)
+    return cum[np.arange(n_mtu), n_steps]
+
+
+def ladder_params(p: dict, ladders: dict, clearing_price=None, delivered: dict = None) -> dict:
+    """
+    Parametrar med E_bud (uppreglering, A-sidan) och E_bud_up (nedreglering,
+    B-sidan) från stegarna. Levererad volym E_akt/E_akt_up tas ur delivered
+    ({True: ..., False: ...}) om den anges, annars full leverans av aktiverad volym.
+    """
+    clearing = p["P_IMB"] if clearing_price is None else clearing_price
+    delivered = delivered or {}
+    out = dict(p)
+    for direction, (bud, akt) in {True: ("E_bud", "E_akt"), False: ("E_bud_up", "E_akt_up")}.items():
+        activated = clear_ladder(*ladders[direction], clearing, up=direction)
+        out[bud] = activated
+        out[akt] = delivered[direction] if delivered.get(direction) is not None else activated
+    return out
+
+
+def read_bids(buf, index: pd.Index) -> dict:
+    """
+    Läser bud (CSV: tid eller mtu, riktning, pris, volym; en rad per bud) och
+    bygger stegar för MTU i index. Bud utanför index ignoreras.
+    """
+    raw = pd.read_csv(buf, sep=None, engine="python", dtype=str)
+    raw = raw.rename(columns={c: BID_COLUMNS.get(c.strip().lower(), c.strip()) for c in raw.columns})
+    # Tidsindex: bud per tid; annars MTU-nummer som i tidsserien
+    timed = isinstance(index, pd.DatetimeIndex)
+    time_col = next((c for c in raw.columns if c.lower() in (TIME_COLUMNS if timed else MTU_COLUMNS)), None)
+    missing = [c for c in ("Riktning", "Pris", "Volym") if c not in raw.columns]
+    if time_col is None or missing:
+        label = "tid" if timed else "mtu"
+        raise ValueError(f"Budfilen saknar kolumner: {', '.join(([label] if time_col is None else []) + missing)}")
+
+    up = raw["Riktning"].str.strip().str.lower().map(BID_DIRECTIONS)
+    if up.isna().any():
+        raise ValueError(f"Okänd riktning: {', '.join(sorted(set(raw.loc[up.isna(), 'Riktning']))[:5])} (förväntar upp/ned)")
+
+    def numeric(c):
+        return pd.to_numeric(raw[c].str.replace(",", ".", regex=False).str.strip(), errors="raise")
+
+    times = pd.to_datetime(raw[time_col]) if timed else numeric(time_col)
+    pos = index.get_indexer(times)
+    keep = pos >= 0
+    return build_ladders(pos[keep], up[keep].to_numpy(dtype=bool), numeric("Pris")[keep], numeric("Volym")[keep],
+                         len(index))
@@ -0,0 +1,153 @@
+"""
+Avräkningen som linjär operator i priserna.
+
+För givna volymer och checkboxar är varje numeriskt fält affint i
+prisvektorn π = (P_DA, P_IMB, P_COMP, P_PEN, P_RECOMP, P_CAP, P_CAP_PEN):
+
+    fält = A · π + b
+
+Prisreglerna (P_COMP = P_IMB osv.) ingår i A. Enda undantaget är
+neutraliseringen max(0, ökad totalkostnad) när omvänd neutralisering inte är
+tillåten: den ger en knäckpunkt per scenario. Knäckpunkterna listas explicit
+som (scenario, villkorsrad, {rad: koefficient}): är villkorsradens värde
+≤ 0 läggs koefficient × villkorsraden till raden.
+
+compile_operator() avräknar motorn en gång med priserna satta till 0 och
+till var och en av enhetsvektorerna (motorn räknar elementvis, så alla
+punkter avräknas i samma anrop), med neutraliseringen linjär. Eftersom
+avbildningen då är affin är b = f(0) och kolumn j i A = f(e_j) − f(0)
+exakt, inte en differenskvot. Svep över priser blir en matrismultiplikation
+och A (med knäckpunkterna lösta) är derivatorna ∂fält/∂pris.
+
+Gäller flyttalsläget med skalära volymer; priserna får vara serier.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import (
+    ACTORS, DEFAULT_PARAMS, PRICE_PARAMS, TARGET_SCENARIO, by_actor, required_scenarios, settle,
+    summarize,
+)
+
+# Neutraliseringens knäckpunkt: villkor och rader som byter uttryck (Sammanställning)
+_KINK_CONDITION = "Ökad totalkostnad slutkund"
+_KINK_ROWS = {"Neutralisering": -1, "Aktörers resultat efter kompensation": 1}
+
+
+class PriceOperator:
+    """
+    rows: (scenario, aktör, fält) per rad, A: (rader, len(prices)), b: (rader,),
+    kinks: (scenario, villkorsrad, {rad: koefficient}), base: priserna vid kompileringen.
+    """
+
+    def __init__(self, rows: list, A: np.ndarray, b: np.ndarray, kinks: list, base: dict, prices=PRICE_PARAMS):
+        self.rows = rows
+        self.A = A
+        self.b = b
+        self.kinks = kinks
+        self.base = base
+        self.prices = tuple(prices)
+        self.row_index = {r: i for i, r in enumerate(rows)}
+
+    def _price_matrix(self, prices: dict) -> np.ndarray:
+        prices = {**self.base, **(prices or {})}
+        return np.column_stack(np.broadcast_arrays(*[np.asarray(prices[c], dtype=float) for c in self.prices]))
+
+    def select(self, field: str, actor: str = "Sammanställning") -> list:
+        """Radindex för ett fält i alla scenarier (för values(..., rows=))."""
+        return [i for i, (k, a, f) in enumerate(self.rows) if a == actor and f == field]
+
+    def values(self, prices: dict = None, rows: list = None) -> np.ndarray:
+        """
+        Raderna (alla eller index i rows) för prispunkterna i prices (skalärer
+        eller lika långa serier): matris (punkter, rader). Med rows räknas bara
+        de valda raderna och deras knäckvillkor, vilket håller långa svep små.
+        """
+        sel = np.arange(len(self.rows)) if rows is None else np.asarray(rows)
+        P = self._price_matrix(prices)
+        values = P @ self.A[sel].T + self.b[sel]
+        pos = {r: i for i, r in enumerate(sel.tolist())}
+        for _, cond, shifts in self.kinks:
+            targets = [(pos[r], coef) for r, coef in shifts.items() if r in pos]
+            if not targets:
+                continue
+            c = P @ self.A[cond] + self.b[cond]
+            for i, coef in targets:
+                values[:, i] += np.where(c <= 0, coef * c, 0.0)
+        return values
+
+    def evaluate(self, prices: dict = None) -> dict:
+        """Som values() men i formen scenario → aktör → fält (en array per fält)."""
+        values = self.values(prices)
+        out = {}
+        for i, (k, a, f) in enumerate(self.rows):
+            out.setdefault(k, {b: {} for b in ACTORS})[a][f] = values[:, i]
+        return out
+
+    def jacobian(self, prices: dict = None) -> pd.DataFrame:
+        """∂rad/∂pris vid en prispunkt (knäckpunkterna lösta där), rader × priser."""
+        P = self._price_matrix(prices)[:1]
+        J = self.A.copy()
+        for _, cond, shifts in self.kinks:
+            if (P @ self.A[cond] + self.b[cond])[0] <= 0:
+                for row, coef in shifts.items():
+                    J[row] += coef * self.A[cond]
+        index = pd.MultiIndex.from_tuples(self.rows, names=["Scenario", "Aktör", "Fält"])
+        return pd.DataFrame(J, index=index, columns=list(self.prices))
+
+    def sensitivity(self, field: str, price: str, actor: str = "Sammanställning", prices: dict = None) -> dict:
+        """∂fält/∂pris per scenario, t.ex. sensitivity("BSP resultat", "P_IMB")."""
+        J = self.jacobian(prices)
+        col = self.prices.index(price)
+        return {k: J.iat[self.row_index[(k, a, f)], col] for k, a, f in self.rows if a == actor and f == field}
+
+
+def compile_operator(params: dict, scenarios, target: str = TARGET_SCENARIO) -> PriceOperator:
+    """Kompilerar scenarierna (plus målscenariot) till en PriceOperator vid parametrarna `params`."""
+    p = {**DEFAULT_PARAMS, **params}
+    if p["exact"]:
+        raise ValueError("Den linjära formuleringen gäller bara flyttalsläget")
+    varying = [k for k, v in p.items() if k not in PRICE_PARAMS and np.ndim(v) > 0]
+    if varying:
+        raise ValueError(f"Parametrarna måste vara skalärer utom priserna: {', '.join(varying)}")
+
+    # Punkt 0 = alla priser 0, punkt j = enhetsvektor j
+    m = len(PRICE_PARAMS)
+    basis = np.vstack([np.zeros(m), np.eye(m)])
+    q = {**p, **{c: basis[:, j] for j, c in enumerate(PRICE_PARAMS)}, "allow_reverse_neutral": True}
+    settled = settle(q, required_scenarios(scenarios, target))
+    results = by_actor(settled, summarize(q, settled, target))
+
+    rows, cols = [], []
+    for k, actors in results.items():
+        for a, fields in actors.items():
+            for f, v in fields.items():
+                if not isinstance(v, str):
+                    rows.append((k, a, f))
+                    cols.append(np.broadcast_to(np.asarray(v, dtype=float), (m + 1,)))
+    F = np.array(cols)
+    b = F[:, 0].copy()
+    A = F[:, 1:] - F[:, :1]     # ej tillämpliga fält (NaN) får NaN även i A
+
+    kinks = []
+    if not p["allow_reverse_neutral"]:
+        index = {r: i for i, r in enumerate(rows)}
+        for k in results:
+            cond = index[(k, "Sammanställning", _KINK_CONDITION)]
+            shifts = {index[(k, "Sammanställning", f)]: coef for f, coef in _KINK_ROWS.items()}
+            kinks.append((k, cond, shifts))
+
+    base = {c: p[c] for c in PRICE_PARAMS}
+    return PriceOperator(rows, A, b, kinks, base)
+
+
+def kink_conditions(op: PriceOperator) -> pd.DataFrame:
+    """Knäckpunkterna som tabell: scenario, villkor (> 0 = neutralisering aktiv), påverkade fält."""
+    return pd.DataFrame([
+        {
+            "Scenario": k,
+            "Villkor": f"{op.rows[cond][2]} > 0",
+            "Påverkar": ", ".join(op.rows[r][2] for r in shifts),
+        }
+        for k, cond, shifts in op.kinks
+    ])
@@ -0,0 +1,237 @@
+"""
+Löpande avräkning av innevarande dygn, MTU för MTU.
+
+LiveSettlement håller summor per scenario, aktör och fält. Nya MTU avräknas
+för sig och läggs till summorna, så en uppdatering kostar lika mycket oavsett
+hur många MTU som redan avräknats. En MTU som kommer igen (korrigerad mätning
+eller pris) ersätter sitt tidigare bidrag. Slutkundens elpris räknas löpande
+som fakturerad kostnad / fakturerad volym.
+
+Indata kommer antingen som CSV-filer i en inkorgskatalog (samma format som
+tidsserie-uppladdningen) eller som JSON-rader över TCP, en MTU per rad:
+    python live.py --inbox data/inkorg
+    python live.py --port 8766
+    echo '{"tid": "2025-01-01T00:15", "P_IMB": 61.2, "E_cons": 23.1}' | nc localhost 8766
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    ACTORS, CAPACITY_FIELDS, DEFAULT_PARAMS, PRICE_FIELDS, SCENARIOS, TARGET_SCENARIO, by_actor, required_scenarios, settle,
+    summarize, unit_price,
+)
+from timeseries import SERIES_COLUMNS, read_series_csv, series_from_records
+
+DEFAULT_INBOX = os.environ.get("BSP_INBOX", os.path.join("data", "inkorg"))
+
+# Slutkundens elpris räknas om från summorna av dessa RE-fält (belopp, volym)
+_CUSTOMER_PRICE = ("Kostnad som faktureras slutkund", "Volym som faktureras slutkund")
+
+
+class LiveSettlement:
+    """Löpande summor för ett dygn; append() lägger till eller ersätter MTU."""
+
+    def __init__(self, params: dict, scenarios=SCENARIOS, target: str = TARGET_SCENARIO, daily: bool = True):
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.scenarios = [k for k in SCENARIOS if k in set(scenarios)]
+        self.wanted = required_scenarios(self.scenarios, target)
+        self.target = target
+        self.daily = daily
+        # Skalära fält med ett värde per MTU; layouten bestäms vid första avräkningen
+        self.layout = None
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.day = None
+        self.rows = {}          # tid → bidragsvektor (samma ordning som layout)
+        self.total = None
+
+    def _contributions(self, frame: pd.DataFrame) -> np.ndarray:
+        # Avräknar paketet vektoriserat och returnerar (MTU, fält) i layoutordning
+        p = dict(self.params)
+        for c in SERIES_COLUMNS:
+            if c in frame.columns:
+                p[c] = frame[c].fillna(self.params[c]).to_numpy(dtype=float)
+        settled = settle(p, self.wanted)
+        results = by_actor(settled, summarize(p, settled, self.target))
+        if self.layout is None:
+            # NA-fält (NaN i scenariot), priser och kapaciteter (MW) summeras inte
+            self.layout = [
+                (k, a, f)
+                for k in self.wanted for a in ACTORS for f, v in results[k][a].items()
+                if not isinstance(v, str) and f not in PRICE_FIELDS | CAPACITY_FIELDS and not np.isnan(v).all()
+            ]
+        dtype = np.int64 if self.params["exact"] else float
+        return np.column_stack([
+            np.broadcast_to(np.asarray(results[k][a][f], dtype=dtype), (len(frame),)) for k, a, f in self.layout
+        ])
+
+    def append(self, frame: pd.DataFrame) -> int:
+        """
+        Avräknar MTU i frame (index = tid, kolumner ur SERIES_COLUMNS; saknade
+        värden tas från parametrarna). Med daily=True startar ett nytt dygn om
+        från noll och MTU från tidigare dygn ignoreras. Returnerar antal MTU.
+        """
+        if self.daily and isinstance(frame.index, pd.DatetimeIndex) and len(frame):
+            days = frame.index.normalize()
+            if self.day is None or days.max() > self.day:
+                self.reset()
+                self.day = days.max()
+            frame = frame[days == self.day]
+        if not len(frame):
+            return len(self.rows)
+
+        values = self._contributions(frame)
+        if self.total is None:
+            self.total = np.zeros(values.shape[1], dtype=values.dtype)
+        for t, row in zip(frame.index, values):
+            old = self.rows.get(t)
+            if old is not None:
+                self.total -= old
+            self.total += row
+            self.rows[t] = row
+        return len(self.rows)
+
+    def totals(self) -> dict:
+        """Summor som scenario → aktör → fält, plus löpande slutkundspris och avvikelse mot målet."""
+        out = {k: {a: {} for a in ACTORS} for k in self.scenarios}
+        if self.total is None:
+            return out
+        for (k, a, f), v in zip(self.layout, self.total):
+            if k in out:
+                out[k][a][f] = v[()]
+
+        def price(k):
+            cost, vol = (self.total[self.layout.index((k, "RE", f))] for f in _CUSTOMER_PRICE)
+            return unit_price(cost, vol, self.params["exact"])
+
+        goal = price(self.target)
+        for k in self.scenarios:
+            out[k]["RE"]["Slutkundens elpris"] = price(k)
+            out[k]["Sammanställning"]["Slutkundens elpris"] = out[k]["RE"]["Slutkundens elpris"]
+            out[k]["Sammanställning"]["Målpris"] = goal
+            out[k]["Sammanställning"]["Avvikelse slutkundens elpris"] = out[k]["RE"]["Slutkundens elpris"] - goal
+        return out
+
+    def series(self, field: str, actor: str = "Sammanställning") -> pd.DataFrame:
+        """Värde per MTU för ett summerbart fält, en kolumn per scenario (i tidsordning)."""
+        cols = [i for i, (k, a, f) in enumerate(self.layout or []) if k in self.scenarios and a == actor and f == field]
+        times = sorted(self.rows)
+        data = np.array([self.rows[t][cols] for t in times]).reshape(len(times), len(cols))
+        return pd.DataFrame(data, index=pd.Index(times, name="Tid"), columns=[self.layout[i][0] for i in cols])
+
+
+class InboxFeed:
+    """
+    Nya eller ändrade CSV-filer i en katalog (filnamn och mtime håller reda på vad som lästs).
+    En fil som inte går att läsa räknas också som läst, så att den inte stoppar
+    filerna efter den; felet ligger kvar i errors (filnamn → meddelande) tills
+    filen ändras och kan läsas.
+    """
+
+    def __init__(self, inbox: str = DEFAULT_INBOX):
+        self.inbox = inbox
+        self.seen = {}
+        self.errors = {}
+
+    def poll(self) -> list:
+        frames = []
+        if not os.path.isdir(self.inbox):
+            return frames
+        for name in sorted(os.listdir(self.inbox)):
+            path = os.path.join(self.inbox, name)
+            if not name.lower().endswith(".csv") or not os.path.isfile(path):
+                continue
+            mtime = os.path.getmtime(path)
+            if self.seen.get(name) == mtime:
+                continue
+            self.seen[name] = mtime
+            try:
+                frames.append(read_series_csv(path))
+            except (OSError, ValueError) as exc:
+                self.errors[name] = str(exc)
+            else:
+                self.errors.pop(name, None)
+        return frames
+
+
+def _socket_handler(live: LiveSettlement, on_update=None):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    frame = series_from_records(record if isinstance(record, list) else [record])
+                    with live.lock:
+                        n = live.append(frame)
+                    if on_update:
+                        on_update(live)
+                    reply = {"mtu": n}
+                except (TypeError, ValueError) as exc:
+                    reply = {"error": str(exc)}
+                self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    return Handler
+
+
+def serve_socket(live: LiveSettlement, host: str = "127.0.0.1", port: int = 8766, on_update=None):
+    """Startar en TCP-tjänst i en bakgrundstråd: en JSON-post (eller lista) per rad. Returnerar servern."""
+    server = socketserver.ThreadingTCPServer((host, port), _socket_handler(live, on_update))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _print_status(live: LiveSettlement):
+    totals = live.totals()
+    parts = [
+        f"{k}: {totals[k]['Sammanställning'].get('Aktörers resultat efter kompensation', np.nan):,.2f}"
+        for k in live.scenarios
+    ]
+    day = live.day.date() if live.day is not None else "-"
+    print(f"{day} {len(live.rows)} MTU | resultat efter kompensation " + ", ".join(parts), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Löpande avräkning av innevarande dygn")
+    parser.add_argument("--inbox", default=None, help=f"katalog med CSV-filer (t.ex. {DEFAULT_INBOX})")
+    parser.add_argument("--port", type=int, default=None, help="TCP-port för JSON-rader")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--poll", type=float, default=5.0, help="sekunder mellan kontroller av inkorgen")
+    parser.add_argument("--exact", action="store_true", help="heltalsläge (cent/kWh)")
+    args = parser.parse_args()
+    if args.inbox is None and args.port is None:
+        parser.error("ange --inbox och/eller --port")
+
+    live = LiveSettlement({"exact": args.exact})
+    if args.port is not None:
+        serve_socket(live, args.host, args.port, on_update=_print_status)
+        print(f"Tar emot MTU på {args.host}:{args.port}")
+    feed = InboxFeed(args.inbox) if args.inbox else None
+    reported = {}
+    try:
+        while True:
+            if feed is not None:
+                for frame in feed.poll():
+                    with live.lock:
+                        live.append(frame)
+                    _print_status(live)
+                for name, message in feed.errors.items():
+                    if reported.get(name) != message:
+                        print(f"Kunde inte läsa {name}: {message}", file=sys.stderr, flush=True)
+                reported = dict(feed.errors)
+            time.sleep(args.poll)
+    except KeyboardInterrupt:
+        pass
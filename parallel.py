@@ -0,0 +1,393 @@
+"""
+Parallell avräkning av parametersvep och Monte Carlo-körningar.
+
+Stora indata-arrayer (prisserier, förbrukning, aktivering, samplade banor)
+läggs i delat minne en gång och kopplas in i varje arbetsprocess – de picklas
+inte per uppgift. Konfigurationerna delas i sammanhängande block; varje block
+avräknas vektoriserat (konfigurationer × MTU) och ger summor per scenario och
+fält. Processpoolen startas en gång per svep och återanvänds för alla block
+(även när top_k_sweep/sketch_sweep läser grid i bitar). Blocken sätts ihop i
+föräldraprocessen i indataordning, så resultatet är detsamma oavsett antal
+processer. Med exact=True räknas allt i heltal (engine.amount) och summorna
+är int64-cent, bitvis lika oavsett blockindelning.
+
+sketch_sweep() sparar inte summorna utan ger fördelningen: varje block ger
+en kvantilskiss (sketches.py) i sin arbetsprocess och skisserna slås ihop i
+föräldern.
+"""
+import itertools
+import os
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    CENT_PER_EUR, DEFAULT_PARAMS, FLAG_PARAMS, SCENARIOS, TARGET_SCENARIO, required_scenarios, settle, summarize,
+)
+from sketches import DEFAULT_K, QuantileSketch, ResultSketch
+
+# Fält (från summarize) som summeras över MTU per konfiguration
+SWEEP_FIELDS = (
+    "BRP resultat",
+    "BSP resultat",
+    "Elhandlare resultat",
+    "Ökad totalkostnad slutkund",
+    "Neutralisering",
+    "Aktörers resultat efter kompensation",
+)
+
+# Max antal (konfiguration × MTU)-element per vektoriserat anrop i en arbetsprocess
+BLOCK_ELEMENTS = 2_000_000
+
+# Arrayer som arbetsprocessen har kopplat in från delat minne: namn → ndarray
+_SHARED = {}
+_SHARED_BLOCKS = []
+
+
+class SharedArrays:
+    """Kontexthanterare som lägger arrayer i delat minne och städar bort dem efteråt."""
+
+    def __init__(self, arrays: dict):
+        self.arrays = arrays
+        self.blocks = []
+        self.spec = {}
+
+    def __enter__(self):
+        for name, a in self.arrays.items():
+            a = np.ascontiguousarray(a, dtype=float)
+            shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+            np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+            self.blocks.append(shm)
+            self.spec[name] = (shm.name, a.shape, a.dtype.str)
+        return self.spec
+
+    def __exit__(self, *exc):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+
+def _attach(spec: dict):
+    """Initierare i arbetsprocessen: kopplar in de delade arrayerna (utan kopiering)."""
+    _SHARED.clear()
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED_BLOCKS.append(shm)
+        _SHARED[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _detach():
+    _SHARED.clear()
+    for shm in _SHARED_BLOCKS:
+        shm.close()
+    _SHARED_BLOCKS.clear()
+
+
+def _settle_block(lo: int, hi: int, grid: list, per_config: tuple, scenarios: tuple, fields: tuple, target: str,
+                  exact: bool = False):
+    """
+    Avräknar konfiguration lo..hi. Skalära värden i grid blir kolumnvektorer,
+    delade 1-D-serier bredds ut över konfigurationerna och arrayer i per_config
+    (form (n_konfigurationer, T)) tas rad för rad. Returnerar (lo, summor, na) där
+    summor och na har formen (hi-lo, scenarier, fält); na markerar fält som är NA
+    (NaN) för konfigurationen. I heltalsläget är summan 0 där.
+    """
+    n = hi - lo
+    out = np.empty((n, len(scenarios), len(fields)), dtype=np.int64 if exact else float)
+    na = np.zeros(out.shape, dtype=bool)
+    wanted = required_scenarios(scenarios, target)
+    series = {k: v for k, v in _SHARED.items() if k not in per_config}
+    n_mtu = max([v.shape[-1] for v in _SHARED.values()] or [1])
+
+    # Konfigurationer med samma checkbox-kombination avräknas tillsammans
+    groups = {}
+    for j, cfg in enumerate(grid):
+        flags = tuple(exact if f == "exact" else bool(cfg.get(f, DEFAULT_PARAMS[f])) for f in FLAG_PARAMS)
+        groups.setdefault(flags, []).append(j)
+
+    for flags, members in groups.items():
+        rows = np.asarray(members)
+        p = {**DEFAULT_PARAMS, **series, **dict(zip(FLAG_PARAMS, flags))}
+        for k in {k for j in members for k in grid[j]} - set(FLAG_PARAMS):
+            values = [grid[j].get(k, p[k]) for j in members]
+            if all(np.ndim(v) == 0 for v in values):
+                p[k] = np.asarray(values, dtype=float)[:, None]
+            else:
+                # Konfigurationer utan överskrivning behåller den delade serien
+                p[k] = np.stack([np.broadcast_to(np.asarray(v, dtype=float), (n_mtu,)) for v in values])
+        for k in per_config:
+            p[k] = _SHARED[k][lo + rows]
+
+        summary = summarize(p, settle(p, wanted), target)
+        for s_i, k in enumerate(scenarios):
+            for f_i, f in enumerate(fields):
+                v = np.asarray(summary[k][f])
+                if exact and v.dtype.kind == "f":
+                    # NA-fält är NaN även i heltalsläget: markeras i na innan summeringen i int64
+                    if not np.isnan(v).all():
+                        raise ValueError(f"{f} i scenario {k} är inte heltal i heltalsläget")
+                    na[rows, s_i, f_i] = True
+                    out[rows, s_i, f_i] = 0
+                    continue
+                v = np.broadcast_to(v if exact else v.astype(float), (len(members), n_mtu))
+                out[rows, s_i, f_i] = v.sum(axis=1)
+                if not exact:
+                    na[rows, s_i, f_i] = np.isnan(out[rows, s_i, f_i])
+    return lo, out, na
+
+
+def _no_na(na: np.ndarray, scenarios: tuple, fields: tuple):
+    # Heltalssummor kan inte vara NA: fält som saknas i ett scenario måste väljas bort
+    if na.any():
+        _, s_i, f_i = np.argwhere(na)[0]
+        raise ValueError(f"{fields[f_i]} är inte tillämpligt i scenario {scenarios[s_i]} och kan inte summeras i heltal")
+
+
+def _sketch_block(lo: int, hi: int, grid: list, per_config: tuple, scenarios: tuple, fields: tuple, target: str,
+                  exact: bool, k: int) -> QuantileSketch:
+    """Som _settle_block men returnerar bara en skiss över blockets summor (i EUR), en ström per scenario och fält."""
+    _, sums, na = _settle_block(lo, hi, grid, per_config, scenarios, fields, target, exact)
+    if exact:
+        _no_na(na, scenarios, fields)
+    values = sums.reshape(len(sums), -1)
+    return QuantileSketch(values.shape[1], k).update(values / CENT_PER_EUR if exact else values)
+
+
+def _check_params(grid: list, series: dict, per_config: dict):
+    unknown = ({k for cfg in grid for k in cfg} | set(series) | set(per_config)) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Okända parametrar: {', '.join(sorted(unknown))}")
+
+
+def _block_bounds(n: int, series: dict, per_config: dict, workers: int) -> list:
+    # Block: tillräckligt små för minnet, minst ~4 block per process för lastbalans
+    n_mtu = max([np.shape(a)[-1] for a in (*series.values(), *per_config.values())] or [1])
+    block = max(1, min(BLOCK_ELEMENTS // n_mtu, -(-n // (workers * 4))))
+    return [(lo, min(lo + block, n)) for lo in range(0, n, block)]
+
+
+@contextmanager
+def _worker_pool(spec: dict, workers: int):
+    """
+    Processpool (eller föräldraprocessen om workers == 1) med de delade
+    arrayerna inkopplade, en gång per svep. Ger run(fn, jobb) som kör fn(*jobb)
+    per block och ger resultaten i jobbordning.
+    """
+    if workers == 1:
+        _attach(spec)
+        try:
+            yield lambda fn, jobs: (fn(*job) for job in jobs)
+        finally:
+            _detach()
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(spec,)) as pool:
+            def run(fn, jobs):
+                futures = [pool.submit(fn, *job) for job in jobs]
+                for fut in futures:
+                    yield fut.result()
+            yield run
+
+
+def _chunks(grid, per_config: dict, chunk: int):
+    """Läser grid (får vara en generator) i bitar om chunk: ger (löpnummer för första, bit)."""
+    it = iter(grid)
+    lo = 0
+    while True:
+        block = list(itertools.islice(it, chunk))
+        if not block:
+            return
+        for name, a in per_config.items():
+            if np.shape(a)[0] < lo + len(block):
+                raise ValueError(f"{name}: har {np.shape(a)[0]} rader men grid har fler konfigurationer")
+        yield lo, block
+        lo += len(block)
+
+
+def parallel_sweep(
+    grid: list,
+    series: dict = None,
+    per_config: dict = None,
+    scenarios=SCENARIOS,
+    fields=SWEEP_FIELDS,
+    target: str = TARGET_SCENARIO,
+    workers: int = None,
+    exact: bool = False,
+) -> np.ndarray:
+    """
+    Avräknar varje konfiguration i `grid` (lista av parameteröverskrivningar,
+    t.ex. ett svep över P_RECOMP eller Monte Carlo-sampel) parallellt.
+
+    series:     stora 1-D-serier som delas av alla konfigurationer (P_DA, P_IMB, E_cons, E_akt …)
+    per_config: arrayer med en rad per konfiguration, t.ex. samplade prisbanor (n, T)
+
+    Returnerar en array (len(grid), len(scenarios), len(fields)) med summor över MTU,
+    i samma ordning som grid (int64-cent om exact).
+    """
+    series = dict(series or {})
+    per_config = dict(per_config or {})
+    n = len(grid)
+    for k, a in per_config.items():
+        if np.shape(a)[0] != n:
+            raise ValueError(f"{k}: första dimensionen ({np.shape(a)[0]}) måste vara antal konfigurationer ({n})")
+    _check_params(grid, series, per_config)
+
+    scenarios, fields = tuple(scenarios), tuple(fields)
+    out = np.empty((n, len(scenarios), len(fields)), dtype=np.int64 if exact else float)
+    if n == 0:
+        return out
+
+    workers = workers or os.cpu_count() or 1
+    with SharedArrays({**series, **per_config}) as spec, _worker_pool(spec, workers) as run:
+        jobs = [
+            (lo, hi, grid[lo:hi], tuple(per_config), scenarios, fields, target, exact)
+            for lo, hi in _block_bounds(n, series, per_config, workers)
+        ]
+        # Reduktion i föräldern: delresultaten skrivs på sin plats (deterministisk ordning)
+        for lo, part, na in run(_settle_block, jobs):
+            if exact:
+                _no_na(na, scenarios, fields)
+            out[lo:lo + len(part)] = part
+    return out
+
+
+# Rangordning för top_k_sweep: poäng att minimera
+RANK_ORDERS = {
+    "abs": np.abs,                  # närmast målet (minst |avvikelse|)
+    "min": lambda v: v,
+    "max": lambda v: -v,
+}
+
+# Antal konfigurationer som avräknas per steg i top_k_sweep (begränsar minnet)
+TOPK_CHUNK = 50_000
+
+
+def _select_k(score: np.ndarray, idx: np.ndarray, k: int) -> np.ndarray:
+    """Positioner för de k lägsta poängen (partiell sortering); lika poäng vid gränsen: lägst löpnummer."""
+    kth = np.partition(score, k - 1)[k - 1]
+    below = np.flatnonzero(score < kth)
+    ties = np.flatnonzero(score == kth)
+    ties = ties[np.argsort(idx[ties], kind="stable")[:k - len(below)]]
+    return np.concatenate([below, ties])
+
+
+def top_k_sweep(
+    grid,
+    k: int = 10,
+    field: str = "Avvikelse mot aktörers målresultat",
+    order: str = "abs",
+    series: dict = None,
+    per_config: dict = None,
+    scenarios=SCENARIOS,
+    target: str = TARGET_SCENARIO,
+    workers: int = None,
+    exact: bool = False,
+    chunk: int = TOPK_CHUNK,
+) -> dict:
+    """
+    De k konfigurationer per scenario som har minst |avvikelse| ("abs"), lägst
+    ("min") eller högst ("max") värde på `field` summerat över MTU, t.ex.
+    avvikelsen mot målresultatet (5a) eller "Ökad totalkostnad slutkund".
+
+    grid får vara en generator: den läses i bitar om `chunk` konfigurationer
+    som avräknas i samma processpool (startas en gång per anrop, delade
+    arrayer läggs i delat minne en gång), och efter varje bit behålls bara de
+    k bästa kandidaterna per scenario (np.argpartition). Minnet är därför
+    begränsat av chunk och k, inte av antalet konfigurationer. per_config-
+    arrayer indexeras med konfigurationens löpnummer.
+
+    Returnerar scenario → DataFrame (sorterad, bäst först) med kolumnerna
+    Konfiguration (löpnummer i grid), field och konfigurationens parametrar.
+    Konfigurationer där fältet är NA ingår inte, även i heltalsläget; för
+    scenarier där fältet alltid är NA (avvikelsen i 4a–5b) blir tabellen tom.
+    """
+    if order not in RANK_ORDERS:
+        raise ValueError(f"Okänd ordning: {order} (välj {', '.join(RANK_ORDERS)})")
+    score_of = RANK_ORDERS[order]
+    scenarios = tuple(scenarios)
+    series = dict(series or {})
+    per_config = dict(per_config or {})
+    _check_params([], series, per_config)
+    workers = workers or os.cpu_count() or 1
+
+    best_idx = [np.empty(0, dtype=np.int64) for _ in scenarios]
+    best_val = [np.empty(0, dtype=np.int64 if exact else float) for _ in scenarios]
+    configs = {}                    # löpnummer → konfiguration, bara för nuvarande kandidater
+    with SharedArrays({**series, **per_config}) as spec, _worker_pool(spec, workers) as run:
+        for lo, block in _chunks(grid, per_config, chunk):
+            _check_params(block, {}, {})
+            hi = lo + len(block)
+            sums = np.empty((len(block), len(scenarios)), dtype=np.int64 if exact else float)
+            na = np.empty((len(block), len(scenarios)), dtype=bool)
+            jobs = [
+                (lo + b_lo, lo + b_hi, block[b_lo:b_hi], tuple(per_config), scenarios, (field,), target, exact)
+                for b_lo, b_hi in _block_bounds(len(block), series, per_config, workers)
+            ]
+            for b_lo, part, part_na in run(_settle_block, jobs):
+                sums[b_lo - lo:b_lo - lo + len(part)] = part[:, :, 0]
+                na[b_lo - lo:b_lo - lo + len(part)] = part_na[:, :, 0]
+            for s_i in range(len(scenarios)):
+                # Konfigurationer där fältet är NA blir aldrig kandidater
+                defined = ~na[:, s_i]
+                idx = np.concatenate([best_idx[s_i], np.arange(lo, hi)[defined]])
+                val = np.concatenate([best_val[s_i], sums[defined, s_i]])
+                if len(val) > k:
+                    keep = _select_k(score_of(val), idx, k)
+                    idx, val = idx[keep], val[keep]
+                best_idx[s_i], best_val[s_i] = idx, val
+            wanted = set(np.concatenate(best_idx).tolist())
+            configs = {j: c for j, c in configs.items() if j in wanted}
+            configs.update({j: block[j - lo] for j in wanted if lo <= j < hi})
+
+    out = {}
+    for s_i, key in enumerate(scenarios):
+        idx, val = best_idx[s_i], best_val[s_i]
+        ranked = np.lexsort((idx, score_of(val)))        # lika poäng: lägst löpnummer först
+        frame = pd.DataFrame({"Konfiguration": idx[ranked], field: val[ranked]})
+        params = pd.DataFrame.from_records([configs[j] for j in idx[ranked]], index=frame.index)
+        out[key] = pd.concat([frame, params], axis=1)
+    return out
+
+
+def sketch_sweep(
+    grid,
+    series: dict = None,
+    per_config: dict = None,
+    scenarios=SCENARIOS,
+    fields=SWEEP_FIELDS,
+    target: str = TARGET_SCENARIO,
+    workers: int = None,
+    exact: bool = False,
+    chunk: int = TOPK_CHUNK,
+    k: int = DEFAULT_K,
+) -> ResultSketch:
+    """
+    Fördelningen av summorna över MTU per konfiguration, utan att spara dem.
+
+    grid får vara en generator och läses i bitar om `chunk` konfigurationer
+    (per_config indexeras med löpnumret, som i top_k_sweep). Varje block ger
+    en QuantileSketch i sin arbetsprocess och föräldern slår ihop skisserna i
+    blockordning, så minnet är begränsat av chunk och k oavsett antal
+    konfigurationer. Returnerar en ResultSketch med en ström per scenario och
+    fält (aktören "Sammanställning"); i heltalsläge i EUR.
+    """
+    scenarios, fields = tuple(scenarios), tuple(fields)
+    series = dict(series or {})
+    per_config = dict(per_config or {})
+    workers = workers or os.cpu_count() or 1
+    out = ResultSketch([(s, "Sammanställning", f) for s in scenarios for f in fields], k)
+
+    _check_params([], series, per_config)
+    with SharedArrays({**series, **per_config}) as spec, _worker_pool(spec, workers) as run:
+        for lo, block in _chunks(grid, per_config, chunk):
+            _check_params(block, {}, {})
+            jobs = [
+                (lo + b_lo, lo + b_hi, block[b_lo:b_hi], tuple(per_config), scenarios, fields, target, exact, k)
+                for b_lo, b_hi in _block_bounds(len(block), series, per_config, workers)
+            ]
+            for sketch in run(_sketch_block, jobs):
+                out.sketch.merge(sketch)
+    return out
@@ -0,0 +1,143 @@
+"""
+Stokastiska prisscenarier ur historiska DA- och obalanspriser.
+
+Banorna byggs med block-bootstrap: hela block (default ett dygn = 96 MTU) av
+historiska (P_DA, P_IMB)-par dras med återläggning och läggs efter varandra.
+Paren dras tillsammans och blocken börjar på dygnsgräns, så sambandet mellan
+DA- och obalanspris och variationen över dygnet behålls. Blockens starter
+tas ur datumen i tidsindexet; dygn med sommar-/vintertid (92/100 MTU) och
+block med luckor används inte.
+
+Banorna avräknas i block om högst PATH_BLOCK_ELEMENTS värden per fält
+(priserna som arrayer med formen (banor, MTU)) och summeras per bana:
+belopp och volymer summeras, priser medelvärdesbildas utom slutkundens
+elpris, som är fakturerad kostnad / fakturerad volym per bana (som i
+zones.py och huvudtabellen). Fördelningen över banorna sammanfattas med STATISTICS i samma form som avräkningsresultaten
+(scenario → aktör → fält), så de kan visas i de vanliga tabellerna.
+sketch_paths() drar och avräknar banorna block för block och behåller bara
+en kvantilskiss, så antalet banor begränsas inte av minnet.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import TARGET_SCENARIO, by_actor, customer_price, reduce_results, required_scenarios, settle, summarize
+from sketches import DEFAULT_K, ResultSketch
+
+PRICE_COLUMNS = ("P_DA", "P_IMB")
+BLOCK_MTU = 96
+PATH_BLOCK_ELEMENTS = 500_000
+# Fler banor än så sammanfattas bara med kvantilskiss (sketch_paths)
+EXACT_PATHS = 100_000
+
+# Namn → funktion över banorna (axel 0)
+STATISTICS = {
+    "Medelvärde": lambda x: np.mean(x, axis=0),
+    "Standardavvikelse": lambda x: np.std(x, axis=0),
+    "P5": lambda x: np.percentile(x, 5, axis=0),
+    "P50 (median)": lambda x: np.percentile(x, 50, axis=0),
+    "P95": lambda x: np.percentile(x, 95, axis=0),
+}
+
+
+def _block_starts(history: pd.DataFrame, values: np.ndarray, block: int) -> np.ndarray:
+    # Starter där hela blocket har båda priserna. Med tidsindex: bara vid midnatt och bara block
+    # utan luckor som slutar vid midnatt, så dygn med sommar-/vintertid (92/100 MTU) och luckor
+    # i historiken hoppas över i stället för att förskjuta blocken från dygnsgränsen
+    n = len(values)
+    index = history.index
+    if isinstance(index, pd.DatetimeIndex):
+        starts = np.flatnonzero(index == index.normalize())
+        starts = starts[starts + block <= n]
+        t = index.as_unit("ns").asi8
+        if n > 1 and len(starts):
+            diff = np.diff(t)
+            step = int(np.median(diff))
+            gaps = np.concatenate(([0], np.cumsum(diff != step)))
+            end = index[starts] + pd.Timedelta(block * step, "ns")
+            starts = starts[(gaps[starts + block - 1] == gaps[starts]) & (end == end.normalize())]
+    else:
+        starts = np.arange(0, n - block + 1, block)
+    missing = np.concatenate(([0], np.cumsum(np.isnan(values).any(axis=1))))
+    return starts[missing[starts + block] == missing[starts]]
+
+
+def bootstrap_paths(history: pd.DataFrame, n_paths: int, horizon: int, block: int = BLOCK_MTU,
+                    seed: int = None) -> dict:
+    """
+    n_paths prisbanor om horizon MTU ur history (kolumnerna P_DA och P_IMB, en
+    rad per MTU). Returnerar {"P_DA": (n_paths, horizon), "P_IMB": (n_paths, horizon)}.
+    """
+    missing = [c for c in PRICE_COLUMNS if c not in history.columns]
+    if missing:
+        raise ValueError(f"Prishistoriken saknar kolumnerna {', '.join(missing)}")
+    values = np.column_stack([history[c].to_numpy(dtype=float) for c in PRICE_COLUMNS])
+    starts = _block_starts(history, values, block)
+    if not len(starts):
+        raise ValueError(f"Prishistoriken har inget komplett block om {block} MTU")
+
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-horizon // block)
+    picked = rng.choice(starts, size=(n_paths, n_blocks))
+    idx = (picked[:, :, None] + np.arange(block)).reshape(n_paths, -1)[:, :horizon]
+    return {c: values[idx, j] for j, c in enumerate(PRICE_COLUMNS)}
+
+
+def _path_totals(p: dict, settled: dict, target: str) -> dict:
+    # Summor per bana (axel 1 = MTU) med volymvägt slutkundspris
+    totals = reduce_results(by_actor(settled, summarize(p, settled, target)), axis=1)
+    return customer_price(totals, bool(p.get("exact")), target)
+
+
+def evaluate_paths(params: dict, paths: dict, scenarios, target: str = TARGET_SCENARIO) -> dict:
+    """
+    Avräknar alla banor för scenarierna (plus målscenariot) och returnerar
+    scenario → aktör → fält → array med ett värde per bana.
+    """
+    n_paths, horizon = next(iter(paths.values())).shape
+    wanted = required_scenarios(scenarios, target)
+    step = max(1, PATH_BLOCK_ELEMENTS // max(horizon, 1))
+    parts = []
+    for lo in range(0, n_paths, step):
+        p = {**params, **{c: v[lo:lo + step] for c, v in paths.items()}}
+        settled = settle(p, wanted)
+        parts.append(_path_totals(p, settled, target))
+    return {
+        k: {
+            a: {
+                f: v if isinstance(v, str) else np.concatenate([part[k][a][f] for part in parts])
+                for f, v in fields.items()
+            }
+            for a, fields in actors.items()
+        }
+        for k, actors in parts[0].items()
+    }
+
+
+def distribution(totals: dict, statistic: str) -> dict:
+    """En statistik (nyckel i STATISTICS) över banorna, i formen scenario → aktör → fält."""
+    stat = STATISTICS[statistic]
+    return {
+        k: {a: {f: v if isinstance(v, str) else float(stat(v)) for f, v in fields.items()}
+            for a, fields in actors.items()}
+        for k, actors in totals.items()
+    }
+
+
+def sketch_paths(params: dict, history: pd.DataFrame, n_paths: int, horizon: int, scenarios,
+                 target: str = TARGET_SCENARIO, block: int = BLOCK_MTU, seed: int = None,
+                 k: int = DEFAULT_K) -> ResultSketch:
+    """
+    Som bootstrap_paths + evaluate_paths, men banorna dras och avräknas i
+    block och bara en ResultSketch över resultaten per bana behålls.
+    """
+    rng = np.random.default_rng(seed)
+    wanted = required_scenarios(scenarios, target)
+    step = max(1, PATH_BLOCK_ELEMENTS // max(horizon, 1))
+    sketch = None
+    for lo in range(0, n_paths, step):
+        p = {**params, **bootstrap_paths(history, min(step, n_paths - lo), horizon, block, seed=rng)}
+        settled = settle(p, wanted)
+        totals = _path_totals(p, settled, target)
+        sketch = sketch or ResultSketch.for_results(totals, k=k)
+        sketch.update(totals)
+    return sketch
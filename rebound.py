@@ -0,0 +1,60 @@
+"""
+Rebound (återhämtning) efter aktivering.
+
+En flexibel last som regleras upp (minskad förbrukning) tar ofta igen en del
+av energin under de följande MTU:erna, och en nedreglering (ökad förbrukning)
+följs av en motsvarande minskning. En reboundkärna k[1..L] anger hur stor
+andel av aktiveringen i MTU t som återkommer i MTU t+1 … t+L; summan av
+kärnan är den totala andelen.
+
+Reboundförbrukningen är faltningen av aktiveringsserien med kärnan, längs
+sista axeln (MTU), för alla serier på en gång. Den läggs på förbrukningen –
+E_cons (+, A-sidan) och E_cons_up (−, B-sidan) – och går därmed in i BRP:s
+obalans och balanskostnad. Obalansjusteringen täcker bara aktiveringen i
+samma MTU, så reboundens kostnad hamnar hos BRP (och via vidarefakturering
+hos RE) i scenario 4–5 men stannar internt när BRP = BSP (1–3).
+Rebound efter seriens sista MTU faller utanför och tas inte med.
+"""
+import numpy as np
+
+# Kärnans form över L MTU (normeras till summan 1 och skalas med andelen)
+KERNEL_SHAPES = {
+    "Jämn": lambda n: np.ones(n),
+    "Avtagande": lambda n: 0.5 ** np.arange(n),
+    "Triangel": lambda n: np.minimum(np.arange(1, n + 1), np.arange(n, 0, -1)).astype(float),
+}
+
+
+def rebound_kernel(fraction: float, length: int, shape: str = "Jämn") -> np.ndarray:
+    """Kärna för MTU t+1 … t+length med summan fraction (t.ex. 0.5 = halva energin återkommer)."""
+    if length <= 0 or fraction == 0:
+        return np.zeros(0)
+    weights = KERNEL_SHAPES[shape](int(length))
+    return fraction * weights / weights.sum()
+
+
+def rebound(activation, kernel) -> np.ndarray:
+    """Reboundvolym per MTU: Σ_l kernel[l−1] · activation[t−l], längs sista axeln."""
+    activation = np.asarray(activation, dtype=float)
+    out = np.zeros_like(activation)
+    n = activation.shape[-1]
+    for lag, weight in enumerate(np.asarray(kernel, dtype=float)[:n - 1], start=1):
+        out[..., lag:] += weight * activation[..., :n - lag]
+    return out
+
+
+def apply_rebound(p: dict, kernel) -> dict:
+    """
+    Parametrar med rebound efter aktiveringarna: E_cons ökar med reboundet av
+    E_akt och E_cons_up minskar med reboundet av E_akt_up. Kräver minst en
+    serie per MTU (utan tidsaxel returneras p oförändrad).
+    """
+    kernel = np.asarray(kernel, dtype=float)
+    shapes = [np.shape(v) for v in p.values() if np.ndim(v) > 0]
+    if not len(kernel) or not shapes:
+        return p
+    shape = np.broadcast_shapes(*shapes)
+    out = dict(p)
+    out["E_cons"] = p["E_cons"] + rebound(np.broadcast_to(p["E_akt"], shape), kernel)
+    out["E_cons_up"] = p["E_cons_up"] - rebound(np.broadcast_to(p["E_akt_up"], shape), kernel)
+    return out
@@ -0,0 +1,213 @@
+"""
+Lokal HTTP-tjänst runt avräkningsmotorn (engine.py) för andra interna system.
+
+Kör:
+    python server.py --port 8765 --workers 4
+
+Endpoints:
+    GET  /health       – "ok"
+    GET  /scenarios    – scenarier, standardparametrar och checkbox-parametrar
+    POST /settle       – batch-avräkning, se nedan
+
+POST /settle tar JSON:
+    {
+      "params":    [{"P_DA": 40.0, "P_IMB": [55.0, 61.2, ...], ...}, ...],
+      "scenarios": ["1a", "5a", ...],      # valfritt, default alla
+      "target":    "5a",                   # valfritt
+      "actors":    ["Sammanställning"],    # valfritt, default BRP, BSP, RE och Sammanställning
+      "format":    "json" | "arrow",       # valfritt, alternativt Accept-header
+      "check":     true                    # valfritt, kontrollera bokföringsidentiteterna
+    }
+Varje uppsättning i "params" kan ha skalärer eller lika långa MTU-serier.
+Saknade parametrar tas från standardvärdena (som appens sidopanel), så
+P_COMP, P_PEN och P_RECOMP används bara om use_imb_for_comp, use_imb_for_pen
+respektive re_comp_is_da sätts till false.
+Med "exact": true (samma i alla uppsättningar) är resultaten heltal i kWh,
+cent/MWh och cent.
+Svaret har en rad per (uppsättning, MTU): "set" och "mtu" anger raden och
+"results"[scenario][aktör][fält] är en lista med ett värde per rad.
+Arrow-svaret är en IPC-ström i långt format med kolumnen "scenario".
+Med "check" får JSON-svaret "violations" (lista med avvikande rader, "Rad" är
+index i "set"/"mtu") och Arrow-svaret antalet i schemats metadata.
+Fel ger {"error": ...}: 400 för ogiltig begäran (t.ex. okänt scenario eller
+målscenario), 500 för oväntade fel i avräkningen.
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from engine import ACTORS, DEFAULT_PARAMS, FLAG_PARAMS, SCENARIO_SPECS, SCENARIOS, TARGET_SCENARIO, settle_batch
+from invariants import check_invariants
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+MAX_BODY_BYTES = 256 * 1024 * 1024
+
+
+def _json_list(a: np.ndarray) -> list:
+    # NaN (ej tillämpligt, t.ex. BRP+BSP när BRP≠BSP) blir null
+    if np.isnan(a).any():
+        return [None if np.isnan(v) else v for v in a.tolist()]
+    return a.tolist()
+
+
+def _encode_json(set_idx, mtu_idx, results, violations=None) -> bytes:
+    body = {
+        "set": set_idx.tolist(),
+        "mtu": mtu_idx.tolist(),
+        "results": {
+            k: {actor: {f: _json_list(v) for f, v in fields.items()} for actor, fields in by_actor.items()}
+            for k, by_actor in results.items()
+        },
+    }
+    if violations is not None:
+        body["violations"] = violations.to_dict(orient="records")
+    return json.dumps(body, ensure_ascii=False).encode("utf-8")
+
+
+def _encode_arrow(set_idx, mtu_idx, results, violations=None) -> bytes:
+    import pyarrow as pa
+
+    tables = []
+    for k, by_actor in results.items():
+        scenario = pa.DictionaryArray.from_arrays(np.zeros(len(set_idx), dtype=np.int32), [k])
+        cols = {"set": set_idx, "mtu": mtu_idx, "scenario": scenario}
+        for actor, fields in by_actor.items():
+            for f, v in fields.items():
+                # Ej tillämpligt i scenariot (bara NaN) blir null, så att heltalskolumner
+                # från andra scenarier inte behöver bli float
+                cols[f"{actor}: {f}"] = pa.nulls(len(v)) if v.dtype.kind == "f" and np.isnan(v).all() else v
+        tables.append(pa.table(cols))
+    table = pa.concat_tables(tables, promote_options="default") if tables else pa.table({})
+    if violations is not None:
+        table = table.replace_schema_metadata({"violations": str(len(violations))})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def handle_settle(body: bytes, accept: str):
+    """Körs i arbetsprocessen: tolkar, avräknar och kodar svaret. Returnerar (status, content-type, bytes)."""
+    try:
+        return _settle_response(body, accept)
+    except Exception as exc:
+        # Oväntade fel (t.ex. felformade arrayer) ger 500 i stället för ett stängt anslutningsförsök utan svar
+        msg = f"internt fel: {type(exc).__name__}: {exc}"
+        return 500, "application/json", json.dumps({"error": msg}, ensure_ascii=False).encode("utf-8")
+
+
+def _settle_response(body: bytes, accept: str):
+    try:
+        req = json.loads(body)
+        param_sets = req["params"]
+        if not isinstance(param_sets, list):
+            raise ValueError('"params" måste vara en lista')
+        scenarios = req.get("scenarios") or list(SCENARIOS)
+        target = req.get("target", TARGET_SCENARIO)
+        if not isinstance(scenarios, list):
+            raise ValueError('"scenarios" måste vara en lista')
+        unknown = [str(k) for k in scenarios if k not in SCENARIOS]
+        if unknown:
+            raise ValueError(f"Okända scenarier: {', '.join(unknown)}")
+        if target not in SCENARIOS:
+            raise ValueError(f"Okänt målscenario: {target}")
+        fmt = req.get("format") or ("arrow" if ARROW_MIME in (accept or "") else "json")
+        if fmt not in ("json", "arrow"):
+            raise ValueError(f"Okänt format: {fmt}")
+        actors = req.get("actors") or list(ACTORS)
+        unknown = set(actors) - set(ACTORS)
+        if unknown:
+            raise ValueError(f"Okända aktörer: {', '.join(sorted(unknown))}")
+        set_idx, mtu_idx, results = settle_batch(param_sets, scenarios, target)
+        violations = None
+        if req.get("check"):
+            # exact är samma i alla uppsättningar (settle_batch kräver det); flaggvillkorade
+            # identiteter kan bara kontrolleras om alla uppsättningar har samma flaggor (None = hoppa över)
+            flags = {tuple(bool(ps.get(f, DEFAULT_PARAMS[f])) for f in FLAG_PARAMS) for ps in param_sets}
+            check_params = dict(zip(FLAG_PARAMS, flags.pop() if len(flags) == 1 else [None] * len(FLAG_PARAMS)))
+            check_params["exact"] = bool(param_sets and param_sets[0].get("exact", DEFAULT_PARAMS["exact"]))
+            # Utan uppsättningar finns inga fält att kontrollera
+            violations = check_invariants(results if param_sets else {}, check_params)
+        results = {k: {a: by_actor[a] for a in actors} for k, by_actor in results.items()}
+    except (KeyError, TypeError, ValueError) as exc:
+        msg = f"saknar fältet {exc}" if isinstance(exc, KeyError) else str(exc)
+        return 400, "application/json", json.dumps({"error": msg}, ensure_ascii=False).encode("utf-8")
+
+    if fmt == "arrow":
+        try:
+            return 200, ARROW_MIME, _encode_arrow(set_idx, mtu_idx, results, violations)
+        except ImportError:
+            return 406, "application/json", b'{"error": "pyarrow saknas"}'
+    return 200, "application/json", _encode_json(set_idx, mtu_idx, results, violations)
+
+
+class SettlementHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 ger keep-alive så länge Content-Length alltid sätts
+    protocol_version = "HTTP/1.1"
+    pool: ProcessPoolExecutor = None
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, "text/plain", b"ok")
+        elif self.path == "/scenarios":
+            info = {
+                "scenarios": SCENARIO_SPECS,
+                "target": TARGET_SCENARIO,
+                "default_params": DEFAULT_PARAMS,
+                "flag_params": FLAG_PARAMS,
+            }
+            self._send(200, "application/json", json.dumps(info, ensure_ascii=False).encode("utf-8"))
+        else:
+            self._send(404, "application/json", b'{"error": "not found"}')
+
+    def do_POST(self):
+        if self.path != "/settle":
+            self._send(404, "application/json", b'{"error": "not found"}')
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._send(413 if length > 0 else 411, "application/json", b'{"error": "ogiltig Content-Length"}')
+            return
+        body = self.rfile.read(length)
+        status, content_type, payload = self.pool.submit(handle_settle, body, self.headers.get("Accept")).result()
+        self._send(status, content_type, payload)
+
+    def log_message(self, format, *args):
+        # Ingen loggrad per anrop vid hög genomströmning
+        pass
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, workers: int = None):
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        SettlementHandler.pool = pool
+        httpd = ThreadingHTTPServer((host, port), SettlementHandler)
+        httpd.daemon_threads = True
+        print(f"Avräkningstjänst på http://{host}:{port} ({workers} arbetsprocesser)")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokal HTTP-tjänst för BRP/BSP/RE-avräkning")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=None, help="antal arbetsprocesser (default: antal kärnor)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers)
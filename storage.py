@@ -0,0 +1,99 @@
+"""
+Batterier som flexibel resurs: leverans begränsad av laddningsnivå (SoC).
+
+Begärd aktivering per MTU (MWh, + = uppreglering/urladdning, − = nedreglering/
+laddning) görs om till levererbar volym givet energikapacitet, effektgräns
+och verkningsgrad. Laddningsnivån beror på alla tidigare MTU, så simuleringen
+är en sekventiell genomgång av tidsaxeln – men varje steg räknas för alla
+batterier på en gång (batterier × MTU), så ett år (35 040 MTU) för många
+enheter tar ungefär lika lång tid som för en.
+
+Modell per MTU (dt = 0,25 h):
+    urladdning  ≤ min(begärd, effekt·dt, (SoC − min)·η)
+    laddning    ≤ min(begärd, effekt·dt, (max − SoC)/η)
+med η = √(verkningsgrad tur och retur) i vardera riktningen. Med restore
+återställs laddningsnivån mot startnivån i MTU utan aktivering (inom
+effektgränsen, utanför avräkningen).
+
+storage_params() lägger in resultatet i motorn: begärd volym blir E_bud och
+levererad E_akt (A-sidan, uppreglering) respektive E_bud_up/E_akt_up
+(B-sidan, nedreglering). Underleveransen går därmed genom den vanliga
+vägen för under-/överleverans (apply_penalty, P_PEN) i budbaserade scenarier
+och sänker ersättningen i de aktiveringsbaserade.
+"""
+import numpy as np
+
+MTU_HOURS = 0.25
+
+# Standardvärden för ett batteri (MWh, MW, andelar)
+BATTERY_DEFAULTS = {
+    "capacity": 10.0,
+    "power": 5.0,
+    "efficiency": 0.9,
+    "soc0": 0.5,
+    "soc_min": 0.0,
+    "soc_max": 1.0,
+    "restore": True,
+}
+
+
+def simulate_storage(requested, capacity, power, efficiency=0.9, soc0=0.5, soc_min=0.0, soc_max=1.0,
+                     restore: bool = True, dt: float = MTU_HOURS) -> tuple:
+    """
+    Levererad volym och laddningsnivå för begärda aktiveringar. requested:
+    (MTU,) eller (batterier, MTU) i MWh; batteriparametrarna skalärer eller
+    en per batteri (andelar av capacity för soc*). Returnerar
+    (levererad, SoC i MWh efter varje MTU), båda med samma form som requested.
+    """
+    req = np.asarray(requested, dtype=float)
+    shape = req.shape
+    req = np.atleast_2d(req)
+    n_units = req.shape[0]
+
+    def per_unit(x):
+        return np.broadcast_to(np.asarray(x, dtype=float), (n_units,)).copy()
+
+    capacity = per_unit(capacity)
+    e_min, e_max, e_start = per_unit(soc_min) * capacity, per_unit(soc_max) * capacity, per_unit(soc0) * capacity
+    p_max = per_unit(power) * dt
+    eta = np.sqrt(per_unit(efficiency))
+
+    # Tidsaxeln först så att varje steg läser och skriver sammanhängande minne
+    req_t = np.ascontiguousarray(req.T)
+    delivered = np.empty_like(req_t)
+    soc_t = np.empty_like(req_t)
+    soc = e_start.copy()
+    for t in range(req_t.shape[0]):
+        r = req_t[t]
+        out = np.minimum(np.minimum(np.maximum(r, 0.0), p_max), np.maximum(soc - e_min, 0.0) * eta)
+        into = np.minimum(np.minimum(np.maximum(-r, 0.0), p_max), np.maximum(e_max - soc, 0.0) / eta)
+        soc = soc - out / eta + into * eta
+        if restore:
+            soc = np.where(r == 0.0, soc + np.clip(e_start - soc, -p_max, p_max), soc)
+        delivered[t] = out - into
+        soc_t[t] = soc
+    return delivered.T.reshape(shape), soc_t.T.reshape(shape)
+
+
+def storage_params(p: dict, battery: dict, n_mtu: int = None) -> dict:
+    """
+    Parametrar där E_akt och E_akt_up är vad batteriet kan leverera av E_bud
+    (uppreglering) respektive E_bud_up (nedreglering). A- och B-sidan är
+    alternativa förlopp och simuleras som två batterier i samma genomgång.
+    battery: nycklar ur BATTERY_DEFAULTS (skalärer eller en per batteri, då
+    med E_bud/E_bud_up av formen (batterier, MTU)).
+    """
+    b = {**BATTERY_DEFAULTS, **battery}
+    out_shape = np.broadcast_shapes(np.shape(p["E_bud"]), np.shape(p["E_bud_up"]), (n_mtu,) if n_mtu else ())
+    shape = out_shape or (1,)       # skalärer: en enda MTU
+    up = np.broadcast_to(np.asarray(p["E_bud"], dtype=float), shape)
+    down = np.broadcast_to(np.asarray(p["E_bud_up"], dtype=float), shape)
+    units = {k: np.concatenate([np.ravel(b[k])] * 2) if np.ndim(b[k]) else b[k] for k in BATTERY_DEFAULTS}
+    requested = np.concatenate([up.reshape(-1, shape[-1]), -down.reshape(-1, shape[-1])])
+    delivered, _ = simulate_storage(requested, **units)
+    half = len(requested) // 2
+    return {
+        **p,
+        "E_akt": delivered[:half].reshape(out_shape),
+        "E_akt_up": -delivered[half:].reshape(out_shape),
+    }
@@ -0,0 +1,187 @@
+"""
+Lokal kolumnlagring för pris- och mätserier.
+
+En CSV konverteras en gång till ett segment: en .npy-fil per kolumn plus en
+tidskolumn (int64, ns sedan epoch). index.json listar segmenten per elområde,
+anläggning och tidsintervall. Läsning sker via minnesmappning (np.load med
+mmap_mode="r"), så bara de sidor som ligger i det valda datumintervallet läses
+från disk – även för tioåriga dataset.
+
+Tider lagras naiva: tider med tidszon räknas om till UTC. Överlappande segment
+(samma CSV konverterad två gånger eller överlappande filer) är tillåtna; vid
+läsning gäller det senast konverterade segmentets värde för varje tid. En
+kolumn som saknas i något av de lästa segmenten ingår inte i resultatet
+(list-kommandot visar sådana kolumner).
+
+Konvertera:
+    python store.py convert priser_2024.csv --area SE3 --site anl1 --store data/store
+Lista:
+    python store.py list --store data/store
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from timeseries import read_series_csv
+
+DEFAULT_STORE = os.environ.get("BSP_STORE", os.path.join("data", "store"))
+INDEX_FILE = "index.json"
+TIME_FILE = "tid.npy"
+
+
+def load_index(store_dir: str = DEFAULT_STORE) -> list:
+    """Segmentlistan i index.json (tom lista om lagringen saknas)."""
+    path = os.path.join(store_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["segments"]
+
+
+def _save_index(store_dir: str, segments: list):
+    tmp = os.path.join(store_dir, INDEX_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"segments": segments}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(store_dir, INDEX_FILE))
+
+
+def _naive(ts) -> pd.Timestamp:
+    # Tider med tidszon som naiv UTC, samma tidsaxel som i tid.npy
+    ts = pd.Timestamp(ts)
+    return ts.tz_convert("UTC").tz_localize(None) if ts.tz is not None else ts
+
+
+def convert_csv(csv_path: str, area: str, site: str, store_dir: str = DEFAULT_STORE) -> dict:
+    """Konverterar en CSV (samma format som tidsserie-uppladdningen) till ett nytt segment."""
+    frame = read_series_csv(csv_path)
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        raise ValueError("CSV:n måste ha en tidskolumn (tid/time/timestamp) för att kunna lagras")
+    if frame.index.tz is not None:
+        frame.index = frame.index.tz_convert("UTC").tz_localize(None)
+    # Dubbletter inom filen: sista raden gäller
+    frame = frame.sort_index(kind="stable")
+    frame = frame[~frame.index.duplicated(keep="last")]
+    if frame.empty:
+        raise ValueError(f"{csv_path}: CSV:n har inga rader att lagra")
+
+    segments = load_index(store_dir)
+    seg_no = sum(1 for s in segments if s["area"] == area and s["site"] == site)
+    rel_dir = os.path.join(area, site, f"{seg_no:04d}")
+    seg_dir = os.path.join(store_dir, rel_dir)
+    os.makedirs(seg_dir, exist_ok=True)
+
+    np.save(os.path.join(seg_dir, TIME_FILE), frame.index.as_unit("ns").asi8)
+    for col in frame.columns:
+        np.save(os.path.join(seg_dir, f"{col}.npy"), frame[col].to_numpy(dtype=float))
+
+    segment = {
+        "area": area,
+        "site": site,
+        "start": frame.index[0].isoformat(),
+        "end": frame.index[-1].isoformat(),
+        "n": len(frame),
+        "columns": list(frame.columns),
+        "dir": rel_dir,
+    }
+    _save_index(store_dir, segments + [segment])
+    return segment
+
+
+def list_series(store_dir: str = DEFAULT_STORE) -> dict:
+    """
+    (område, anläggning) → (första tid, sista tid, kolumner) över alla segment.
+    Kolumnerna är de som finns i alla segment, dvs. de som open_series ger för
+    hela tidsintervallet (se partial_columns för övriga).
+    """
+    out = {}
+    for s in load_index(store_dir):
+        key = (s["area"], s["site"])
+        start, end = _naive(s["start"]), _naive(s["end"])
+        if key in out:
+            start, end = min(start, out[key][0]), max(end, out[key][1])
+            cols = sorted(set(out[key][2]) & set(s["columns"]))
+        else:
+            cols = s["columns"]
+        out[key] = (start, end, cols)
+    return out
+
+
+def partial_columns(area: str, site: str, store_dir: str = DEFAULT_STORE) -> list:
+    """Kolumner som bara finns i en del av segmenten; open_series ger dem inte om intervallet rör ett segment utan dem."""
+    segments = [set(s["columns"]) for s in load_index(store_dir) if s["area"] == area and s["site"] == site]
+    return sorted(set.union(*segments) - set.intersection(*segments)) if segments else []
+
+
+def open_series(area: str, site: str, start=None, end=None, store_dir: str = DEFAULT_STORE):
+    """
+    Läser [start, end] för en anläggning via minnesmappning. Endast segment som
+    överlappar intervallet öppnas, och bara det relevanta utsnittet kopieras.
+    Returnerar (DatetimeIndex, {kolumn: ndarray}) med stigande, unika tider.
+    Bara kolumner som finns i alla segment som överlappar intervallet ingår.
+    """
+    start = _naive(start) if start is not None else None
+    end = _naive(end) if end is not None else None
+
+    segments = [
+        s for s in load_index(store_dir)
+        if s["area"] == area and s["site"] == site
+        and not (end is not None and _naive(s["start"]) > end)
+        and not (start is not None and _naive(s["end"]) < start)
+    ]
+    # Endast kolumner som finns i alla berörda segment
+    columns = sorted(set.intersection(*[set(s["columns"]) for s in segments])) if segments else []
+
+    parts_t, parts = [], []
+    # Segmenten i konverteringsordning (index.json), så att senare segment vinner vid överlapp
+    for s in segments:
+        seg_dir = os.path.join(store_dir, s["dir"])
+        t = np.load(os.path.join(seg_dir, TIME_FILE), mmap_mode="r")
+        lo = int(np.searchsorted(t, start.value)) if start is not None else 0
+        hi = int(np.searchsorted(t, end.value, side="right")) if end is not None else len(t)
+        if hi <= lo:
+            continue
+        parts_t.append(np.asarray(t[lo:hi]))
+        parts.append({
+            c: np.asarray(np.load(os.path.join(seg_dir, f"{c}.npy"), mmap_mode="r")[lo:hi])
+            for c in columns
+        })
+
+    if not parts:
+        return pd.DatetimeIndex([], name="Tid"), {c: np.empty(0) for c in columns}
+    t = np.concatenate(parts_t)
+    values = {c: np.concatenate([p[c] for p in parts]) for c in columns}
+    if len(t) > 1 and not (np.diff(t) > 0).all():
+        # Segment i annan ordning eller överlappande: sortera stabilt på tid och behåll sista
+        # förekomsten, dvs. värdet från det senast konverterade segmentet
+        order = np.argsort(t, kind="stable")
+        t = t[order]
+        keep = np.append(t[1:] != t[:-1], True)
+        t = t[keep]
+        values = {c: v[order][keep] for c, v in values.items()}
+    index = pd.DatetimeIndex(t.view("datetime64[ns]"), name="Tid")
+    return index, values
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lokal kolumnlagring för pris- och mätserier")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    conv = sub.add_parser("convert", help="konvertera en CSV till ett nytt segment")
+    conv.add_argument("csv")
+    conv.add_argument("--area", required=True, help="elområde, t.ex. SE3")
+    conv.add_argument("--site", required=True, help="anläggning/mätpunkt")
+    conv.add_argument("--store", default=DEFAULT_STORE)
+    lst = sub.add_parser("list", help="lista lagrade serier")
+    lst.add_argument("--store", default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        seg = convert_csv(args.csv, args.area, args.site, args.store)
+        print(f"{seg['area']}/{seg['site']}: {seg['n']:,} MTU {seg['start']} – {seg['end']} ({', '.join(seg['columns'])})")
+    else:
+        for (area, site), (start, end, cols) in sorted(list_series(args.store).items()):
+            partial = partial_columns(area, site, args.store)
+            note = f"; saknas i vissa segment och läses inte: {', '.join(partial)}" if partial else ""
+            print(f"{area}/{site}: {start} – {end} ({', '.join(cols)}{note})")
@@ -0,0 +1,213 @@
+"""
+Tariffmotor: slutkundspris per kund enligt kundens avtal.
+
+Motorns RE räknar ett gemensamt "Slutkundens elpris" (kostnadsbaserat eller
+P_DA). Här prissätts varje kunds förbrukning per MTU enligt avtalet:
+
+    Fast         pris = Pris
+    Spot         pris = P_DA + Påslag
+    Tidstariff   pris = Topppris under topplasttid, annars Pris
+    Kostnad      pris = RE:s snittpris för inköp i scenariot + Påslag
+
+Kundens förbrukning är dess andel av RE:s fakturerade volym per MTU
+(typprofil). Varje avtal är affint i en basserie per avtalsklass,
+pris_c(t) = fast_c + lutning_c · bas_klass(t), så kundens kostnad i ett
+scenario är andel_c · (fast_c · Σ volym + lutning_c · Σ volym · bas_klass).
+Summorna räknas en gång per scenario och avtalsklass och hämtas per kund med
+klasskoden – ingen loop över kunder och ingen matris kunder × MTU.
+
+Neutraliseringen räknas per kund mot målscenariot: merkostnad = kundens
+volym × (kundens snittpris − kundens snittpris i målscenariot) och
+kompensationsbehov max(0, merkostnad) (signerat med omvänd neutralisering)
+per kund över perioden. Kunder med fast pris eller tidstariff får samma pris
+i alla scenarier och neutraliseras därför inte; merkostnaden stannar hos RE.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import TARGET_SCENARIO, _comp_need, _safe_div, from_exact
+
+# Avtalsklasser i kodordning
+CONTRACTS = ("Fast", "Spot", "Tidstariff", "Kostnad")
+# Avtal i kundfilen (gemener) → avtalsklass
+CONTRACT_NAMES = {
+    "fast": "Fast", "fixed": "Fast",
+    "spot": "Spot", "rörligt": "Spot",
+    "tidstariff": "Tidstariff", "tou": "Tidstariff", "time-of-use": "Tidstariff",
+    "kostnad": "Kostnad", "cost": "Kostnad",
+}
+# Kolumnnamn i kundfilen (gemener) → kolumn
+CUSTOMER_COLUMNS = {
+    "kund": "Kund", "customer": "Kund",
+    "avtal": "Avtal", "contract": "Avtal",
+    "andel": "Andel", "share": "Andel", "förbrukning": "Andel",
+    "pris": "Pris", "price": "Pris",
+    "topppris": "Topppris", "peak_price": "Topppris",
+    "påslag": "Påslag", "margin": "Påslag",
+}
+PRICE_COLUMNS = ("Pris", "Topppris", "Påslag")
+
+# Topplasttid för tidstariffer: vardagar kl. 06–22
+PEAK_HOURS = (6, 22)
+MTU_PER_DAY = 96
+
+# Totalraden i tariff_summary()
+ALL_CONTRACTS = "Alla avtal"
+
+
+def customer_table(customers, contracts, shares=None, price=0.0, peak_price=0.0, margin=0.0) -> pd.DataFrame:
+    """
+    Kundtabell (index Kund) med Avtal (klass ur CONTRACTS), Andel av RE:s
+    volym (normerad till summan 1) och avtalspriserna Pris, Topppris, Påslag
+    (skalärer eller en per kund, €/MWh).
+    """
+    contracts = pd.Categorical(contracts, categories=CONTRACTS)
+    if contracts.isna().any():
+        raise ValueError(f"Okänt avtal (förväntar {', '.join(CONTRACTS)})")
+    n = len(contracts)
+    shares = np.ones(n) if shares is None else np.asarray(shares, dtype=float)
+    if (shares < 0).any() or shares.sum() <= 0:
+        raise ValueError("Andelarna måste vara icke-negativa och inte alla noll")
+    df = pd.DataFrame({
+        "Avtal": contracts,
+        "Andel": shares / shares.sum(),
+        "Pris": np.broadcast_to(np.asarray(price, dtype=float), (n,)),
+        "Topppris": np.broadcast_to(np.asarray(peak_price, dtype=float), (n,)),
+        "Påslag": np.broadcast_to(np.asarray(margin, dtype=float), (n,)),
+    }, index=pd.Index(customers, name="Kund"))
+    if not df.index.is_unique:
+        raise ValueError("Kunderna måste vara unika")
+    return df
+
+
+def read_customers(buf) -> pd.DataFrame:
+    """
+    Läser kunder och avtal (CSV: kund, avtal, valfritt andel/förbrukning,
+    pris, topppris och påslag; en rad per kund). Saknad andel = lika delar,
+    saknade priser = 0.
+    """
+    raw = pd.read_csv(buf, sep=None, engine="python", dtype=str)
+    raw = raw.rename(columns={c: CUSTOMER_COLUMNS.get(c.strip().lower(), c.strip()) for c in raw.columns})
+    missing = [c for c in ("Kund", "Avtal") if c not in raw.columns]
+    if missing:
+        raise ValueError(f"Kundfilen saknar kolumner: {', '.join(missing)}")
+
+    contracts = raw["Avtal"].str.strip().str.lower().map(CONTRACT_NAMES)
+    if contracts.isna().any():
+        bad = sorted(set(raw.loc[contracts.isna(), "Avtal"].astype(str)))
+        raise ValueError(f"Okänt avtal: {', '.join(bad[:5])} (förväntar {', '.join(CONTRACTS)})")
+
+    def numeric(c):
+        return pd.to_numeric(raw[c].str.replace(",", ".", regex=False).str.strip(), errors="raise").fillna(0.0)
+
+    return customer_table(
+        raw["Kund"].str.strip(), contracts, numeric("Andel") if "Andel" in raw.columns else None,
+        *(numeric(c) if c in raw.columns else 0.0 for c in PRICE_COLUMNS),
+    )
+
+
+def peak_mask(index: pd.Index, hours: tuple = PEAK_HOURS) -> np.ndarray:
+    """Topplasttid per MTU: vardagar inom hours för tidsindex, annars MTU-nummer räknat från midnatt."""
+    if isinstance(index, pd.DatetimeIndex):
+        return np.asarray((index.hour >= hours[0]) & (index.hour < hours[1]) & (index.dayofweek < 5))
+    hour = np.arange(len(index)) % MTU_PER_DAY // 4
+    return (hour >= hours[0]) & (hour < hours[1])
+
+
+def _contract_terms(customers: pd.DataFrame) -> tuple:
+    # pris_c(t) = fast_c + lutning_c · bas_klass(t); basserierna i CONTRACTS-ordning
+    code = customers["Avtal"].cat.codes.to_numpy()
+    price, peak, margin = (customers[c].to_numpy(dtype=float) for c in PRICE_COLUMNS)
+    fixed = np.choose(code, [price, margin, price, margin])
+    slope = np.choose(code, [np.zeros(len(code)), np.ones(len(code)), peak - price, np.ones(len(code))])
+    return code, fixed, slope
+
+
+def customer_settlement(results: dict, customers: pd.DataFrame, peak=True, target: str = TARGET_SCENARIO,
+                        allow_reverse: bool = False, exact: bool = False) -> dict:
+    """
+    Kostnad och neutralisering per scenario och kund. results: scenario →
+    aktör → fält (by_actor), skalärer eller en axel per MTU; peak:
+    topplasttid per MTU (peak_mask) eller skalär. Returnerar nycklar samt
+    arrayer (scenarier, kunder): Volym, Kundkostnad, Snittpris, Ökad
+    totalkostnad slutkund och Neutralisering.
+    """
+    keys = list(results)
+    if target not in results:
+        raise KeyError(f"Målscenariot {target} är inte avräknat")
+
+    def field(k, actor, name):
+        fields = results[k][actor]
+        return from_exact({name: fields[name]})[name] if exact else np.asarray(fields[name], dtype=float)
+
+    volume = [field(k, "RE", "Volym som faktureras slutkund") for k in keys]
+    cost_price = [field(k, "RE", "Snittpris för inköp el som kan faktureras") for k in keys]
+    p_da = [field(k, "BRP", "DA Pris") for k in keys]
+    shape = np.broadcast_shapes(*[np.shape(v) for v in volume + cost_price + p_da], np.shape(peak))
+    if len(shape) > 1:
+        raise ValueError("Tariffmotorn kräver skalärer eller en serie per MTU")
+
+    def stack(values):
+        return np.stack([np.broadcast_to(v, shape) for v in values]).reshape(len(keys), -1)
+
+    vol = stack(volume)
+    # Basserier per avtalsklass (klasser, scenarier, MTU): Fast 0, Spot P_DA, Tidstariff topplasttid, Kostnad snittpris
+    bases = np.stack([
+        np.zeros_like(vol), stack(p_da), np.broadcast_to(np.asarray(peak, dtype=float), vol.shape), stack(cost_price),
+    ])
+    total_vol = vol.sum(axis=1)                         # (scenarier,)
+    class_sums = (vol * bases).sum(axis=2)              # (klasser, scenarier)
+
+    code, fixed, slope = _contract_terms(customers)
+    share = customers["Andel"].to_numpy(dtype=float)
+    volume_c = share * total_vol[:, None]
+    cost_c = share * (fixed * total_vol[:, None] + slope * class_sums[code].T)
+    price_c = _safe_div(cost_c, volume_c)
+
+    extra = cost_c - volume_c * price_c[keys.index(target)]
+    return {
+        "keys": keys,
+        "Volym": volume_c,
+        "Kundkostnad": cost_c,
+        "Snittpris": price_c,
+        "Ökad totalkostnad slutkund": extra,
+        "Neutralisering": _comp_need(extra, allow_reverse),
+    }
+
+
+def tariff_summary(settlement: dict, customers: pd.DataFrame) -> dict:
+    """
+    Summor per scenario och avtalsklass med np.bincount över klasskoderna.
+    Returnerar scenario → avtalsklass (CONTRACTS + ALL_CONTRACTS) → fält
+    (som assets.TARIFF_ROW_SPECS); klasser utan kunder utelämnas.
+    """
+    keys = settlement["keys"]
+    code = customers["Avtal"].cat.codes.to_numpy()
+    n_classes, n_keys = len(CONTRACTS), len(keys)
+    cell = (np.arange(n_keys)[:, None] * n_classes + code).ravel()
+
+    def grouped(values):
+        sums = np.bincount(cell, weights=np.ravel(values), minlength=n_keys * n_classes).reshape(n_keys, n_classes)
+        return np.concatenate([sums, sums.sum(axis=1, keepdims=True)], axis=1)
+
+    counts = grouped(np.ones((n_keys, len(code))))
+    volume = grouped(settlement["Volym"])
+    cost = grouped(settlement["Kundkostnad"])
+    fields = {
+        "Kunder": counts,
+        "Volym": volume,
+        "Kundkostnad enligt avtal": cost,
+        "Snittpris": _safe_div(cost, volume),
+        "Ökad totalkostnad slutkund": grouped(settlement["Ökad totalkostnad slutkund"]),
+        "Neutralisering per kund": grouped(settlement["Neutralisering"]),
+        # Merkostnad = minst en cent
+        "Kunder med merkostnad": grouped(np.round(settlement["Ökad totalkostnad slutkund"], 2) > 0),
+    }
+    labels = [*CONTRACTS, ALL_CONTRACTS]
+    return {
+        k: {
+            label: {f: v[i, j] for f, v in fields.items()}
+            for j, label in enumerate(labels) if counts[i, j] > 0
+        }
+        for i, k in enumerate(keys)
+    }
@@ -0,0 +1,58 @@
+from io import StringIO
+
+import numpy as np
+import pytest
+
+from backtest import backtest, backtest_report, backtest_sketch, read_activation_log
+from engine import DEFAULT_PARAMS
+
+# Standardparametrar: V_DA 100 MWh, P_DA 2, P_IMB 5, P_RECOMP 2 €/MWh
+LOG = """tid;riktning;e_bud;e_akt
+2024-01-01 00:00;upp;10;8
+2024-01-01 01:00;ned;10;8
+2024-01-01 02:00;upp;6;6
+2024-01-02 00:00;ned;5;4
+"""
+
+
+@pytest.fixture
+def log():
+    return read_activation_log(StringIO(LOG))
+
+
+def test_backtest_hand_example(log):
+    results = backtest(DEFAULT_PARAMS, log)
+    summary = {n: results[n]["Sammanställning"] for n in results}
+    # Rad 1–2 är standardfallet (8 MWh levererat, förbrukning 100 ∓ 8 MWh), som i baslinjen
+    assert results["5"]["BSP"]["BSP nettoresultat"][:2].tolist() == pytest.approx([24, 40])
+    assert results["3"]["BSP"]["BSP nettoresultat"].tolist() == pytest.approx([40, 40, 30, 20])
+    # Målscenariot neutraliserar aldrig sig självt, inte heller på nedregleringsrader
+    assert summary["5"]["Neutralisering"].tolist() == pytest.approx([0, 0, 0, 0])
+    # 3a mot 5a: (200 − 94·2) = 12 EUR för 6 MWh; 2b mot 5b: 210 − 112·200/108
+    assert summary["3"]["Neutralisering"].tolist() == pytest.approx([16, 0, 12, 0])
+    assert summary["2"]["Neutralisering"][1] == pytest.approx(210 - 112 * 200 / 108)
+
+
+def test_missing_consumption_follows_delivered_volume(log):
+    results = backtest(DEFAULT_PARAMS, log)
+    # Förbrukningen räknas som V_DA ∓ E_akt, inte sidopanelens 92/108 MWh
+    assert results["3"]["RE"]["Volym som faktureras slutkund"].tolist() == pytest.approx([92, 108, 94, 104])
+
+
+def test_report_sums_per_day(log):
+    report = backtest_report(log, backtest(DEFAULT_PARAMS, log), "Dygn", scenarios=["3"])
+    assert report["Period"].tolist() == ["2024-01-01", "2024-01-02"]
+    assert report["Aktiveringar"].tolist() == [3, 1]
+    assert report["Neutralisering"].tolist() == pytest.approx([28, 0])
+    assert report["Levererad volym"].tolist() == pytest.approx([22, 4])
+
+
+def test_sketch_blocks_match_full_backtest(log):
+    sketch = backtest_sketch(DEFAULT_PARAMS, log, actors=["Sammanställning"], rows=3)
+    full = backtest(DEFAULT_PARAMS, log)
+    stats = sketch.describe(("Antal", "Medelvärde", "Min", "Max"))
+    row = stats.loc[("3", "Sammanställning", "Neutralisering")]
+    values = full["3"]["Sammanställning"]["Neutralisering"]
+    assert row["Antal"] == 4
+    assert row["Medelvärde"] == pytest.approx(np.mean(values))
+    assert (row["Min"], row["Max"]) == pytest.approx((values.min(), values.max()))
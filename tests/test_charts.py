@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from charts import downsample_long, lttb_indices, minmax_indices
+
+
+def _series(n=10_000, seed=0):
+    rng = np.random.default_rng(seed)
+    y = np.cumsum(rng.normal(size=n))
+    # Ensamma spikar som en jämn nedsampling skulle missa
+    y[1234], y[7777] = 500.0, -500.0
+    return y
+
+
+def test_lttb_length_and_endpoints():
+    y = _series()
+    keep = lttb_indices(np.arange(len(y), dtype=float), y, 500)
+    assert len(keep) == 500
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert np.all(np.diff(keep) > 0)
+
+
+def test_minmax_keeps_extremes():
+    y = _series()
+    keep = minmax_indices(y, 500)
+    assert len(keep) <= 502
+    assert keep[0] == 0 and keep[-1] == len(y) - 1
+    assert {1234, 7777} <= set(keep.tolist())
+    # Varje hinks min och max finns kvar
+    edges = np.linspace(0, len(y), 250 + 1).astype(int)
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        kept = y[keep[(keep >= lo) & (keep < hi)]]
+        assert kept.min() == y[lo:hi].min() and kept.max() == y[lo:hi].max()
+
+
+def test_short_series_are_kept_whole():
+    y = np.arange(10.0)
+    assert minmax_indices(y, 100).tolist() == list(range(10))
+    assert lttb_indices(y, y, 100).tolist() == list(range(10))
+
+
+def test_downsample_long_per_series():
+    index = pd.date_range("2024-01-01", periods=5_000, freq="15min", name="Tid")
+    y = _series()[:5_000]
+    long = downsample_long(index, {"3a": y, "5a": 2.0}, 200, method="minmax")
+    assert set(long["Scenario"]) == {"3a", "5a"}
+    first = long[long["Scenario"] == "3a"]
+    assert first["Värde"].max() == y.max() and first["Värde"].min() == y.min()
+    assert first["Tid"].iloc[0] == index[0] and first["Tid"].iloc[-1] == index[-1]
+    assert (long.loc[long["Scenario"] == "5a", "Värde"] == 2.0).all()
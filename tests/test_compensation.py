@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from compensation import compensation_flows, compensation_invoices, site_mapping
+
+
+@pytest.fixture
+def mapping():
+    # s1 hör till X; s2 delas lika mellan X och Y
+    return site_mapping(["s1", "s2", "s2"], ["X", "X", "Y"], [1.0, 0.5, 0.5])
+
+
+def test_flows_and_invoices_hand_example(mapping):
+    flows = compensation_flows(mapping, mtu=[0, 0, 1], site=["s1", "s2", "s2"], volume=[4.0, 2.0, 6.0],
+                               up=[True, True, False], n_mtu=2)
+    assert flows.shape == (2, 2, 2)
+    assert flows[0, 0].tolist() == pytest.approx([5, 1])      # uppreglering MTU 0: X 4 + 1, Y 1
+    assert flows[1, 1].tolist() == pytest.approx([3, 3])      # nedreglering MTU 1
+
+    prices = pd.Series({"X": 3.0, "Y": 2.0})
+    inv = compensation_invoices(mapping, flows, prices, rev_comp=True)
+    assert inv["Belopp BSP → RE"].tolist() == pytest.approx([15, 2])
+    assert inv["Belopp RE → BSP"].tolist() == pytest.approx([9, 6])
+    assert inv["Netto till RE"].tolist() == pytest.approx([6, -4])
+    assert inv["Snittpris"].tolist() == pytest.approx([3, 2])
+
+    without_reverse = compensation_invoices(mapping, flows, prices, rev_comp=False)
+    assert without_reverse["Netto till RE"].tolist() == pytest.approx([15, 2])
+    exact = compensation_invoices(mapping, flows, prices, rev_comp=True, exact=True)
+    np.testing.assert_allclose(exact["Netto till RE"], inv["Netto till RE"])
+
+
+def test_shares_must_sum_to_one():
+    with pytest.raises(ValueError):
+        site_mapping(["s1", "s1"], ["X", "Y"], [0.5, 0.4])
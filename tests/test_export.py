@@ -0,0 +1,46 @@
+import zipfile
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import DEFAULT_PARAMS, by_actor, settle, summarize
+from export import write_export
+
+SCENARIOS = {"3a": "Scenario 3a", "5a": "Scenario 5a"}
+
+
+@pytest.fixture
+def settled():
+    n = 1_000
+    index = pd.date_range("2024-01-01", periods=n, freq="15min", name="Tid")
+    rng = np.random.default_rng(0)
+    p = {**DEFAULT_PARAMS, "P_IMB": rng.uniform(-20, 200, n), "E_cons": rng.uniform(80, 120, n)}
+    s = settle(p, list(SCENARIOS))
+    return index, by_actor(s, summarize(p, s))
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_chunked_export_round_trips(settled, fmt):
+    index, results = settled
+    f = BytesIO()
+    size = write_export(f, index, results, SCENARIOS, fmt, actors=["BSP", "RE"], window=(10, 710), chunk=333)
+    assert size == len(f.getvalue())
+
+    with zipfile.ZipFile(f) as zf:
+        assert zf.namelist() == [f"BSP.{fmt}", f"RE.{fmt}"]
+        with zf.open(f"RE.{fmt}") as member:
+            df = pd.read_csv(member, parse_dates=["Tid"]) if fmt == "csv" else pd.read_parquet(BytesIO(member.read()))
+
+    # Tid för tid med scenarierna efter varandra, 700 MTU × 2 scenarier i block om 333 rader
+    assert len(df) == 1_400
+    assert df["Scenario"].tolist()[:4] == ["Scenario 3a", "Scenario 5a"] * 2
+    assert (df["Tid"].to_numpy()[::2] == index[10:710].to_numpy()).all()
+    for key, label in SCENARIOS.items():
+        rows = df[df["Scenario"] == label]
+        for field in ("Kostnad som faktureras slutkund", "Volym som faktureras slutkund"):
+            expected = np.broadcast_to(results[key]["RE"][field], (len(index),))[10:710]
+            np.testing.assert_allclose(rows[field], expected, rtol=1e-12)
+    # Textfält exporteras inte
+    assert all(isinstance(v, (int, float, np.number)) for v in df.drop(columns=["Tid", "Scenario"]).iloc[0])
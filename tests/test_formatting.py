@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+from formatting import style_by_unit
+
+
+def _cells(styler) -> list:
+    lines = styler.to_string(delimiter="|").splitlines()[1:]
+    return [line.split("|")[1:] for line in lines]
+
+
+def test_each_unit_formats_its_rows():
+    df = pd.DataFrame({
+        "Fält": ["Volym", "Pris", "Resultat", "Kapacitet", "Obalansjusteras baserat på"],
+        "3a": [1234.567, 2.5678, np.nan, 1.2345, "Bud"],
+        "5a": [10.0, 3.0, -1500.4, 7.0, "Mätning"],
+        "Enhet": ["MWh", "€/MWh", "EUR", "MW", ""],
+    })
+    assert _cells(style_by_unit(df)) == [
+        ["Volym", "1,235", "10", "MWh"],
+        ["Pris", "2.57", "3.00", "€/MWh"],
+        ["Resultat", "NA", "-1,500", "EUR"],
+        ["Kapacitet", "1.23", "7.00", "MW"],
+        ["Obalansjusteras baserat på", "Bud", "Mätning", ""],
+    ]
+
+
+def test_data_stays_numeric_and_input_unchanged():
+    df = pd.DataFrame({"Fält": ["Volym", "Regel"], "3a": [1.5, "Bud"], "Enhet": ["MWh", ""]})
+    styler = style_by_unit(df)
+    assert styler.data["3a"].dtype == float
+    assert np.isnan(styler.data.at[1, "3a"])
+    assert df.at[1, "3a"] == "Bud"
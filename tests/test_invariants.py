@@ -0,0 +1,41 @@
+import numpy as np
+
+from engine import DEFAULT_PARAMS, by_actor, settle, summarize
+from invariants import check_invariants
+
+
+def _results(p):
+    p = {**DEFAULT_PARAMS, **p}
+    settled = settle(p)
+    return by_actor(settled, summarize(p, settled))
+
+
+def test_no_violations_for_engine_results():
+    p = {"P_IMB": np.array([-10.0, 5.0, 60.0]), "E_akt": np.array([0.0, 8.0, 12.0])}
+    assert check_invariants(_results(p), {**DEFAULT_PARAMS, **p}).empty
+    assert check_invariants(_results({**p, "exact": True}), {**DEFAULT_PARAMS, **p, "exact": True}).empty
+
+
+def test_partial_params_use_default_flags():
+    # re_forward_balance_costs saknas men är True som standard
+    assert check_invariants(_results({"P_IMB": np.array([5.0, 60.0])}), {"apply_penalty": False}).empty
+
+
+def test_flag_none_skips_flag_conditioned_identities():
+    results = _results({"re_forward_balance_costs": False})
+    params = {"re_forward_balance_costs": True}
+    assert not check_invariants(results, params).empty
+    assert check_invariants(results, {"re_forward_balance_costs": None}).empty
+
+
+def test_multi_axis_results():
+    # Två axlar, t.ex. (elområde, MTU), där bara vissa fält är fullt utbredda
+    results = _results({"P_IMB": np.array([[5.0, 6.0, 7.0], [1.0, 2.0, 3.0]])})
+    assert check_invariants(results, DEFAULT_PARAMS).empty
+
+    broken = np.array(np.broadcast_to(results["5a"]["RE"]["Resultat"], (2, 3)), dtype=float)
+    broken[1, 2] += 1.0
+    results["5a"]["RE"]["Resultat"] = broken
+    violations = check_invariants(results, DEFAULT_PARAMS)
+    assert violations["Invariant"].tolist() == ["RE resultat = summa delposter"]
+    assert violations["Rad"].tolist() == [5]
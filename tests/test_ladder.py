@@ -0,0 +1,70 @@
+from io import StringIO
+
+import numpy as np
+
+from engine import DEFAULT_PARAMS
+from ladder import build_ladders, clear_ladder, ladder_params, read_bids
+from timeseries import read_series_csv
+
+
+def test_bids_by_mtu_number():
+    index = read_series_csv(StringIO("mtu;P_DA;P_IMB\n1;50;60\n2;51;61\n3;52;62\n")).index
+    ladders = read_bids(StringIO("mtu,riktning,pris,volym\n2,upp,10,5\n"), index)
+    volumes = ladders[True][1]
+    assert np.isnan(volumes[[0, 2]]).all()
+    assert volumes[1].tolist() == [5.0]
+
+
+def _ladders():
+    # MTU 0: upp 10/20/30 €/MWh à 1/2/4 MWh, ned 50/40/20 à 3/2/1 MWh (blandad inläsningsordning);
+    # MTU 1: ett uppbud; MTU 2: inga bud
+    return build_ladders(
+        mtu=[0, 0, 0, 0, 0, 0, 1],
+        up=[True, True, True, False, False, False, True],
+        price=[30, 10, 20, 20, 50, 40, 15],
+        volume=[4, 1, 2, 1, 3, 2, 5],
+        n_mtu=3,
+    )
+
+
+def test_merit_order_and_padding():
+    ladders = _ladders()
+    up_prices, up_volumes = ladders[True]
+    assert up_prices[0].tolist() == [10, 20, 30]
+    assert up_volumes[0].tolist() == [1, 2, 4]
+    assert np.isnan(up_prices[2]).all()
+    # Nedreglering i fallande pris
+    assert ladders[False][0][0].tolist() == [50, 40, 20]
+    assert ladders[False][1][0].tolist() == [3, 2, 1]
+
+
+def test_bids_at_the_balancing_price_are_activated():
+    up_prices, up_volumes = _ladders()[True]
+    # Uppreglering: pris ≤ balanspris
+    assert clear_ladder(up_prices, up_volumes, 20.0).tolist() == [3, 5, 0]
+    assert clear_ladder(up_prices, up_volumes, [9.99, 15.0, 100.0]).tolist() == [0, 5, 0]
+    down_prices, down_volumes = _ladders()[False]
+    # Nedreglering: pris ≥ balanspris, dyraste först
+    assert clear_ladder(down_prices, down_volumes, 40.0, up=False).tolist() == [5, 0, 0]
+    assert clear_ladder(down_prices, down_volumes, 0.0, up=False).tolist() == [6, 0, 0]
+    assert clear_ladder(down_prices, down_volumes, 50.01, up=False).tolist() == [0, 0, 0]
+
+
+def test_direction_without_bids():
+    ladders = build_ladders(mtu=[0, 1], up=[True, True], price=[5, 6], volume=[1, 1], n_mtu=2)
+    prices, volumes = ladders[False]
+    assert prices.shape == (2, 0)
+    assert clear_ladder(prices, volumes, 100.0, up=False).tolist() == [0, 0]
+
+
+def test_ladder_params_and_delivered_override():
+    p = {**DEFAULT_PARAMS, "P_IMB": np.array([20.0, 20.0, 20.0])}
+    out = ladder_params(p, _ladders())
+    assert out["E_bud"].tolist() == [3, 5, 0]
+    assert out["E_akt"].tolist() == [3, 5, 0]
+    assert out["E_bud_up"].tolist() == [6, 0, 0]
+    delivered = {True: np.array([2.5, 4.0, 0.0])}
+    out = ladder_params(p, _ladders(), clearing_price=40.0, delivered=delivered)
+    assert out["E_bud"].tolist() == [7, 5, 0]
+    assert out["E_akt"] is delivered[True]
+    assert out["E_bud_up"].tolist() == [5, 0, 0] and out["E_akt_up"].tolist() == [5, 0, 0]
@@ -0,0 +1,21 @@
+import numpy as np
+
+from engine import DEFAULT_PARAMS, PRICE_PARAMS, SCENARIOS, by_actor, settle, summarize
+from linear import compile_operator
+
+
+def test_operator_matches_settle():
+    params = {**DEFAULT_PARAMS, "apply_penalty": True}
+    op = compile_operator(params, SCENARIOS)
+    rng = np.random.default_rng(1)
+    prices = {c: rng.uniform(-50, 250, 20) for c in PRICE_PARAMS}
+    evaluated = op.evaluate(prices)
+
+    p = {**params, **prices}
+    settled = settle(p)
+    results = by_actor(settled, summarize(p, settled))
+    for k, actors in evaluated.items():
+        for actor, fields in actors.items():
+            for f, v in fields.items():
+                expected = np.broadcast_to(np.asarray(results[k][actor][f], dtype=float), v.shape)
+                np.testing.assert_allclose(v, expected, atol=1e-6, equal_nan=True, err_msg=f"{k} {actor} {f}")
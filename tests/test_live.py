@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import DEFAULT_PARAMS, SCENARIOS, by_actor, customer_price, reduce_results, settle, summarize
+from live import InboxFeed, LiveSettlement
+
+
+def _frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2025-01-01", periods=n, freq="15min", name="Tid")
+    return pd.DataFrame({"P_IMB": rng.uniform(-20, 200, n), "E_cons": rng.uniform(80, 120, n)}, index=index)
+
+
+def _full(frame):
+    p = {**DEFAULT_PARAMS, "P_IMB": frame["P_IMB"].to_numpy(), "E_cons": frame["E_cons"].to_numpy()}
+    settled = settle(p)
+    return customer_price(reduce_results(by_actor(settled, summarize(p, settled)), axis=-1))
+
+
+def _assert_same(live_totals, full):
+    for k in SCENARIOS:
+        for actor, fields in live_totals[k].items():
+            for f, v in fields.items():
+                assert v == pytest.approx(full[k][actor][f], abs=1e-6), (k, actor, f)
+
+
+def test_live_equals_full_settle():
+    frame = _frame(96)
+    live = LiveSettlement(DEFAULT_PARAMS)
+    for lo in range(0, 96, 10):
+        live.append(frame.iloc[lo:lo + 10])
+    _assert_same(live.totals(), _full(frame))
+
+
+def test_corrected_mtu_replaces_contribution():
+    frame = _frame(8)
+    live = LiveSettlement(DEFAULT_PARAMS)
+    live.append(frame)
+    corrected = frame.copy()
+    corrected.iloc[3, 0] = 999.0
+    assert live.append(corrected.iloc[[3]]) == 8
+    _assert_same(live.totals(), _full(corrected))
+
+
+def test_bad_inbox_file_does_not_block_later_files(tmp_path):
+    (tmp_path / "01_trasig.csv").write_text("tid;P_IMB\n2025-01-01 00:00;inte ett tal\n")
+    (tmp_path / "02_ok.csv").write_text("tid;P_IMB\n2025-01-01 00:00;55\n2025-01-01 00:15;60\n")
+    feed = InboxFeed(str(tmp_path))
+    frames = feed.poll()
+    assert len(frames) == 1 and frames[0]["P_IMB"].tolist() == [55, 60]
+    assert list(feed.errors) == ["01_trasig.csv"]
+    # Samma fil läses inte om, men felet ligger kvar tills den rättas
+    assert feed.poll() == [] and list(feed.errors) == ["01_trasig.csv"]
+    (tmp_path / "01_trasig.csv").write_text("tid;P_IMB\n2025-01-01 00:30;70\n")
+    os.utime(tmp_path / "01_trasig.csv", (1e9, 1e9))
+    assert [f["P_IMB"].tolist() for f in feed.poll()] == [[70]]
+    assert feed.errors == {}
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import parallel
+from engine import SCENARIOS, settle_batch
+from parallel import SWEEP_FIELDS, parallel_sweep, sketch_sweep, top_k_sweep
+
+T = 24
+
+
+@pytest.fixture
+def sweep():
+    rng = np.random.default_rng(0)
+    series = {"P_IMB": rng.uniform(-20, 200, T), "P_DA": rng.uniform(0, 100, T)}
+    grid = [{"P_RECOMP": float(r), "apply_penalty": bool(i % 3 == 0)}
+            for i, r in enumerate(rng.uniform(0, 50, 40))]
+    per_config = {"E_akt": rng.uniform(0, 10, (len(grid), T))}
+    return grid, series, per_config
+
+
+def _serial(grid, series, per_config, exact=False):
+    # Referens: en uppsättning per konfiguration med hela serierna, summerad över MTU
+    sets = [{**series, **cfg, "E_akt": per_config["E_akt"][i], "exact": exact} for i, cfg in enumerate(grid)]
+    set_idx, _, results = settle_batch(sets)
+    out = np.zeros((len(grid), len(SCENARIOS), len(SWEEP_FIELDS)), dtype=np.int64 if exact else float)
+    for s_i, k in enumerate(SCENARIOS):
+        for f_i, f in enumerate(SWEEP_FIELDS):
+            np.add.at(out[:, s_i, f_i], set_idx, results[k]["Sammanställning"][f])
+    return out
+
+
+def test_parallel_sweep_matches_settle_batch(sweep):
+    grid, series, per_config = sweep
+    expected = _serial(grid, series, per_config)
+    np.testing.assert_allclose(parallel_sweep(grid, series, per_config, workers=2), expected, rtol=1e-12)
+    np.testing.assert_allclose(parallel_sweep(grid, series, per_config, workers=1), expected, rtol=1e-12)
+
+
+def test_parallel_sweep_exact_matches_settle_batch(sweep):
+    grid, series, per_config = sweep
+    series = {k: np.round(v, 2) for k, v in series.items()}
+    per_config = {"E_akt": np.round(per_config["E_akt"], 3)}
+    got = parallel_sweep(grid, series, per_config, workers=2, exact=True)
+    assert got.dtype == np.int64
+    np.testing.assert_array_equal(got, _serial(grid, series, per_config, exact=True))
+
+
+def test_chunked_sweeps_reuse_one_pool(sweep, monkeypatch):
+    grid, series, per_config = sweep
+    sums = _serial(grid, series, per_config)[:, SCENARIOS.index("3a")]
+    field = "Ökad totalkostnad slutkund"
+    pools = []
+
+    class CountingPool(parallel.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(parallel, "ProcessPoolExecutor", CountingPool)
+    # Generator och små bitar: alla bitar avräknas i samma pool
+    best = top_k_sweep(iter(grid), k=5, field=field, order="min", series=series, per_config=per_config,
+                       scenarios=["3a"], workers=2, chunk=7)["3a"]
+    assert len(pools) == 1
+    expected = sums[:, SWEEP_FIELDS.index(field)]
+    assert best["Konfiguration"].tolist() == np.argsort(expected, kind="stable")[:5].tolist()
+    np.testing.assert_allclose(best[field], np.sort(expected)[:5])
+
+    sketch = sketch_sweep(iter(grid), series, per_config, scenarios=["3a"], workers=2, chunk=7)
+    assert len(pools) == 2
+    assert sketch.sketch.count == len(grid)
+    np.testing.assert_allclose(sketch.sketch.mean, sums.mean(axis=0))
+
+
+@pytest.mark.parametrize("exact", [False, True])
+def test_top_k_defaults_match_brute_force(sweep, exact):
+    grid, series, per_config = sweep
+    series = {k: np.round(v, 2) for k, v in series.items()}
+    per_config = {"E_akt": np.round(per_config["E_akt"], 3)}
+    field = "Avvikelse mot aktörers målresultat"
+    sets = [{**series, **cfg, "E_akt": per_config["E_akt"][i], "exact": exact} for i, cfg in enumerate(grid)]
+    set_idx, _, results = settle_batch(sets)
+
+    best = top_k_sweep(grid, k=5, series=series, per_config=per_config, workers=2, exact=exact, chunk=16)
+    assert list(best) == list(SCENARIOS)
+    for key in SCENARIOS:
+        per_mtu = results[key]["Sammanställning"][field]
+        if np.isnan(per_mtu.astype(float)).all():
+            # NA i 4a–5b: inga kandidater, inte ett fel i heltalsläget
+            assert best[key].empty, key
+            continue
+        sums = np.zeros(len(grid), dtype=per_mtu.dtype)
+        np.add.at(sums, set_idx, per_mtu)
+        expected = np.argsort(np.abs(sums), kind="stable")[:5]
+        assert best[key]["Konfiguration"].tolist() == expected.tolist(), key
+        if exact:
+            assert best[key][field].dtype == np.int64
+            np.testing.assert_array_equal(best[key][field], sums[expected])
+        else:
+            np.testing.assert_allclose(best[key][field], sums[expected], rtol=1e-12)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import DEFAULT_PARAMS
+from pricepaths import bootstrap_paths, evaluate_paths
+
+
+def _history(start, end, tz=None):
+    index = pd.date_range(start, end, freq="15min", tz=tz, inclusive="left")
+    return pd.DataFrame({"P_DA": np.arange(len(index), dtype=float), "P_IMB": 1.0}, index=index)
+
+
+@pytest.mark.parametrize("naive", [False, True])
+def test_blocks_start_at_midnight_and_skip_dst_days(naive):
+    history = _history("2024-03-29 00:00", "2024-04-02 00:00", "Europe/Stockholm")
+    if naive:
+        history.index = history.index.tz_localize(None)
+    paths = bootstrap_paths(history, 200, 96, seed=0)
+    starts = {int(v) for v in paths["P_DA"][:, 0]}
+    # 31 mars har 92 MTU och används inte; övriga dygn börjar vid midnatt
+    assert starts == {int(history.index.get_loc(pd.Timestamp(d, tz=history.index.tz)))
+                      for d in ("2024-03-29", "2024-03-30", "2024-04-01")}
+
+
+def test_blocks_skip_gaps():
+    history = _history("2024-01-01", "2024-01-04")
+    history = history.drop(history.index[100])
+    paths = bootstrap_paths(history, 200, 96, seed=0)
+    assert set(paths["P_DA"][:, 0].astype(int).tolist()) == {0, 192}
+
+
+def test_path_customer_price_is_volume_weighted():
+    history = _history("2024-01-01", "2024-01-03")
+    paths = bootstrap_paths(history, 5, 96, seed=0)
+    params = {**DEFAULT_PARAMS, "E_cons": np.linspace(50, 150, 96)}
+    totals = evaluate_paths(params, paths, ["3a"], "5a")
+    re = totals["3a"]["RE"]
+    np.testing.assert_allclose(re["Slutkundens elpris"],
+                               re["Kostnad som faktureras slutkund"] / re["Volym som faktureras slutkund"])
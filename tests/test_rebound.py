@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from engine import DEFAULT_PARAMS
+from rebound import KERNEL_SHAPES, apply_rebound, rebound, rebound_kernel
+
+
+@pytest.mark.parametrize("shape", list(KERNEL_SHAPES))
+def test_kernel_sums_to_fraction(shape):
+    kernel = rebound_kernel(0.6, 5, shape)
+    assert len(kernel) == 5
+    assert kernel.sum() == pytest.approx(0.6)
+    assert (kernel >= 0).all()
+    assert len(rebound_kernel(0.0, 5)) == 0 and len(rebound_kernel(0.5, 0)) == 0
+
+
+def test_rebound_follows_activation_by_lag():
+    activation = np.array([0.0, 10.0, 0.0, 0.0, 0.0, 0.0])
+    out = rebound(activation, [0.5, 0.25])
+    # Inget i samma MTU: halva i t+1, en fjärdedel i t+2
+    assert out.tolist() == [0, 0, 5, 2.5, 0, 0]
+
+
+def test_nothing_leaks_past_the_last_mtu():
+    activation = np.array([0.0, 0.0, 8.0, 4.0])
+    out = rebound(activation, [0.5, 0.25, 0.25])
+    assert out.tolist() == [0, 0, 0, 4]
+    # Kärna längre än serien
+    assert rebound([8.0, 0.0], rebound_kernel(1.0, 10)).tolist() == [0, 0.8]
+
+
+def test_rebound_along_last_axis():
+    activation = np.array([[10.0, 0.0, 0.0], [0.0, 4.0, 0.0]])
+    assert rebound(activation, [0.5]).tolist() == [[0, 5, 0], [0, 0, 2]]
+
+
+def test_apply_rebound_signs():
+    p = {**DEFAULT_PARAMS, "E_akt": np.array([8.0, 0.0, 0.0]), "E_akt_up": np.array([0.0, 6.0, 0.0])}
+    out = apply_rebound(p, [0.5])
+    # Uppreglering (A-sidan) tas igen: mer förbrukning; nedreglering (B-sidan): mindre
+    assert out["E_cons"].tolist() == [p["E_cons"], p["E_cons"] + 4, p["E_cons"]]
+    assert out["E_cons_up"].tolist() == [p["E_cons_up"], p["E_cons_up"], p["E_cons_up"] - 3]
+    assert p["E_cons"] == DEFAULT_PARAMS["E_cons"]
+    # Utan tidsaxel eller kärna: oförändrat
+    assert apply_rebound(DEFAULT_PARAMS, [0.5]) is DEFAULT_PARAMS
+    assert apply_rebound(p, []) is p
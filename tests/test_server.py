@@ -0,0 +1,49 @@
+import json
+
+import server
+
+
+def _post(req: dict):
+    status, content_type, body = server.handle_settle(json.dumps(req).encode("utf-8"), None)
+    return status, json.loads(body)
+
+
+def test_check_exact_with_mixed_flags():
+    req = {
+        "params": [
+            {"exact": True, "apply_penalty": True, "P_IMB": [5.0, 60.0, -3.0]},
+            {"exact": True, "apply_penalty": False, "P_IMB": [7.0, 8.0]},
+        ],
+        "check": True,
+    }
+    status, body = _post(req)
+    assert status == 200
+    assert body["violations"] == []
+    assert all(isinstance(v, int) for v in body["results"]["5a"]["BSP"]["BSP nettoresultat"])
+
+
+def test_unknown_target_and_scenario_give_400():
+    status, body = _post({"params": [{}], "target": "9z"})
+    assert status == 400 and "målscenario" in body["error"]
+    status, body = _post({"params": [{}], "scenarios": ["1a", "x"]})
+    assert status == 400 and "x" in body["error"]
+
+
+def test_unexpected_error_gives_500(monkeypatch):
+    def boom(*args):
+        raise IndexError("trasig")
+
+    monkeypatch.setattr(server, "settle_batch", boom)
+    status, body = _post({"params": [{}]})
+    assert status == 500 and "IndexError" in body["error"]
+
+
+def test_price_rules_default_like_the_app():
+    # Bara P_IMB/P_DA: ersättnings-, avdrags- och RE-kompensationspriset följer dem som i appen
+    _, rules = _post({"params": [{"P_DA": 3.0, "P_IMB": 60.0, "apply_penalty": True}]})
+    _, explicit = _post({"params": [{"P_DA": 3.0, "P_IMB": 60.0, "apply_penalty": True, "P_COMP": 60.0,
+                                     "P_PEN": 60.0, "P_RECOMP": 3.0, "use_imb_for_comp": False,
+                                     "use_imb_for_pen": False, "re_comp_is_da": False}]})
+    assert rules["results"] == explicit["results"]
+    _, ignored = _post({"params": [{"P_DA": 3.0, "P_IMB": 60.0, "apply_penalty": True, "P_COMP": 7.0}]})
+    assert ignored["results"] == rules["results"]
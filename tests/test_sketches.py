@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from sketches import QuantileSketch, ResultSketch
+
+QUANTILES = np.array([0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99])
+
+
+def _rank_error(data, estimates):
+    # Skillnad mellan önskad kvantil och den faktiska rangen för skissens värde
+    ranks = np.array([np.searchsorted(np.sort(col), est, side="right") / len(col)
+                      for col, est in zip(data.T, estimates)])
+    return np.abs(ranks - QUANTILES).max()
+
+
+def test_rank_error_and_exact_moments():
+    rng = np.random.default_rng(0)
+    data = np.column_stack([rng.normal(size=200_000), rng.exponential(size=200_000)])
+    sketch = QuantileSketch(2)
+    for block in np.array_split(data, 37):
+        sketch.update(block)
+    assert _rank_error(data, sketch.quantiles(QUANTILES)) < 0.017
+    assert sketch.size < 2_000
+    assert sketch.count == len(data)
+    np.testing.assert_allclose(sketch.mean, data.mean(axis=0))
+    np.testing.assert_allclose(sketch.std(), data.std(axis=0))
+    np.testing.assert_array_equal(sketch.quantiles([0.0, 1.0]), np.column_stack([data.min(axis=0), data.max(axis=0)]))
+
+
+def test_merge_across_workers():
+    rng = np.random.default_rng(1)
+    data = rng.uniform(size=(120_000, 1))
+    parts = [QuantileSketch(1).update(part) for part in np.array_split(data, 4)]
+    merged = parts[0]
+    for other in parts[1:]:
+        merged.merge(other)
+    assert merged.count == len(data)
+    assert _rank_error(data, merged.quantiles(QUANTILES)) < 0.017
+    counts, edges = merged.histogram(10)
+    assert counts.sum() == pytest.approx(len(data))
+    assert edges[0, 0] == data.min() and edges[0, -1] == data.max()
+
+
+def test_result_sketch_streams():
+    results = {"5a": {"BSP": {"BSP nettoresultat": np.arange(10.0), "Obalansjusteras baserat på": "Bud"}}}
+    sketch = ResultSketch.for_results(results).update(results)
+    assert sketch.streams == [("5a", "BSP", "BSP nettoresultat")]
+    assert sketch.summary("Medelvärde")["5a"]["BSP"] == {"BSP nettoresultat": 4.5, "Obalansjusteras baserat på": "Bud"}
+    with pytest.raises(ValueError):
+        sketch.merge(ResultSketch([("5a", "BSP", "Annat")]))
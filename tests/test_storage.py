@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from engine import DEFAULT_PARAMS
+from storage import simulate_storage, storage_params
+
+
+def test_power_limit_per_mtu():
+    # 4 MW under en kvart = 1 MWh per MTU i båda riktningarna
+    delivered, soc = simulate_storage([3.0, -3.0, 0.5], capacity=100, power=4, efficiency=1.0, restore=False)
+    assert delivered.tolist() == [1.0, -1.0, 0.5]
+    assert soc.tolist() == [49.0, 50.0, 49.5]
+
+
+def test_soc_floor_and_ceiling_with_round_trip_efficiency():
+    # η = √0,81 = 0,9 per riktning; 5 MWh lagrat ger 4,5 MWh ut
+    delivered, soc = simulate_storage([10.0, 1.0], capacity=10, power=100, efficiency=0.81, restore=False)
+    assert delivered == pytest.approx([4.5, 0.0])
+    assert soc == pytest.approx([0.0, 0.0])
+    # Laddning upp till taket: 5 MWh ledigt kräver 5/0,9 MWh in
+    delivered, soc = simulate_storage([-10.0, -1.0], capacity=10, power=100, efficiency=0.81, restore=False)
+    assert delivered == pytest.approx([-5 / 0.9, 0.0])
+    assert soc == pytest.approx([10.0, 10.0])
+    # Golv och tak som andelar av kapaciteten
+    delivered, soc = simulate_storage([10.0, -20.0], capacity=10, power=100, efficiency=1.0, soc_min=0.2,
+                                      soc_max=0.9, restore=False)
+    assert delivered == pytest.approx([3.0, -7.0])
+    assert soc == pytest.approx([2.0, 9.0])
+
+
+def test_restore_towards_start_level():
+    requested = [1.0, 1.0, 0.0, 0.0, 0.0]
+    _, soc = simulate_storage(requested, capacity=10, power=4, efficiency=1.0, restore=True)
+    # Högst 1 MWh per MTU tillbaka mot startnivån 5 MWh, utan att gå förbi
+    assert soc.tolist() == [4.0, 3.0, 4.0, 5.0, 5.0]
+    _, soc = simulate_storage(requested, capacity=10, power=4, efficiency=1.0, restore=False)
+    assert soc.tolist() == [4.0, 3.0, 3.0, 3.0, 3.0]
+
+
+def test_batched_batteries_match_one_by_one():
+    rng = np.random.default_rng(3)
+    requested = rng.uniform(-3, 3, (4, 200))
+    requested[:, ::7] = 0.0
+    params = {
+        "capacity": np.array([5.0, 10.0, 2.0, 8.0]),
+        "power": np.array([4.0, 8.0, 12.0, 2.0]),
+        "efficiency": np.array([0.9, 0.81, 1.0, 0.95]),
+        "soc0": np.array([0.5, 0.2, 1.0, 0.0]),
+        "soc_min": 0.1,
+    }
+    delivered, soc = simulate_storage(requested, **params)
+    assert delivered.shape == soc.shape == requested.shape
+    for i in range(len(requested)):
+        one = {k: v[i] if np.ndim(v) else v for k, v in params.items()}
+        d, s = simulate_storage(requested[i], **one)
+        np.testing.assert_allclose(delivered[i], d, rtol=1e-12)
+        np.testing.assert_allclose(soc[i], s, rtol=1e-12)
+
+
+def test_storage_params_sides():
+    p = {**DEFAULT_PARAMS, "E_bud": np.array([10.0, 10.0]), "E_bud_up": 10.0}
+    out = storage_params(p, {"capacity": 10.0, "power": 100.0, "efficiency": 1.0, "restore": False}, 2)
+    # A-sidan laddar ur 5 MWh, B-sidan laddar in 5 MWh: två separata förlopp
+    assert out["E_akt"].tolist() == [5.0, 0.0]
+    assert out["E_akt_up"].tolist() == [5.0, 0.0]
+    assert out["E_bud"] is p["E_bud"]
@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+import pytest
+
+from store import convert_csv, list_series, load_index, open_series, partial_columns
+
+
+def _csv(path, first_day, offset, values):
+    times = pd.date_range(first_day, periods=len(values), freq="6h")
+    lines = [f"{t:%Y-%m-%d %H:%M}{offset},{v}" for t, v in zip(times, values)]
+    path.write_text("tid,P_DA\n" + "\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_tz_aware_csv_is_stored_as_naive_utc(tmp_path):
+    store = str(tmp_path / "store")
+    convert_csv(_csv(tmp_path / "a.csv", "2024-03-01", "+01:00", range(4)), "SE3", "a", store)
+    start, end, _ = list_series(store)[("SE3", "a")]
+    assert start == pd.Timestamp("2024-02-29 23:00")
+    # Naiva datumgränser som i appen
+    index, values = open_series("SE3", "a", "2024-02-29", "2024-03-01 23:59:59.999", store)
+    assert index.tz is None and len(index) == 4
+
+
+def test_overlapping_segments_are_deduplicated(tmp_path):
+    store = str(tmp_path / "store")
+    first = _csv(tmp_path / "a.csv", "2024-03-01", "", [0, 1, 2, 3, 4, 5, 6, 7])
+    second = _csv(tmp_path / "b.csv", "2024-03-02", "", [100, 101, 102, 103])
+    convert_csv(first, "SE3", "a", store)
+    convert_csv(first, "SE3", "a", store)
+    convert_csv(second, "SE3", "a", store)
+    index, values = open_series("SE3", "a", store_dir=store)
+    assert index.is_monotonic_increasing and index.is_unique
+    # Senast konverterade segmentet gäller vid överlapp
+    assert values["P_DA"].tolist() == [0, 1, 2, 3, 100, 101, 102, 103]
+
+
+def test_empty_csv_is_rejected_before_writing(tmp_path):
+    store = str(tmp_path / "store")
+    empty = tmp_path / "tom.csv"
+    empty.write_text("tid,P_DA\n")
+    with pytest.raises(ValueError, match="inga rader"):
+        convert_csv(str(empty), "SE3", "a", store)
+    assert load_index(store) == [] and not os.path.exists(store)
+
+
+def test_columns_missing_in_a_segment_are_reported(tmp_path):
+    store = str(tmp_path / "store")
+    convert_csv(_csv(tmp_path / "a.csv", "2024-03-01", "", [1, 2]), "SE3", "a", store)
+    both = tmp_path / "b.csv"
+    both.write_text("tid,P_DA,P_IMB\n2024-03-02 00:00,3,30\n2024-03-02 06:00,4,40\n")
+    convert_csv(str(both), "SE3", "a", store)
+    assert list_series(store)[("SE3", "a")][2] == ["P_DA"]
+    assert partial_columns("SE3", "a", store) == ["P_IMB"]
+    _, values = open_series("SE3", "a", store_dir=store)
+    assert list(values) == ["P_DA"]
+    _, values = open_series("SE3", "a", "2024-03-02", store_dir=store)
+    assert values["P_IMB"].tolist() == [30, 40]
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from tariffs import ALL_CONTRACTS, customer_settlement, customer_table, tariff_summary
+
+
+def _results(cost_price):
+    return {
+        "RE": {
+            "Volym som faktureras slutkund": np.array([10.0, 10.0, 20.0, 20.0]),
+            "Snittpris för inköp el som kan faktureras": np.full(4, cost_price),
+        },
+        "BRP": {"DA Pris": np.array([1.0, 2.0, 3.0, 4.0])},
+    }
+
+
+@pytest.fixture
+def customers():
+    return customer_table(
+        ["A", "B", "C", "D"], ["Fast", "Spot", "Tidstariff", "Kostnad"], [4, 2, 1, 1],
+        price=[5.0, 0.0, 4.0, 0.0], peak_price=[0.0, 0.0, 8.0, 0.0], margin=[0.0, 1.0, 0.0, 0.5],
+    )
+
+
+def test_customer_costs_hand_example(customers):
+    results = {"3a": _results(3.0), "5a": _results(2.0)}
+    peak = np.array([False, True, True, False])
+    s = customer_settlement(results, customers, peak, target="5a")
+    assert s["keys"] == ["3a", "5a"]
+    # Total volym 60 MWh; andelar 1/2, 1/4, 1/8, 1/8
+    assert s["Volym"][1].tolist() == pytest.approx([30, 15, 7.5, 7.5])
+    # Fast 5·30; Spot (60 + Σ vol·P_DA = 170)/4; Tidstariff (4·60 + 4·30 topp)/8; Kostnad (0,5·60 + 2·60)/8
+    assert s["Kundkostnad"][1].tolist() == pytest.approx([150, 57.5, 45, 18.75])
+    assert s["Kundkostnad"][0].tolist() == pytest.approx([150, 57.5, 45, 26.25])
+    # Bara kostnadskunden påverkas av scenariot
+    assert s["Neutralisering"][0].tolist() == pytest.approx([0, 0, 0, 7.5])
+    assert s["Neutralisering"][1].tolist() == pytest.approx([0, 0, 0, 0])
+
+    summary = tariff_summary(s, customers)
+    assert summary["3a"][ALL_CONTRACTS]["Neutralisering per kund"] == pytest.approx(7.5)
+    assert summary["3a"][ALL_CONTRACTS]["Kunder med merkostnad"] == 1
+    assert summary["5a"]["Spot"]["Snittpris"] == pytest.approx(57.5 / 15)
@@ -0,0 +1,19 @@
+from io import StringIO
+
+import pandas as pd
+
+from timeseries import read_series_csv, series_from_records
+
+
+def test_time_column_gives_time_index():
+    df = read_series_csv(StringIO("tid;P_DA;P_IMB\n2024-01-01 00:00;1,5;2\n2024-01-01 00:15;2;3\n"))
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert df["P_DA"].tolist() == [1.5, 2.0]
+
+
+def test_mtu_column_gives_integer_index():
+    df = read_series_csv(StringIO("mtu;P_DA;P_IMB\n1;50;60\n2;51;61\n3;52;62\n"))
+    assert df.index.name == "MTU"
+    assert df.index.tolist() == [1, 2, 3]
+    assert series_from_records([{"mtu": 1, "P_DA": 1.0}, {"mtu": 2, "P_DA": 2.0}]).index.tolist() == [1, 2]
+
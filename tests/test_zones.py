@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from engine import DEFAULT_PARAMS, SCENARIOS, by_actor, customer_price, reduce_results, settle, summarize
+from zones import ALL_ZONES, settle_zones, stack_zones, zone_totals
+
+T = 16
+
+
+@pytest.fixture
+def inputs():
+    rng = np.random.default_rng(2)
+    return {
+        "SE4": {"P_IMB": rng.uniform(-20, 200, T), "P_DA": 40.0},
+        "SE3": {"P_IMB": rng.uniform(-20, 200, T), "E_cons": rng.uniform(80, 120, T)},
+        "SE1": {"P_DA": 12.0},
+    }
+
+
+def _single(params, zone_input):
+    # Ett område för sig, utbrett till T MTU som i den staplade avräkningen
+    p = {**DEFAULT_PARAMS, **params, **zone_input}
+    settled = settle(p)
+    return {
+        k: {a: {f: v if isinstance(v, str) else np.broadcast_to(v, (T,)) for f, v in fields.items()}
+            for a, fields in actors.items()}
+        for k, actors in by_actor(settled, summarize(p, settled)).items()
+    }
+
+
+def test_stacked_zones_equal_separate_settlement(inputs):
+    params = {"apply_penalty": True}
+    zones, results = settle_zones(params, inputs, list(SCENARIOS))
+    assert zones == ["SE1", "SE3", "SE4"]
+    for i, zone in enumerate(zones):
+        single = _single(params, inputs[zone])
+        for k in SCENARIOS:
+            for actor, fields in single[k].items():
+                for f, v in fields.items():
+                    got = results[k][actor][f]
+                    if isinstance(v, str):
+                        assert got == v
+                        continue
+                    assert np.shape(got) == (3, T)
+                    np.testing.assert_allclose(got[i], v, rtol=1e-12, err_msg=f"{zone} {k} {f}")
+
+
+def test_zone_totals_sum_over_mtu_and_zones(inputs):
+    zones, results = settle_zones({}, inputs, list(SCENARIOS))
+    totals = zone_totals(zones, results)
+    for zone in zones:
+        single = customer_price(reduce_results(_single({}, inputs[zone]), axis=-1))
+        for f in ("Kostnad som faktureras slutkund", "Slutkundens elpris"):
+            assert totals[zone]["3a"]["RE"][f] == pytest.approx(single["3a"]["RE"][f])
+    re = totals[ALL_ZONES]["3a"]["RE"]
+    cost = sum(totals[z]["3a"]["RE"]["Kostnad som faktureras slutkund"] for z in zones)
+    volume = sum(totals[z]["3a"]["RE"]["Volym som faktureras slutkund"] for z in zones)
+    assert re["Kostnad som faktureras slutkund"] == pytest.approx(cost)
+    # Volymvägt pris, inte medelvärdet av områdenas priser
+    assert re["Slutkundens elpris"] == pytest.approx(cost / volume)
+
+
+def test_stack_zones_validates_inputs():
+    with pytest.raises(ValueError, match="gemensamma"):
+        stack_zones({}, {"SE3": {"apply_penalty": True}})
+    with pytest.raises(ValueError, match="olika längd"):
+        stack_zones({}, {"SE3": {"P_IMB": np.zeros(3)}, "SE4": {"P_IMB": np.zeros(4)}})
+    with pytest.raises(ValueError, match="Inga"):
+        stack_zones({}, {})
@@ -0,0 +1,66 @@
+import pandas as pd
+
+
+# ---------- Tidsserier per MTU ----------
+# Kolumner som kan variera per MTU. Saknade kolumner tas från sidopanelen.
+SERIES_COLUMNS = ("P_DA", "P_IMB", "E_cons", "E_bud", "E_akt", "C_cap", "C_avail")
+
+# Accepterade namn på tidskolumnen och på kolumnen med MTU-nummer (heltal)
+TIME_COLUMNS = ("tid", "time", "timestamp")
+MTU_COLUMNS = ("mtu",)
+
+
+def _series_index(raw: pd.DataFrame) -> pd.Index:
+    # Tidsindex om tidskolumn finns, annars MTU-nummer ur mtu-kolumnen eller 0, 1, 2 …
+    time_col = next((c for c in raw.columns if str(c).lower() in TIME_COLUMNS), None)
+    if time_col is not None:
+        return pd.DatetimeIndex(pd.to_datetime(raw[time_col]), name="Tid")
+    mtu_col = next((c for c in raw.columns if str(c).lower() in MTU_COLUMNS), None)
+    if mtu_col is not None:
+        return pd.Index(pd.to_numeric(raw[mtu_col].astype(str).str.strip(), errors="raise").astype("int64"), name="MTU")
+    return pd.RangeIndex(len(raw), name="MTU")
+
+
+def read_series_csv(buf) -> pd.DataFrame:
+    """
+    Läser en CSV med en rad per MTU. Avgränsare (, ; tab) detekteras automatiskt
+    och decimalkomma accepteras. Returnerar en DataFrame med tidsindex
+    (eller MTU-nummer ur mtu-kolumnen, annars 0, 1, 2 …, om tidskolumn saknas) och de kolumner i SERIES_COLUMNS som finns.
+    """
+    raw = pd.read_csv(buf, sep=None, engine="python", dtype=str)
+    raw.columns = [c.strip() for c in raw.columns]
+
+    cols = [c for c in SERIES_COLUMNS if c in raw.columns]
+    if not cols:
+        raise ValueError(f"CSV saknar kolumner – förväntar minst en av {', '.join(SERIES_COLUMNS)}")
+
+    df = pd.DataFrame({
+        c: pd.to_numeric(raw[c].str.replace(",", ".", regex=False).str.strip(), errors="raise")
+        for c in cols
+    })
+    df.index = _series_index(raw)
+    return df
+
+
+def series_values(df: pd.DataFrame, defaults: dict) -> dict:
+    """Kolumnerna i df som float-arrayer; övriga SERIES_COLUMNS från defaults (skalärer)."""
+    return {
+        c: df[c].to_numpy(dtype=float) if c in df.columns else defaults[c]
+        for c in SERIES_COLUMNS
+    }
+
+
+
+def series_from_records(records: list) -> pd.DataFrame:
+    """
+    Samma form som read_series_csv men från dictar (t.ex. JSON-rader):
+    en post per MTU med valfri tids- eller mtu-nyckel och kolumner ur SERIES_COLUMNS.
+    """
+    raw = pd.DataFrame.from_records(records)
+    cols = [c for c in SERIES_COLUMNS if c in raw.columns]
+    if not cols:
+        raise ValueError(f"Posterna saknar fält – förväntar minst ett av {', '.join(SERIES_COLUMNS)}")
+
+    df = raw[cols].apply(pd.to_numeric, errors="raise").astype(float)
+    df.index = _series_index(raw)
+    return df
@@ -0,0 +1,86 @@
+"""
+Avräkning för flera elområden (SE1–SE4) i samma anrop.
+
+Elområdet är en extra, första arrayaxel: indata som skiljer sig mellan
+områdena (priser, volymer, serier per MTU) staplas till formen (områden, MTU)
+– eller (områden, 1) för skalärer – och motorn räknar elementvis över båda
+axlarna. Checkboxarna (FLAG_PARAMS) är gemensamma för alla områden.
+
+Resultaten per område summeras över MTU; totalen över områdena summerar
+belopp och volymer. Slutkundens elpris räknas om som fakturerad kostnad /
+fakturerad volym (volymvägt), inte som ett medelvärde av områdenas priser.
+"""
+import numpy as np
+
+from engine import (
+    DEFAULT_PARAMS, FLAG_PARAMS, TARGET_SCENARIO, by_actor, customer_price, reduce_results, required_scenarios,
+    settle, summarize,
+)
+
+ZONES = ("SE1", "SE2", "SE3", "SE4")
+ALL_ZONES = "Alla elområden"
+
+def stack_zones(params: dict, zone_inputs: dict) -> tuple:
+    """
+    Staplar indata per område till parametrar med områdesaxeln först.
+    zone_inputs: område → {parameter: skalär eller serie}; parametrar som
+    saknas för ett område tas från params. Returnerar (områden, parametrar).
+    """
+    zones = [z for z in ZONES if z in zone_inputs] + [z for z in zone_inputs if z not in ZONES]
+    if not zones:
+        raise ValueError("Inga elområden angivna")
+    p = {**DEFAULT_PARAMS, **params}
+    keys = {k for inputs in zone_inputs.values() for k in inputs}
+    unknown = keys - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Okända parametrar: {', '.join(sorted(unknown))}")
+    flags = keys & set(FLAG_PARAMS)
+    if flags:
+        raise ValueError(f"{', '.join(sorted(flags))} är gemensamma för alla elområden")
+
+    lengths = {np.size(v) for inputs in zone_inputs.values() for v in inputs.values() if np.ndim(v) > 0}
+    if len(lengths) > 1:
+        raise ValueError(f"Serierna har olika längd ({sorted(lengths)})")
+    n = lengths.pop() if lengths else 1
+
+    for k in keys:
+        p[k] = np.stack([
+            np.broadcast_to(np.asarray(zone_inputs[z].get(k, p[k]), dtype=float), (n,)) for z in zones
+        ])
+    return zones, p
+
+
+def settle_zones(params: dict, zone_inputs: dict, scenarios, target: str = TARGET_SCENARIO) -> tuple:
+    """
+    Avräknar alla områden i ett anrop. Returnerar (områden, resultat) där
+    resultat är scenario → aktör → fält med arrayer av formen (områden, MTU).
+    """
+    zones, p = stack_zones(params, zone_inputs)
+    settled = settle(p, required_scenarios(scenarios, target))
+    results = by_actor(settled, summarize(p, settled, target))
+    shape = (len(zones), max((np.shape(v)[-1] for v in p.values() if np.ndim(v) == 2), default=1))
+    return zones, {
+        k: {
+            a: {f: v if isinstance(v, str) else np.broadcast_to(v, shape) for f, v in fields.items()}
+            for a, fields in actors.items()
+        }
+        for k, actors in results.items()
+    }
+
+
+def zone_totals(zones: list, results: dict, exact: bool = False, target: str = TARGET_SCENARIO) -> dict:
+    """
+    Summor över MTU per område plus totalen över alla områden (ALL_ZONES):
+    område → scenario → aktör → fält (skalärer).
+    """
+    per_zone = reduce_results(results, axis=-1)
+    out = {
+        z: customer_price(
+            {k: {a: {f: v if isinstance(v, str) else v[i] for f, v in fields.items()} for a, fields in actors.items()}
+             for k, actors in per_zone.items()},
+            exact, target,
+        )
+        for i, z in enumerate(zones)
+    }
+    out[ALL_ZONES] = customer_price(reduce_results(per_zone, axis=0), exact, target)
+    return out